@@ -0,0 +1,307 @@
+'''
+    Benchmarks of the cost of relation-checker:
+        overhead     time per call of a declared function and of a declared class, against the same undeclared ones,
+                     for every checking level
+        throughput   triples checked per second and latency from the call to the verdict, with the compiled tables
+                     and with the reasoner for every worker count
+        memory       growth of the memory of the process over many calls of a declared function
+
+        python benchmarks/bench.py [--calls 200000] [--workers 1,2,4] [--memory-calls 1000000] [--output results.json]
+                                   [--baseline old_results.json] [--tolerance 0.25]
+
+    Every scenario runs in its own process, since workers and declarations live as long as the process.
+    Results are written as JSON. Given a baseline, the exit status is 1 if a result is worse by more than the tolerance.
+'''
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+
+here = os.path.dirname(os.path.abspath(__file__))
+package = os.path.join(os.path.dirname(here), "relation-checker")
+
+
+'''
+    Functions run in the process of a scenario
+'''
+def setup():
+    sys.path.insert(0, package)
+    import ontology
+    ontology.set_ontology(os.path.join(here, "bench_ontology.py"))
+    import tools
+    return tools
+
+
+class Node:
+    def __init__(self):
+        self.links = []
+
+class PlainNode:
+    def __init__(self):
+        self.links = []
+
+def plain_call(a, b):
+    pass
+
+def link_call(a, b):
+    pass
+
+def off_call(a, b):
+    pass
+
+for relation in ["link" + letter for letter in "ABCDEF"] + ["deep" + letter for letter in "ABCDEF"]:
+    exec("def call_" + relation + "(a, b):\n    pass")             # One function per relation, declared at module level
+
+
+def per_call(fn, args, calls):
+    '''
+    :return: Nanoseconds per call of fn, best of three runs
+    '''
+    best = None
+    for run in range(3):
+        start = time.perf_counter()
+        for i in range(calls):
+            fn(*args)
+        elapsed = (time.perf_counter() - start) / calls * 1e9
+        best = elapsed if best == None else min(best, elapsed)
+    return best
+
+
+def scenario_overhead(options):
+    tools = setup()
+    import ontology
+    calls = options["calls"]
+    tools.declare(ontology.entity("KindA"), Node, value_overwrite= False)
+    a = Node()
+    tools.declare(ontology.entity("KindB"), Node, value_overwrite= False)
+    b = Node()
+    tools.declare(ontology.entity("linkA"), link_call)
+    wrapped = globals()["link_call"]
+    wrapped(a, b)                                           # The first call checks the triple, the timed ones are repeats
+    tools.wait_all()
+
+    unwrapped = tools.declare(ontology.entity("linkB"), off_call, checking= "off")
+
+    plain = per_call(plain_call, (a, b), calls)
+    levels = {}
+    for level in ["full", "first_seen", "sampled"]:
+        tools.set_checking(level)
+        ns = per_call(wrapped, (a, b), calls)
+        levels[level] = {"ns_per_call": ns, "overhead_ns": ns - plain}
+    ns = per_call(unwrapped, (a, b), calls)                 # declare(..., checking= "off") returns the function itself
+    levels["off"] = {"ns_per_call": ns, "overhead_ns": ns - plain, "unwrapped": unwrapped is off_call}
+    tools.set_checking("off")
+    ns = per_call(wrapped, (a, b), calls)                   # Declared function turned off later, by set_checking
+    levels["switched_off"] = {"ns_per_call": ns, "overhead_ns": ns - plain}
+    tools.set_checking("full")
+
+    constructions = max(1, calls // 20)                      # Every declared construction creates an individual of the ontology
+    plain_new = per_call(PlainNode, (), constructions)
+    declared_new = per_call(Node, (), constructions)
+    return {"calls": calls, "plain_ns_per_call": plain, "levels": levels, "constructions": constructions,
+            "plain_constructor_ns": plain_new, "constructor_ns": declared_new, "constructor_overhead_ns": declared_new - plain_new}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if len(ordered) == 0:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def scenario_throughput(options):
+    tools = setup()
+    import ontology
+    bench_ontology = ontology.load()                        # Entities and name lists of bench_ontology.py, loaded as the ontology
+    tools.set_pool(options["workers"])
+    tools.set_batching(options["batch"])
+    relations = bench_ontology["deep_relation_names"] if options["mode"] == "reasoner" else bench_ontology["relation_names"]
+
+    started = {}
+    finished = {}
+    outcomes = {True: 0, False: 0, None: 0}
+    def listener(key, verdict, record):
+        finished[key] = time.perf_counter()
+        outcomes[verdict] += 1
+    tools.verdict_listeners.append(listener)
+
+    nodes = []
+    for kind in bench_ontology["kind_names"]:
+        tools.declare(ontology.entity(kind), Node, value_overwrite= False)
+        nodes.append(Node())
+    for relation in relations:
+        tools.declare(ontology.entity(relation), globals()["call_" + relation])
+
+    start = time.perf_counter()
+    for relation in relations:
+        fn = globals()["call_" + relation]
+        for a in nodes:
+            for b in nodes:
+                key = (tools.class_stem(tools.individuals.onto_class(a)), relation, tools.class_stem(tools.individuals.onto_class(b)))
+                started[key] = time.perf_counter()
+                fn(a, b)
+    submitted = time.perf_counter() - start
+    tools.wait_all()
+    elapsed = time.perf_counter() - start
+
+    latencies = [(finished[key] - started[key]) * 1000 for key in started if key in finished]
+    verdicts = {"passed": outcomes[True], "failed": outcomes[False], "undecided": outcomes[None]}
+    if options["mode"] == "reasoner" and outcomes[True] == 0:          # Without java every check fails or is left undecided
+        return {"error": "the reasoner did not prove the checks (is java installed?), the timings are not meaningful",
+                "options": options, "verdicts": verdicts}           # Left out of the comparison with a baseline
+    return {"mode": options["mode"], "workers": options["workers"], "batch": options["batch"], "triples": len(started), "verdicts": verdicts,
+            "settled": len(latencies), "seconds": elapsed, "call_seconds": submitted, "triples_per_second": len(started) / elapsed,
+            "latency_ms": {"p50": percentile(latencies, 0.5), "p90": percentile(latencies, 0.9),
+                           "p99": percentile(latencies, 0.99), "max": max(latencies) if latencies else None}}
+
+
+def scenario_memory(options):
+    tools = setup()
+    import ontology
+    import psutil
+    process = psutil.Process()
+    calls = options["calls"]
+    tools.set_checking(options["level"])
+    tools.declare(ontology.entity("KindA"), Node, value_overwrite= False)
+    a = Node()
+    tools.declare(ontology.entity("KindB"), Node, value_overwrite= False)
+    b = Node()
+    tools.declare(ontology.entity("linkA"), link_call)
+    wrapped = globals()["link_call"]
+    wrapped(a, b)
+    tools.wait_all()
+
+    gc.collect()
+    start = process.memory_info().rss
+    samples = []
+    step = max(1, calls // 20)
+    for i in range(calls):
+        wrapped(a, b)
+        if (i + 1) % step == 0:
+            samples.append([i + 1, process.memory_info().rss - start])
+    gc.collect()
+    growth = process.memory_info().rss - start
+    return {"level": options["level"], "calls": calls, "start_rss": start, "growth_bytes": growth,
+            "bytes_per_call": growth / calls, "samples": samples}
+
+
+scenarios = {"overhead": scenario_overhead, "throughput": scenario_throughput, "memory": scenario_memory}
+
+
+'''
+    Functions run in the main process of the benchmark
+'''
+def run_scenario(name, options, timeout):
+    '''
+    Function to run a scenario in a new process, with its output hidden
+
+    :return: The dictionary returned by the scenario, or {"error": ...} if the process failed
+    '''
+    handle, result = tempfile.mkstemp(suffix= ".json")
+    os.close(handle)
+    try:
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), "--scenario", name, "--options", json.dumps(options), "--result", result],
+                                 stdout= subprocess.DEVNULL, stderr= subprocess.PIPE, timeout= timeout)
+        with open(result) as f:
+            content = f.read()
+        if process.returncode != 0 and content == "":
+            return {"error": process.stderr.decode(errors= "replace")[-2000:], "options": options}
+        return json.loads(content)
+    except subprocess.TimeoutExpired:
+        return {"error": "timed out after " + str(timeout) + " seconds", "options": options}
+    finally:
+        os.remove(result)
+
+
+def metrics(results):
+    '''
+    Function that flattens the results into (name, value, True if higher is better)
+    '''
+    found = []
+    overhead = results.get("overhead", {})
+    for level, values in overhead.get("levels", {}).items():
+        found.append(("overhead." + level + ".ns_per_call", values["ns_per_call"], False))
+    if "constructor_ns" in overhead:
+        found.append(("overhead.constructor_ns", overhead["constructor_ns"], False))
+    for run in results.get("throughput", []):
+        if "triples_per_second" in run:
+            found.append(("throughput." + run["mode"] + ".workers_" + str(run["workers"]) + ".triples_per_second", run["triples_per_second"], True))
+    for run in results.get("memory", []):
+        if "bytes_per_call" in run:
+            found.append(("memory." + run["level"] + ".bytes_per_call", run["bytes_per_call"], False))
+    return found
+
+
+def compare(results, baseline, tolerance):
+    '''
+    :return: List of the results that are worse than in the baseline by more than the tolerance
+    '''
+    old = {name: value for name, value, higher in metrics(baseline)}
+    regressions = []
+    for name, value, higher in metrics(results):
+        if name not in old or old[name] <= 0:
+            continue
+        change = (old[name] - value) / old[name] if higher else (value - old[name]) / old[name]
+        if change > tolerance:
+            regressions.append({"metric": name, "baseline": old[name], "result": value, "worse_by": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description= "Benchmarks of relation-checker.")
+    parser.add_argument("--calls", type= int, default= 200000, help= "calls per timed loop of the overhead scenario")
+    parser.add_argument("--workers", default= "1,2,4", help= "comma separated worker counts of the reasoner throughput scenario")
+    parser.add_argument("--batch", type= int, default= 1, help= "checks per reasoner run")
+    parser.add_argument("--memory-calls", type= int, default= 1000000, help= "calls of the memory scenario")
+    parser.add_argument("--only", help= "comma separated scenarios to run (overhead, throughput, memory)")
+    parser.add_argument("--timeout", type= float, default= 1800, help= "seconds after which a scenario is stopped")
+    parser.add_argument("--output", help= "file the JSON results are written to, printed if not given")
+    parser.add_argument("--baseline", help= "JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type= float, default= 0.25, help= "fraction by which a result may be worse than the baseline")
+    parser.add_argument("--scenario", help= argparse.SUPPRESS)
+    parser.add_argument("--options", help= argparse.SUPPRESS)
+    parser.add_argument("--result", help= argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario != None:                               # Process of a single scenario
+        result = scenarios[args.scenario](json.loads(args.options))
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+        import pool
+        pool.stop_pool()                                    # Workers would keep the pipes of the benchmark open
+        os._exit(0)                                         # The end of run report is not part of the measure
+
+    only = args.only.split(",") if args.only else list(scenarios.keys())
+    results = {"meta": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(), "time": time.time()}}
+    if "overhead" in only:
+        results["overhead"] = run_scenario("overhead", {"calls": args.calls}, args.timeout)
+    if "throughput" in only:
+        results["throughput"] = [run_scenario("throughput", {"mode": "compiled", "workers": 1, "batch": args.batch}, args.timeout)]
+        for workers in args.workers.split(","):
+            results["throughput"].append(run_scenario("throughput", {"mode": "reasoner", "workers": int(workers), "batch": args.batch}, args.timeout))
+    if "memory" in only:
+        results["memory"] = [run_scenario("memory", {"calls": args.memory_calls, "level": level}, args.timeout) for level in ["full", "first_seen"]]
+
+    status = 0
+    if args.baseline != None:
+        with open(args.baseline) as f:
+            results["regressions"] = compare(results, json.load(f), args.tolerance)
+        status = 1 if results["regressions"] else 0
+
+    text = json.dumps(results, indent= 2)
+    if args.output != None:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
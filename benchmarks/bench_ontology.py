@@ -0,0 +1,31 @@
+'''
+    Ontology of the benchmarks: nodes of twelve kinds and relations between any two of them.
+    The link relations only have a domain and a range, so the compiled tables decide them without the reasoner.
+    The deep relations are transitive, which leaves them to the reasoner.
+'''
+import types
+import owlready2
+from owlready2 import *
+
+bench = get_ontology("http://test.org/bench.owl")
+
+kind_names = ["Kind" + letter for letter in "ABCDEFGHIJKL"]            # Class names must not end in digits
+relation_names = ["link" + letter for letter in "ABCDEF"]
+deep_relation_names = ["deep" + letter for letter in "ABCDEF"]
+
+with bench:
+    class Vertex(Thing):
+        namespace = bench
+
+    for name in kind_names:
+        globals()[name] = types.new_class(name, (Vertex,))
+
+    for name in relation_names:
+        globals()[name] = types.new_class(name, (ObjectProperty,))
+        globals()[name].domain = [Vertex]
+        globals()[name].range = [Vertex]
+
+    for name in deep_relation_names:
+        globals()[name] = types.new_class(name, (ObjectProperty, TransitiveProperty))
+        globals()[name].domain = [Vertex]
+        globals()[name].range = [Vertex]
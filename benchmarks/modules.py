@@ -0,0 +1,128 @@
+'''
+    Benchmark of the modules of the ontology the workers reason over (see locality.py), on a generated ontology
+    of the size of a production one:
+
+        python benchmarks/modules.py [--classes 5000] [--properties 200] [--checks 20] [--output modules.json]
+
+    The ontology is a tree of classes, ten children per class, with disjoint siblings, an existential restriction
+    on every tenth class, and ObjectProperties between random classes, half of them with an inverse.
+    For checks of random properties between random subclasses of their domain and range, the script reports
+    the size of the module against the size of the ontology, and the time to extract it and to build its world.
+    If java is installed, it also times sync_reasoner() for the same checks over the module and over the whole world.
+'''
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+
+here = os.path.dirname(os.path.abspath(__file__))
+package = os.path.join(os.path.dirname(here), "relation-checker")
+
+
+def write_ontology(path, classes, properties, seed):
+    '''
+    Function to write a python module building the ontology with owlready2
+    '''
+    generator = random.Random(seed)
+    lines = ["from owlready2 import *", "big = get_ontology('http://test.org/big.owl')", "with big:",
+             "    class Node0(Thing):", "        namespace = big"]
+    for number in range(1, classes):
+        lines.append("    class Node%d(Node%d):" % (number, (number - 1) // 10))
+        lines.append("        namespace = big")
+    for number in range(properties):
+        lines.append("    class edge%d(ObjectProperty):" % number)
+        lines.append("        domain = [Node%d]" % generator.randrange(classes // 10))
+        lines.append("        range = [Node%d]" % generator.randrange(classes // 10))
+        if number % 2 == 1:
+            lines.append("        inverse_property = edge%d" % (number - 1))
+    for parent in range(0, classes // 10):
+        children = ["Node%d" % child for child in range(parent * 10 + 1, min(parent * 10 + 11, classes))]
+        if len(children) > 1:
+            lines.append("    AllDisjoint([" + ", ".join(children) + "])")
+    for number in range(0, classes, 10):
+        lines.append("    Node%d.is_a.append(edge%d.some(Node%d))" % (number, generator.randrange(properties), generator.randrange(classes)))
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def descendant(generator, cls, classes):
+    '''
+    :return: Number of a random class under cls
+    '''
+    while cls * 10 + 1 < classes and generator.random() < 0.7:
+        cls = generator.randrange(cls * 10 + 1, min(cls * 10 + 11, classes))
+    return cls
+
+
+def main():
+    parser = argparse.ArgumentParser(description= "Benchmark of the ontology modules of relation-checker.")
+    parser.add_argument("--classes", type= int, default= 5000, help= "number of classes of the generated ontology")
+    parser.add_argument("--properties", type= int, default= 200, help= "number of ObjectProperties")
+    parser.add_argument("--checks", type= int, default= 20, help= "number of checks of random properties")
+    parser.add_argument("--seed", type= int, default= 1)
+    parser.add_argument("--output", help= "file the JSON results are written to, printed if not given")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "big_ontology.py")
+    write_ontology(path, args.classes, args.properties, args.seed)
+    sys.path.insert(0, package)
+    import ontology
+    ontology.set_ontology(path)
+    import owlready2
+    import locality                                 # Not tools, which would compile the tables of the whole ontology first
+    entities = ontology.load()
+
+    start = time.perf_counter()
+    locality.read_axioms()
+    read_seconds = time.perf_counter() - start
+    total_triples = sum(len(axiom[3]) for axiom in locality.axioms)
+
+    generator = random.Random(args.seed)
+    java = shutil.which(owlready2.JAVA_EXE) != None
+    checks = []
+    for number in range(args.checks):
+        prop = entities["edge%d" % generator.randrange(args.properties)]
+        subject = descendant(generator, int(prop.domain[0].name[4:]), args.classes)
+        object = descendant(generator, int(prop.range[0].name[4:]), args.classes)
+        task = ("relation", (), (entities["Node%d" % subject].iri, prop.name, entities["Node%d" % object].iri), 0)
+        locality.worlds.clear()
+        start = time.perf_counter()
+        world = locality.world_for([task])
+        extract_seconds = time.perf_counter() - start
+        check = {"property": prop.name, "module_triples": sum(len(locality.axioms[index][3]) for index in locality.modules[prop.name][1]),
+                 "extract_ms": extract_seconds * 1000}
+        if java:
+            for name, reasoned in [("module", world), ("whole", owlready2.default_world)]:
+                created = [reasoned[task[2][0]](), reasoned[task[2][2]]()]
+                getattr(created[0], prop.name).append(created[1])
+                start = time.perf_counter()
+                try:
+                    owlready2.sync_reasoner(reasoned, debug= 0)
+                except owlready2.OwlReadyInconsistentOntologyError:
+                    pass
+                check[name + "_reasoner_ms"] = (time.perf_counter() - start) * 1000
+                for individual in created:
+                    owlready2.destroy_entity(individual)
+        checks.append(check)
+
+    sizes = sorted(check["module_triples"] for check in checks)
+    results = {"classes": args.classes, "properties": args.properties, "ontology_triples": total_triples,
+               "read_axioms_ms": read_seconds * 1000, "median_module_triples": sizes[len(sizes) // 2],
+               "largest_module_triples": sizes[-1], "java": java, "checks": checks}
+    text = json.dumps(results, indent= 2)
+    if args.output != None:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text, file= sys.__stdout__)
+    shutil.rmtree(directory, ignore_errors= True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+'''
+    Stress test of declared functions called from many threads at once, like the request handlers of a web server:
+
+        python benchmarks/stress.py [--threads 1,2,4,8] [--calls 20000] [--io-ms 0.2] [--switch-interval 1e-5] [--output stress.json]
+
+    Every thread calls functions declared with the link relations of bench_ontology.py, which the compiled tables
+    decide, on pairs of nodes of every kind. Each call also sleeps io-ms milliseconds, the time a handler waits for I/O.
+    A short switch interval makes the interpreter switch threads often, in the middle of the checker's code.
+    For every thread count, the script reports the calls per second, and checks that the state of the checker is the
+    one a single thread would have left: every triple checked once, and every call recorded once under its triple,
+    none lost and none twice. With --io-ms 0 the threads only contend for the checker itself.
+    The exit status is 1 if a check failed.
+'''
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+
+here = os.path.dirname(os.path.abspath(__file__))
+package = os.path.join(os.path.dirname(here), "relation-checker")
+
+
+class Node:
+    def __init__(self):
+        self.links = []
+
+for relation in ["link" + letter for letter in "ABCDEF"]:
+    exec("def call_" + relation + "(a, b, pause):\n    if pause:\n        time.sleep(pause)")
+
+
+def run(tools, nodes, relations, threads, calls, pause):
+    '''
+    Function to call the declared functions from threads at once
+
+    :return: Dictionary of the results of the run
+    '''
+    stems = [tools.class_stem(tools.individuals.onto_class(node)) for node in nodes]
+    made = [{} for seed in range(threads)]                 # Calls of every thread, by the key of their triple
+    settled = {}
+    def listener(key, verdict, record):
+        settled[key] = settled.get(key, 0) + 1              # Only the thread that claimed a key settles it
+    tools.verdict_listeners.append(listener)
+    tools.tested_triples.clear()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed):
+        generator = random.Random(seed)
+        functions = [globals()["call_" + relation] for relation in relations]
+        counts = made[seed]
+        barrier.wait()
+        for i in range(calls):
+            function, a, b = generator.randrange(len(functions)), generator.randrange(len(nodes)), generator.randrange(len(nodes))
+            functions[function](nodes[a], nodes[b], pause)
+            key = (stems[a], relations[function], stems[b])
+            counts[key] = counts.get(key, 0) + 1
+
+    started = [threading.Thread(target= worker, args= (seed,)) for seed in range(threads)]
+    for thread in started:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in started:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    tools.wait_all()
+    tools.verdict_listeners.remove(listener)
+
+    expected = {}
+    for counts in made:
+        for key, count in counts.items():
+            expected[key] = expected.get(key, 0) + count
+    recorded = {key: len(entry) - 1 for key, entry in tools.tested_triples.items()}
+    lost = {str(key): count - recorded.get(key, 0) for key, count in expected.items() if count > recorded.get(key, 0)}
+    duplicated = {str(key): count - expected.get(key, 0) for key, count in recorded.items() if count > expected.get(key, 0)}
+    twice = [str(key) for key, count in settled.items() if count > 1]
+    unsettled = [str(key) for key, entry in tools.tested_triples.items() if entry[0] == 0]
+    return {"threads": threads, "calls": threads * calls, "seconds": elapsed, "calls_per_second": threads * calls / elapsed,
+            "distinct_triples": len(tools.tested_triples), "recorded_calls": sum(recorded.values()),
+            "lost_records": sum(lost.values()), "duplicate_records": sum(duplicated.values()), "lost": dict(list(lost.items())[:10]),
+            "duplicated": dict(list(duplicated.items())[:10]), "settled_twice": twice[:10], "unsettled": unsettled[:10],
+            "ok": len(lost) == 0 and len(duplicated) == 0 and len(twice) == 0 and len(unsettled) == 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description= "Stress test of relation-checker with many threads.")
+    parser.add_argument("--threads", default= "1,2,4,8", help= "comma separated thread counts")
+    parser.add_argument("--calls", type= int, default= 20000, help= "calls made by every thread")
+    parser.add_argument("--io-ms", type= float, default= 0.2, help= "milliseconds every call waits, as for I/O")
+    parser.add_argument("--switch-interval", type= float, default= 1e-5, help= "seconds between two thread switches of the interpreter")
+    parser.add_argument("--output", help= "file the JSON results are written to, printed if not given")
+    args = parser.parse_args()
+
+    sys.path.insert(0, package)
+    import ontology
+    ontology.set_ontology(os.path.join(here, "bench_ontology.py"))
+    import tools
+    bench_ontology = ontology.load()
+    relations = bench_ontology["relation_names"]
+    nodes = []
+    for kind in bench_ontology["kind_names"]:
+        tools.declare(ontology.entity(kind), Node, value_overwrite= False)
+        nodes.append(Node())
+    for relation in relations:
+        tools.declare(ontology.entity(relation), globals()["call_" + relation])
+
+    sys.setswitchinterval(args.switch_interval)
+    runs = [run(tools, nodes, relations, int(threads), args.calls, args.io_ms / 1000) for threads in args.threads.split(",")]
+    results = {"python": sys.version, "cpus": os.cpu_count(), "io_ms": args.io_ms, "switch_interval": args.switch_interval, "runs": runs}
+    text = json.dumps(results, indent= 2)
+    if args.output != None:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text, file= sys.__stdout__)
+    sys.__stdout__.flush()
+    import pool
+    pool.stop_pool()
+    os._exit(0 if all(run["ok"] for run in runs) else 1)                # The end of run report is not part of the stress test
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,3 @@
-from tools import declare
-from utils import enable_print, disable_print, entry_line, print_display_lines, print_overwrites, set_end
\ No newline at end of file
+from tools import declare, declare_many, declared_as
+from precheck import precheck
+from utils import enable_print, disable_print, entry_line, print_display_lines, print_overwrites, set_end, set_pool, set_server, set_batching, set_verdict_store, wait_all, on_complete, set_timeouts, set_facet_batching, set_module_extraction, set_checking, set_trace, set_metrics, metrics_snapshot, set_report_output, set_incremental, retract
\ No newline at end of file
@@ -0,0 +1,112 @@
+'''
+    asyncio interface to the checker.
+    Declared functions keep running synchronously and return right away; the checks they start can be awaited:
+
+        import aio as checker
+        checker.attach()
+        s.add_student(t)
+        allowed = await checker.verdict(s, teaches, t)
+        async for violation in checker.violations():
+            ...
+
+    The workers and the collector thread stay as they are; results are handed to the event loop with call_soon_threadsafe,
+    and the only blocking call (waiting for all checks) runs in the loop's executor.
+'''
+import asyncio
+from collections import defaultdict
+import pool
+import tools
+from utils import individuals, class_stem, stringified_name, tested_triples
+
+
+loop = None                                 # Event loop the verdicts are delivered to
+waiting = defaultdict(list)                 # Key of tested_triples -> futures waiting for its verdict
+undecided = set()                           # Keys settled without a verdict (timed out, reasoner not run), their entry stays at 0
+streams = []                                # One asyncio.Queue per running violations() iterator
+
+
+def attach(event_loop= None):
+    '''
+    Function to deliver verdicts to an event loop. Call it from a coroutine, or pass the loop.
+    '''
+    global loop
+    loop = event_loop if event_loop != None else asyncio.get_running_loop()
+    if settled not in tools.verdict_listeners:
+        tools.verdict_listeners.append(settled)
+
+
+def settled(key, verdict, record):
+    '''
+    Listener registered in tools.verdict_listeners, called from any thread
+    '''
+    if loop != None and not loop.is_closed():
+        loop.call_soon_threadsafe(deliver, key, verdict, record)
+
+
+def deliver(key, verdict, record):
+    if verdict == None:
+        undecided.add(key)
+    for future in waiting.pop(key, []):
+        if not future.done():
+            future.set_result(verdict)
+    if verdict == False:
+        for queue in streams:
+            queue.put_nowait(record)
+
+
+def check_key(subject, relation= None, object= None):
+    '''
+    Function to find the key of tested_triples of a call
+
+    :param subject: Object linked to the ontology, or directly a key of tested_triples
+    :param relation: The ontology relation the function is declared with
+    :param object: Object linked to the ontology
+    '''
+    if relation == None:
+        return subject
+    return (class_stem(individuals.onto_class(subject)), stringified_name(relation), class_stem(individuals.onto_class(object)))
+
+
+async def verdict(subject, relation= None, object= None, timeout= None):
+    '''
+    Coroutine that waits until a triple has been checked
+
+    :param timeout: Maximum number of seconds to wait, None waits until the check is settled
+    :return: True if the triple is allowed, False if it is not, None if it is not checked (no call made it, or its call
+             site is off or sampled out), if its reasoner kept timing out or could not run, or if the timeout passed first
+    '''
+    key = check_key(subject, relation, object)
+    entry = tested_triples.get(key)
+    if entry == None or key in undecided:       # Never claimed by a call, or settled without a verdict already
+        return None
+    if entry[0] != 0:
+        return entry[0] == 1
+    future = asyncio.get_running_loop().create_future()
+    waiting[key].append(future)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:                # The future is cancelled, deliver() skips it
+        return None
+
+
+async def violations():
+    '''
+    Asynchronous iterator over the violations found from now on, as dictionaries
+    (kind, line, file, and subject / relation / object or instance / attribute / value / constraint)
+    '''
+    queue = asyncio.Queue()
+    streams.append(queue)
+    try:
+        while True:
+            yield await queue.get()
+    finally:
+        streams.remove(queue)
+
+
+async def drain(timeout= None):
+    '''
+    Coroutine that waits until every submitted check has finished, without blocking the loop
+
+    :return: True if all checks finished, False if the timeout passed first
+    '''
+    return await asyncio.get_running_loop().run_in_executor(None, pool.wait_all, timeout)
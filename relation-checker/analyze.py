@@ -0,0 +1,105 @@
+'''
+    Offline analyzer of the logs written in trace mode (see set_trace).
+    Reads the logs as a stream, checks every distinct triple and DataProperty value once with the checker workers,
+    and reports the errors with the lines and files of the traced program:
+
+        python analyze.py trace.log [more logs] [--workers 8] [--batch 16] [--store verdicts.sqlite] [--at-end] [--ontology school.owl]
+
+    The ontology is found the same way as for the traced program (see ontology.py), unless --ontology is given.
+    It is only loaded by the workers, for the checks that the compiled tables and the verdict store cannot decide.
+'''
+import argparse
+import os
+import sys
+import ontology
+if __name__ == '__main__':
+    ontology.ontology_option(sys.argv[1:])         # Before tools is imported, which reads the snapshot of the ontology
+from tools import *
+import tracelog
+
+
+def analyze(record, procs, static= False):
+    '''
+    Function to check one record of a log, the same way function_enhancer and instance_initializer do in a traced program
+
+    :param static: True for the checks of precheck, whose calls have not run
+    :return: The key of tested_triples of the check
+    '''
+    if record[0] == "relation":
+        kind, relation, type1, type2, calling_file, calling_line = record
+        inst1 = individuals.individual_name(type1)
+        inst2 = individuals.individual_name(type2)
+        key = (individual_stem(inst1), relation, individual_stem(inst2))
+        if not claim(key, [calling_line, calling_file], static= static):
+            metrics.counts["dedup_hits"] += 1
+            return key
+        dispatch(key, ("relation", (inst1, relation, inst2, calling_line, calling_file, False), (type1, relation, type2), 0), procs)
+    else:
+        kind, constr, cls, inst_name, tested_value, calling_file, calling_line = record
+        instance = stringified_name(individuals.individual_name(cls))
+        key = (constr, inst_name, tested_value)
+        if not claim(key, [calling_line, calling_file, instance], static= static):
+            metrics.counts["dedup_hits"] += 1
+            return key
+        dispatch(key, ("constraint", (constr, instance, calling_line, calling_file, False, tested_value, inst_name), (cls, constr, tested_value), 0), procs)
+    return key
+
+
+def arguments(description, sources, help, store):
+    '''
+    :return: Parser of the command line of analyze.py and precheck.py, which only differ by what they read
+    '''
+    parser = argparse.ArgumentParser(description= description)
+    parser.add_argument(sources, nargs= "+", help= help)
+    parser.add_argument("--workers", type= int, help= "number of checker workers, defaults to the number of CPUs")
+    parser.add_argument("--memory", type= int, help= "JVM heap of the reasoner of each worker in MB")
+    parser.add_argument("--batch", type= int, help= "number of checks reasoned together")
+    parser.add_argument("--store", help= store)
+    parser.add_argument("--at-end", action= "store_true", help= "print the errors once every check has finished")
+    parser.add_argument("--report", help= "file the errors are written to instead of the console, as JSON Lines if it ends with .jsonl")
+    parser.add_argument("--ontology", help= "python module or .owl file of the ontology, Ontologies.py of the current directory by default")
+    return parser
+
+
+def run(args, records, found):
+    '''
+    Function to check records with a pool of workers started for them, and print the errors and a summary
+
+    :param records: Iterable of records in the form of the records of a trace log (see tracelog.py)
+    :param found: What the records are, for the summary
+    :return: Exit status, 1 if a check is not allowed in the ontology
+    '''
+    if args.ontology != None and os.path.abspath(args.ontology) != ontology.ontology_path():
+        ontology.set_ontology(args.ontology)        # Warns, unless nothing has read the ontology yet
+    set_pool(args.workers, args.memory)
+    if args.batch != None:
+        set_batching(args.batch)
+    if args.store != None:
+        set_verdict_store(args.store)
+    if args.at_end:
+        set_end()
+    if args.report != None:
+        set_report_output(args.report)
+
+    pool.start_pool(think, error_reporters, processes, running)
+    count = 0
+    for record in records:
+        analyze(record, processes)
+        count += 1
+    pool.wait_all()
+    pool.stop_pool()
+    print_errors(tested_triples, at_end)
+
+    failed = len([v for v in tested_triples.values() if v[0] < 0])
+    print('\033[1m' + str(count) + " " + found + ", " + str(len(tested_triples)) + " distinct checks, " + str(failed) + " not allowed in your ontology." + '\033[0m')
+    return 1 if failed else 0
+
+
+def main(argv= None):
+    args = arguments("Check the logs written by relation-checker in trace mode.", "logs", "trace logs to check",
+                     "SQLite file of the verdict store, shared with the traced program").parse_args(argv)
+    return run(args, (record for path in args.logs for record in tracelog.read(path)), "calls")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
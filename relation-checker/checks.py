@@ -0,0 +1,53 @@
+'''
+    Order in which a check is decided without the reasoner, shared by the declared functions and classes (tools.py),
+    the analyzer of trace logs (analyze.py), precheck (precheck.py) and the checker service (server.py):
+
+        relation        compiled tables, then the verdicts carried along the class hierarchy, then the verdict store
+        constraint      compiled tables, then the facets of the range, then the verdict store
+
+    What none of them decides is left to the reasoner, each caller sending it its own way.
+'''
+import compiler
+import hierarchy
+import metrics
+import verdicts
+
+
+def relation(assertion):
+    '''
+    :param assertion: (class IRI, relation name, class IRI)
+    :return: True / False if the relation is decided without the reasoner, None otherwise
+    '''
+    verdict = compiler.relation_verdict(assertion[1], assertion[0], assertion[2])
+    if verdict != None:
+        metrics.counts["compiled"] += 1
+        return verdict
+    verdict = hierarchy.verdict(assertion[1], assertion[0], assertion[2])      # Carried from a proven pair of sub or superclasses
+    if verdict != None:
+        metrics.counts["propagated"] += 1
+        return verdict
+    verdict = verdicts.lookup("relation", assertion)                            # Proven by the reasoner in an earlier run
+    if verdict != None:
+        metrics.counts["store_hits"] += 1
+        hierarchy.keep(assertion[1], assertion[0], assertion[2], verdict)
+    return verdict
+
+
+def constraint(assertion):
+    '''
+    :param assertion: (class IRI, DataProperty name, value)
+    :return: (verdict, restrictions): True / False if the value is decided without the reasoner, else None and
+             the facets of the range left to evaluate (see facets.py) if the compiled tables allow everything else
+    '''
+    verdict = compiler.constraint_verdict(assertion[1], assertion[0], assertion[2])
+    if verdict != None:
+        metrics.counts["compiled"] += 1
+        return verdict, None
+    restrictions = compiler.constraint_facets(assertion[1], assertion[0], assertion[2])
+    if restrictions != None:
+        metrics.counts["facets"] += 1
+        return None, restrictions
+    verdict = verdicts.lookup("constraint", assertion)
+    if verdict != None:
+        metrics.counts["store_hits"] += 1
+    return verdict, None
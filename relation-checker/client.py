@@ -0,0 +1,193 @@
+'''
+    Client of the checker service (see server.py), used instead of local workers after set_server().
+    Each process keeps one connection to the service. The checks of a batch are written to it at once, without
+    waiting for the answers to earlier ones, and a reader thread hands every answer to the error reporters as it comes.
+    Checks the service does not take (graph checks, DataProperty values other than numbers, checks it refuses)
+    run on workers of the program instead. So do the checks a lost connection was carrying, and the batches sent
+    while the service cannot be reached; every batch tries to open a new connection.
+'''
+import itertools
+import json
+import math
+import os
+import socket
+import threading
+import metrics
+import reports
+import ontology
+import verdicts
+
+
+address = None                  # "unix:/path/of/socket" or "tcp:host:port"
+connection = None               # Socket to the service, None when not connected
+connection_pid = None           # Forked processes open a connection of their own
+write_lock = threading.Lock()
+outstanding = {}                # Request id -> (connection it was sent on, check waiting for its answer)
+ids = itertools.count(1)
+reporters = None                # error_reporters of tools.py
+finished = None                 # Function called with the number of checks that got an answer
+run_here = None                 # Function that sends checks to the workers of the program (pool.run_here)
+warned = False                  # The service being unreachable is only printed once
+
+
+def open_socket(where):
+    kind, separator, place = where.partition(":")
+    if kind == "unix":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(place)
+    elif kind == "tcp":
+        host, separator, port = place.rpartition(":")
+        sock = socket.create_connection((host, int(port)))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)      # Answers are small, they are not held back
+    else:
+        raise ValueError("Address of the checker service must start with unix: or tcp:, not " + repr(where))
+    return sock
+
+
+def connect(where, report, done, local):
+    '''
+    Function called by start_pool to use the service at where
+
+    :param report: Error reporters, called with the answers of the service
+    :param done: Function called with the number of checks that got an answer
+    :param local: Function that runs checks on the workers of the program
+    :return: True if the service answered and checks the same ontology, False to use local workers
+    '''
+    global address, reporters, finished, run_here
+    address, reporters, finished, run_here = where, report, done, local
+    with write_lock:
+        if reconnect():
+            return True
+    address = None                                  # Only local workers from now on
+    return False
+
+
+def reconnect():
+    '''
+    Function that opens the connection of the current process, called with write_lock held
+    '''
+    global connection, connection_pid, warned
+    if connection_pid != os.getpid():               # Checks of the parent process are answered to the parent
+        outstanding.clear()
+    connection = None
+    connection_pid = os.getpid()
+    try:
+        sock = open_socket(address)
+        stream = sock.makefile('rb')
+        greeting = json.loads(stream.readline())
+    except (OSError, ValueError) as error:
+        if warned:
+            return False
+        warned = True
+        reports.report({"kind": "warning", "message": "the checker service at " + address + " cannot be reached (" + str(error) + "), checks run in this program."})
+        return False
+    if greeting.get("ontology") != verdicts.ontology_fingerprint(ontology.ontology_path()):
+        reports.report({"kind": "warning", "message": "the checker service at " + address + " checks another version of the ontology."})
+        sock.close()
+        return False
+    connection = sock
+    threading.Thread(target= reader, args= (sock, stream), daemon= True).start()
+    metrics.counts["service_connections"] += 1
+    return True
+
+
+def servable(task):
+    '''
+    :return: True if the service takes the check: the same rules as assertable() in server.py
+    '''
+    if task[0] == "relation":
+        return True
+    value = task[2][2]
+    return task[0] == "constraint" and type(value) in (int, float, bool) and (type(value) != float or math.isfinite(value))
+
+
+def deliver(task, verdict):
+    if verdict == False:
+        reporters[task[0]](*task[1])
+    else:
+        reporters["settled"](task, verdict)             # None if the service could not decide
+
+
+def reader(sock, stream):
+    '''
+    Thread that reads the answers of the service on one connection
+    '''
+    try:
+        for line in stream:
+            answer = json.loads(line)
+            request = outstanding.pop(answer.get("id"), None)
+            if request == None:
+                continue
+            if answer.get("refused"):                   # Not finished yet: counted by the workers of the program
+                metrics.counts["refused"] += 1
+                run_here([request[1]])
+                continue
+            deliver(request[1], answer.get("verdict"))
+            finished(1)
+    except (OSError, ValueError):
+        pass
+    lost(sock)
+
+
+def lost(sock):
+    '''
+    Function that sends the checks of a closed connection to the workers of the program
+    '''
+    global connection
+    with write_lock:
+        if connection is sock:
+            connection = None
+        gone = [request_id for request_id, request in list(outstanding.items()) if request[0] is sock]
+        tasks = [outstanding.pop(request_id)[1] for request_id in gone]
+    if len(tasks) != 0 and metrics.counts["service_lost"] == 0:
+        reports.report({"kind": "warning", "message": "the connection to the checker service at " + str(address) + " was lost, its checks run in this program."})
+    metrics.counts["service_lost"] += len(tasks)
+    run_here(tasks)
+    try:
+        sock.close()
+    except OSError:
+        pass
+
+
+def send(batch):
+    '''
+    Function called by pool.flush to send a batch of checks to the service
+
+    :return: The checks that were not sent, to run on the workers of the program
+    '''
+    unsent = [task for task in batch if not servable(task)]
+    failed = None
+    with write_lock:
+        if connection == None or connection_pid != os.getpid():
+            reconnect()
+        sock = connection
+        if sock == None:                                # Service unreachable: the whole batch runs here
+            return batch
+        lines = []
+        for task in batch:
+            if not servable(task):
+                continue
+            request_id = next(ids)
+            lines.append(json.dumps({"id": request_id, "kind": task[0], "assertion": list(task[2])}))
+            outstanding[request_id] = (sock, task)
+        if len(lines) != 0:
+            try:
+                sock.sendall(("\n".join(lines) + "\n").encode())
+            except OSError:
+                failed = sock
+    if failed != None:
+        lost(failed)
+    return unsent
+
+
+def close():
+    global connection
+    with write_lock:
+        sock = connection
+        connection = None
+    if sock != None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+            sock.close()
+        except OSError:
+            pass
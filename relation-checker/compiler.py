@@ -0,0 +1,191 @@
+'''
+    Precompiled tables for relations and DataProperty constraints that can be decided without the reasoner.
+    A property is compiled when its only axioms are domain, range and inverse_property, and the classes involved
+    only have named superclasses and named disjoints. Everything else is left to think() / constraint().
+    The range of a compiled DataProperty may restrict its datatype with facets (bounds of a number, length of a string),
+    which facets.py evaluates for many values at once.
+'''
+from collections import defaultdict
+import owlready2
+from owlready2 import ThingClass, Nothing, FunctionalProperty, InverseFunctionalProperty
+from owlready2.class_construct import ConstrainedDatatype
+
+
+relation_tables = {}            # ObjectProperty name -> (allowed subject IRIs, forbidden subject IRIs, allowed object IRIs, forbidden object IRIs)
+constraint_tables = {}          # DataProperty name -> (allowed subject IRIs, forbidden subject IRIs, python types of the range, facets of the range)
+
+simple_characteristics = [owlready2.ObjectProperty, owlready2.DataProperty, FunctionalProperty, InverseFunctionalProperty]
+numeric_types = [int, float]    # xsd:integer is derived from xsd:decimal, so these are left to the reasoner when mixed
+known_types = [int, float, str, bool]
+value_facets = ["min_inclusive", "max_inclusive", "min_exclusive", "max_exclusive"]
+length_facets = ["length", "min_length", "max_length"]
+all_facets = value_facets + length_facets + ["pattern", "white_space", "total_digits", "fraction_digits"]
+
+
+def simple_class(cls):
+    '''
+    A class is simple if it is only described by named superclasses
+    '''
+    return all(isinstance(parent, ThingClass) for parent in cls.is_a) and len(cls.equivalent_to) == 0
+
+
+def simple_property(prop):
+    '''
+    A property is simple if it has no characteristics other than functional / inverse functional,
+    no super properties, and its domain and range are named classes (or python datatypes for a DataProperty,
+    possibly restricted by facets the checker can evaluate)
+    '''
+    if any(parent not in simple_characteristics for parent in prop.is_a):
+        return False
+    if not all(isinstance(cls, ThingClass) for cls in prop.domain):
+        return False
+    if isinstance(prop, owlready2.prop.ObjectPropertyClass):
+        return all(isinstance(cls, ThingClass) for cls in prop.range)
+    return all(datatype_restriction(datatype) != None for datatype in prop.range)
+
+
+def datatype_restriction(datatype):
+    '''
+    Function that reads a datatype of the range of a DataProperty
+
+    :return: (python type, {facet: bound}), or None if a facet is not one the checker can evaluate (pattern, digits, white space)
+    '''
+    if isinstance(datatype, type):
+        return (datatype, {})
+    if not isinstance(datatype, ConstrainedDatatype) or datatype.base_datatype not in known_types:
+        return None
+    base = datatype.base_datatype
+    facets = {facet: getattr(datatype, facet) for facet in all_facets if getattr(datatype, facet, None) != None}
+    allowed = length_facets if base == str else (value_facets if base in numeric_types else [])
+    if any(facet not in allowed for facet in facets):
+        return None
+    return (base, facets)
+
+
+def satisfiable(classes, disjoint_pairs):
+    '''
+    Function to decide whether an individual can belong to all of the classes at once
+
+    :param classes: Set of named classes, closed under superclasses
+    :return: True / False, or None if one of the classes is not simple
+    '''
+    if not all(simple_class(cls) for cls in classes):
+        return None
+    if Nothing in classes:
+        return False
+    for cls in classes:
+        if disjoint_pairs[cls] & classes:
+            return False
+    return True
+
+
+def closure(classes):
+    closed = set()
+    for cls in classes:
+        closed |= cls.ancestors()
+    return closed
+
+
+def split(verdicts):
+    '''
+    Function to turn {class: True / False / None} into the allowed and forbidden IRI sets of a table
+    '''
+    return ({cls.iri for cls, v in verdicts.items() if v == True}, {cls.iri for cls, v in verdicts.items() if v == False})
+
+
+def compile_ontology(world= None):
+    '''
+    Function that builds relation_tables and constraint_tables. Called once when utils.py loads the ontology.
+    If a class of the ontology is defined by equivalences, nothing is compiled, since such a class can capture any individual.
+    '''
+    world = world if world != None else owlready2.default_world
+    relation_tables.clear()
+    constraint_tables.clear()
+    all_classes = list(world.classes())
+    if any(len(cls.equivalent_to) != 0 for cls in all_classes):
+        return
+
+    disjoint_pairs = defaultdict(set)
+    for disjoint in world.disjoint_classes():
+        if not all(isinstance(cls, ThingClass) for cls in disjoint.entities):
+            return
+        for cls in disjoint.entities:
+            disjoint_pairs[cls].update(other for other in disjoint.entities if other != cls)
+
+    for prop in world.object_properties():
+        inverse = prop.inverse_property
+        if not simple_property(prop) or (inverse != None and not simple_property(inverse)):
+            continue
+        subject_side = closure(prop.domain + (inverse.range if inverse != None else []))
+        object_side = closure(prop.range + (inverse.domain if inverse != None else []))
+        subjects = {cls: satisfiable(cls.ancestors() | subject_side, disjoint_pairs) for cls in all_classes}
+        objects = {cls: satisfiable(cls.ancestors() | object_side, disjoint_pairs) for cls in all_classes}
+        relation_tables[prop.name] = (*split(subjects), *split(objects))
+
+    for prop in world.data_properties():
+        if not simple_property(prop):
+            continue
+        subject_side = closure(prop.domain)
+        subjects = {cls: satisfiable(cls.ancestors() | subject_side, disjoint_pairs) for cls in all_classes}
+        restrictions = [datatype_restriction(datatype) for datatype in prop.range]
+        facets = [restriction[1] for restriction in restrictions if len(restriction[1]) != 0]
+        if len(facets) != 0 and len(set(restriction[0] for restriction in restrictions)) != 1:
+            continue                                    # Facets on different datatypes are left to the reasoner
+        constraint_tables[prop.name] = (*split(subjects), [restriction[0] for restriction in restrictions], facets)
+
+
+def relation_verdict(relation, type1, type2):
+    '''
+    Function to look up a triple in the compiled tables
+
+    :param relation: Name of the ObjectProperty
+    :param type1: IRI of the ontology class of the first argument
+    :param type2: IRI of the ontology class of the second argument
+    :return: True if the triple is allowed, False if it is not, None if the reasoner has to decide
+    '''
+    table = relation_tables.get(relation)
+    if table == None:
+        return None
+    if type1 in table[1] or type2 in table[3]:
+        return False
+    if type1 in table[0] and type2 in table[2]:
+        return True
+    return None
+
+
+def constraint_verdict(constr, cls, value):
+    '''
+    Function to look up a DataProperty value in the compiled tables
+
+    :param constr: Name of the DataProperty
+    :param cls: IRI of the ontology class of the instance
+    :param value: Value of the linked instance variable
+    :return: True if the value is allowed, False if it is not, None if the reasoner or the facets have to decide
+    '''
+    table = constraint_tables.get(constr)
+    if table == None:
+        return None
+    if cls in table[1]:
+        return False
+    datatypes = table[2]
+    if len(datatypes) != 0 and type(value) not in datatypes:
+        if type(value) not in known_types:
+            return None
+        if type(value) in numeric_types and any(datatype in numeric_types for datatype in datatypes):
+            return None
+        return False
+    if cls in table[0] and len(table[3]) == 0:
+        return True
+    return None
+
+
+def constraint_facets(constr, cls, value):
+    '''
+    Function that finds the facets a DataProperty value still has to satisfy when the compiled tables allow everything else about it
+
+    :return: List of {facet: bound}, all of which the value must satisfy, or None if the reasoner has to decide
+    '''
+    table = constraint_tables.get(constr)
+    if table == None or len(table[3]) == 0 or cls not in table[0] or type(value) not in table[2]:
+        return None
+    return table[3]
@@ -0,0 +1,140 @@
+'''
+    Evaluation of the facets of DataProperty ranges, for the values of many new instances at once:
+
+        with onto:
+            class age(DataProperty):
+                range = [ConstrainedDatatype(int, min_inclusive= 0, max_inclusive= 150)]
+
+    compiler.py keeps the facets of such a range in constraint_tables. When the compiled tables allow everything else
+    about a value, instance_initializer hands it here instead of to the reasoner. Values are collected per DataProperty
+    and evaluated together once batch_size of them are waiting or batch_window seconds have passed, as arrays with NumPy
+    if it is installed, one at a time otherwise.
+'''
+import operator
+import threading
+import compiler
+import metrics
+try:
+    import numpy
+except ImportError:                     # NumPy is optional, values are then compared one at a time
+    numpy = None
+
+
+comparisons = {"min_inclusive": operator.ge, "max_inclusive": operator.le, "min_exclusive": operator.gt, "max_exclusive": operator.lt,
+               "length": operator.eq, "min_length": operator.ge, "max_length": operator.le}
+
+batch_size = 1024                       # Values collected before they are evaluated
+batch_window = 0.1                      # Seconds a value waits at most before it is evaluated
+vectorized_minimum = 16                 # Fewer values are faster to compare without NumPy
+
+pending = {}                            # DataProperty name -> (facets, [tasks])
+pending_count = 0
+pending_lock = threading.Lock()
+evaluation_lock = threading.Lock()      # Held while a batch is reported, so wait_all cannot return in the middle of one
+flush_timer = None
+reporters = None                        # error_reporters of tools.py, set when it is imported
+
+
+def set_facet_batching(size= None, window= None):
+    '''
+    Function to set how values are collected before their facets are evaluated
+
+    :param size: Number of values evaluated together, 1 evaluates every value as soon as its instance is created
+    :param window: Maximum number of seconds a value waits for others
+    '''
+    global batch_size, batch_window
+    if size != None:
+        batch_size = max(1, int(size))
+    if window != None:
+        batch_window = float(window)
+
+
+def satisfies(restriction, value):
+    for facet, bound in restriction.items():
+        measured = len(value) if facet in compiler.length_facets else value
+        if not comparisons[facet](measured, bound):
+            return False
+    return True
+
+
+def vectorized(facets, values):
+    '''
+    :return: List of booleans, or None if the values do not fit in a NumPy array of numbers
+    '''
+    try:
+        if isinstance(values[0], str):
+            measured = numpy.fromiter((len(value) for value in values), dtype= numpy.int64, count= len(values))
+        else:
+            measured = numpy.asarray(values)
+            if measured.dtype.kind not in "iuf":            # Integers beyond 64 bits
+                return None
+        passed = numpy.ones(len(values), dtype= bool)
+        for restriction in facets:
+            for facet, bound in restriction.items():
+                passed &= comparisons[facet](measured, bound)
+        return passed.tolist()
+    except (OverflowError, TypeError):                  # A bound beyond 64 bits
+        return None
+
+
+def evaluate(facets, values):
+    '''
+    Function to evaluate the facets of a DataProperty for a batch of values
+
+    :param facets: List of {facet: bound}, all of which the values must satisfy
+    :param values: Values of the python type of the range
+    :return: List of booleans, True for the values that satisfy every facet
+    '''
+    if numpy != None and len(values) >= vectorized_minimum:
+        passed = vectorized(facets, values)
+        if passed != None:
+            return passed
+    return [all(satisfies(restriction, value) for restriction in facets) for value in values]
+
+
+def submit(facets, task):
+    '''
+    Function to collect a value whose facets have to be evaluated
+
+    :param facets: Facets of the DataProperty, from compiler.constraint_facets
+    :param task: Tuple ("constraint", arguments of constraint_error, assertion, 0), as given to pool.submit
+    '''
+    global flush_timer, pending_count
+    with pending_lock:
+        constr = task[2][1]
+        if constr not in pending:
+            pending[constr] = (facets, [])
+        pending[constr][1].append(task)
+        pending_count += 1
+        if pending_count < batch_size:
+            if flush_timer == None:
+                flush_timer = threading.Timer(batch_window, flush)
+                flush_timer.daemon = True
+                flush_timer.start()
+            return
+    flush()
+
+
+def flush():
+    '''
+    Function to evaluate every collected value and report the ones that violate their facets
+    '''
+    global flush_timer, pending_count
+    with evaluation_lock:
+        with pending_lock:
+            if flush_timer != None:
+                flush_timer.cancel()
+                flush_timer = None
+            batches = list(pending.values())
+            pending.clear()
+            pending_count = 0
+        for facets, tasks in batches:
+            passed = evaluate(facets, [task[2][2] for task in tasks])
+            for task, ok in zip(tasks, passed):
+                if ok:
+                    reporters["settled"](task, True)
+                else:
+                    reporters["constraint"](*task[1])
+
+
+metrics.gauges["pending_facet_checks"] = lambda: pending_count
@@ -0,0 +1,302 @@
+'''
+    Incremental checking of the objects linked to the ontology, as a whole:
+
+        set_incremental()                   # Before the declarations
+
+    The checks of declared functions and classes are about classes: a Teacher may teach a Student. They cannot see
+    what only the objects together break, such as a functional relation given a second value, a maximum cardinality
+    passed by the fifth link, or an object that becomes an instance of two disjoint classes through its links.
+    In incremental mode, a mirror of the linked objects is kept here: their classes, the links made by declared
+    functions and the values of declared instance variables. Every link added and every value changed is a change,
+    and the change is checked together with the part of the mirror around it:
+
+        the objects of the change, and those up to depth links away from them
+        at most fanout links of each object for each relation and direction, the newest ones
+        the values of these objects and the links between them
+
+    so the cost of a check depends on the size of the change and not on the history of the program. The objects of
+    a part are declared AllDifferent, since OWL does not assume that two individuals are two objects: without it,
+    the reasoner would make the two values of a functional relation one individual instead of failing. A part of the
+    graph is a subset of the whole graph, so a change reported as inconsistent always is; consequences that travel
+    further than depth links are not seen. Removed links (retract() and collected objects) never make the graph
+    inconsistent, so they only update the mirror.
+
+    A part of the graph is described without the objects themselves (classes numbered in the order they are reached,
+    links and values between the numbers), and its verdict is kept for the next change with the same description,
+    so a program repeating the same patterns only reasons about each of them once. An inconsistent change is
+    reported, and left out of the mirror so the next changes are not reported because of it.
+'''
+import threading
+import owlready2
+import ontology
+import individuals
+import metrics
+import pool
+import verdicts
+
+
+enabled = False                 # Set by set_incremental
+depth = 2                       # Links followed from the objects of a change
+fanout = None                   # Links kept per object, relation and direction, from the cardinalities of the ontology if None
+shapes_kept = 100000            # Verdicts of parts of the graph kept in memory
+
+nodes = {}                      # id(object) -> [class IRI, {relation: {id: None}} of links from it, same for links to it, {property: value}]
+dropped = []                    # Ids of collected objects, removed from nodes at the next change
+shapes = {}                     # Description of a part of the graph -> True / False
+waiting = {}                    # Description sent to the workers -> [[record, fail_quit, undo, class triple], ...] of its changes
+errors = []                     # Records of the inconsistent changes, listed again at the end with set_end()
+graph_lock = threading.Lock()   # Held while the mirror changes and a part of it is read, never around the reasoner or I/O
+
+
+def set_incremental(on= True, depth= None, fanout= None):
+    '''
+    Function to check the objects linked to the ontology as a graph, change by change. Has to be called before the declarations.
+
+    :param on: False checks the calls one by one only, as before
+    :param depth: Number of links followed from the objects of a change, 2 by default
+    :param fanout: Number of links kept per object and relation, one more than the largest cardinality of the ontology by default
+    '''
+    global enabled
+    settings = globals()
+    if depth != None:
+        settings["depth"] = max(1, int(depth))
+    if fanout != None:
+        settings["fanout"] = max(1, int(fanout))
+    enabled = bool(on)
+    if enabled and dropped.append not in individuals.forget_listeners:
+        individuals.forget_listeners.append(dropped.append)
+
+
+def largest_fanout():
+    '''
+    :return: One more than the largest cardinality of a restriction of the ontology, and at least 2
+    '''
+    ontology.load()
+    largest = 1
+    query = ("SELECT ?n WHERE { { ?r owl:maxCardinality ?n } UNION { ?r owl:maxQualifiedCardinality ?n } "
+             "UNION { ?r owl:cardinality ?n } UNION { ?r owl:qualifiedCardinality ?n } }")
+    try:
+        for row in owlready2.default_world.sparql(query):
+            largest = max(largest, int(row[0]))
+    except Exception:
+        pass
+    return largest + 1
+
+
+def sweep():
+    '''
+    Function to remove the collected objects from the mirror, called with graph_lock held
+    '''
+    while len(dropped) != 0:
+        key = dropped.pop()
+        node = nodes.pop(key, None)
+        if node == None:
+            continue
+        for relation, targets in node[1].items():
+            for target in targets:
+                if target in nodes:
+                    nodes[target][2].get(relation, {}).pop(key, None)
+        for relation, sources in node[2].items():
+            for source in sources:
+                if source in nodes:
+                    nodes[source][1].get(relation, {}).pop(key, None)
+
+
+def node(object):
+    '''
+    :return: The id of a linked object, added to the mirror if needed, or None if the object is not linked
+    '''
+    cls = individuals.onto_class(object)
+    if cls == None:
+        return None
+    key = id(object)
+    entry = nodes.get(key)
+    if entry == None:
+        entry = nodes[key] = [cls.iri, {}, {}, {}]
+    entry[0] = cls.iri                              # Initializers of a declared class and of its declared parent class
+    return key
+
+
+def constructed(object, values):
+    '''
+    Function called by instance_initializer with the values of the declared instance variables of a new object
+    '''
+    with graph_lock:
+        sweep()
+        key = node(object)
+        if key != None:
+            for constr, value in values:
+                if hashable(value):
+                    nodes[key][3][constr] = value
+
+
+def added(subject, relation, object, record, triple, fail_quit, procs):
+    '''
+    Function called by declared functions with a link between two linked objects
+
+    :param record: Violation record reported if the link makes the graph inconsistent
+    :param triple: Key of tested_triples of the call, whose own failure is reported instead
+    '''
+    with graph_lock:
+        sweep()
+        first, second = node(subject), node(object)
+        if first == None or second == None:
+            return
+        targets = nodes[first][1].setdefault(relation, {})
+        targets.pop(second, None)                   # Newest link last
+        targets[second] = None
+        sources = nodes[second][2].setdefault(relation, {})
+        sources.pop(first, None)
+        sources[first] = None
+        description = describe([first, second], relation)
+    decide(description, [record, fail_quit, ("link", first, relation, second), triple], procs)
+
+
+def changed(object, constr, value, record, fail_quit, procs):
+    '''
+    Function called when a declared instance variable of a linked object is given a new value
+    '''
+    if not hashable(value):
+        return
+    with graph_lock:
+        sweep()
+        key = node(object)
+        if key == None or (constr in nodes[key][3] and nodes[key][3][constr] == value):
+            return
+        nodes[key][3][constr] = value
+        description = describe([key], constr)
+    decide(description, [record, fail_quit, ("value", key, constr, value), None], procs)
+
+
+def retract(subject, relation, object):
+    '''
+    Function to tell the checker that a link between two objects does not hold anymore
+
+    :param relation: The ontology relation the link was made with, or its name
+    '''
+    name = relation if isinstance(relation, str) else relation.name
+    with graph_lock:
+        sweep()
+        first, second = id(subject), id(object)
+        if first in nodes:
+            nodes[first][1].get(name, {}).pop(second, None)
+        if second in nodes:
+            nodes[second][2].get(name, {}).pop(first, None)
+
+
+def hashable(value):
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+
+def describe(start, name):
+    '''
+    Function that reads the part of the mirror around a change, called with graph_lock held
+
+    :param start: Ids of the objects of the change, numbered first
+    :param name: Relation or DataProperty of the change
+    :return: (class IRIs, name, (links, values)), links as (number, relation, number) and values as (number, property, value)
+    '''
+    global fanout
+    if fanout == None:
+        fanout = largest_fanout()
+    numbers = {}
+    for key in start:
+        numbers.setdefault(key, len(numbers))
+    links = set()
+    frontier = list(numbers)
+    for level in range(depth):
+        reached = []
+        for key in frontier:
+            entry = nodes[key]
+            for direction in (1, 2):
+                for relation in sorted(entry[direction]):
+                    others = [other for other in entry[direction][relation] if other in nodes][-fanout:]
+                    for other in sorted(others, key= lambda other: (other not in numbers, nodes[other][0], sorted(nodes[other][3].items(), key= repr))):
+                        if other not in numbers:
+                            numbers[other] = len(numbers)
+                            reached.append(other)
+                        pair = (numbers[key], relation, numbers[other]) if direction == 1 else (numbers[other], relation, numbers[key])
+                        links.add(pair)
+        frontier = reached
+    classes = [None] * len(numbers)
+    values = []
+    for key, number in numbers.items():
+        classes[number] = nodes[key][0]
+        values.extend((number, constr, value) for constr, value in nodes[key][3].items())
+    return (tuple(classes), name, (tuple(sorted(links)), tuple(sorted(values, key= repr))))
+
+
+def decide(description, change, procs):
+    '''
+    Function that gives the verdict of a change from the verdicts kept, or sends its part of the graph to the workers
+    '''
+    metrics.counts["graph_changes"] += 1
+    if len(description[2][0]) == 0 and len(description[2][1]) == 0:
+        return
+    verdict = shapes.get(description)
+    if verdict == None:
+        verdict = verdicts.lookup("graph", description)         # Proven by the reasoner in an earlier run
+        if verdict != None:
+            keep(description, verdict)
+    if verdict != None:
+        metrics.counts["graph_hits"] += 1
+        if verdict == False:
+            reporters["graph"](description, [change])
+        return
+    with graph_lock:
+        if description in waiting:                  # Same part of the graph already with the workers
+            waiting[description].append(change)
+            return
+        waiting[description] = [change]
+    metrics.counts["graph_submitted"] += 1
+    pool.submit(("graph", (description,), description, 0), procs)
+
+
+def keep(description, verdict):
+    if len(shapes) >= shapes_kept:
+        shapes.pop(next(iter(shapes)), None)
+    shapes[description] = verdict
+
+
+def settled(description, verdict):
+    '''
+    Function called when the workers found a part of the graph consistent, or gave up on it (verdict None)
+    '''
+    if verdict == True:
+        keep(description, True)
+    with graph_lock:
+        waiting.pop(description, None)
+
+
+def failed(description, changes= None):
+    '''
+    Function called by the error reporter of an inconsistent part of the graph. Its changes are left out of the mirror.
+
+    :param changes: Changes found inconsistent without the workers, the ones waiting for the part otherwise
+    :return: The changes, [record, fail_quit, undo, class triple]
+    '''
+    keep(description, False)
+    with graph_lock:
+        if changes == None:
+            changes = waiting.pop(description, [])
+        for change in changes:
+            undo = change[2]
+            entry = nodes.get(undo[1])
+            if entry == None:
+                continue
+            if undo[0] == "link":
+                entry[1].get(undo[2], {}).pop(undo[3], None)
+                if undo[3] in nodes:
+                    nodes[undo[3]][2].get(undo[2], {}).pop(undo[1], None)
+            elif undo[2] in entry[3] and entry[3][undo[2]] == undo[3]:
+                del entry[3][undo[2]]
+    return changes
+
+
+reporters = {}                  # Set by tools: "graph" -> the error reporter of an inconsistent part of the graph
+
+metrics.gauges["graph_objects"] = lambda: len(nodes)
@@ -0,0 +1,65 @@
+'''
+    Verdicts of relation checks carried along the class hierarchy of the ontology.
+    A check asks whether an individual of a class may be linked by a relation to an individual of another class.
+    An individual of a subclass is also an individual of its class, so:
+
+        Student.teaches.Teacher not allowed     ->  ClassClown.teaches.Teacher not allowed, as every pair of subclasses
+        Teacher.teaches.Student allowed         ->  Teacher.teaches.Person allowed, as every pair of superclasses
+
+    Only the superclasses the ontology states (the hierarchy of the snapshot) are used, so a carried verdict is one
+    the reasoner would give. Allowed pairs are carried up when they are proven; forbidden pairs are found by looking
+    up the superclasses of a new pair, and kept for the next calls.
+
+    Only verdicts of the reasoner are carried: a pair is forbidden when sync_reasoner found its individuals inconsistent,
+    never when the reasoner could not run (think() settles those checks without a verdict, and they are dropped here).
+'''
+import ontology
+
+
+known = {}                      # Relation name -> {(subject class IRI, object class IRI): verdict}
+pending = {}                    # Key of tested_triples -> (class IRI, relation, class IRI) of a check sent to the reasoner
+
+
+def ancestors(iri):
+    return ontology.snapshot["hierarchy"].get(iri) or [iri]
+
+
+def verdict(relation, subject, object):
+    '''
+    :return: The verdict of a relation between individuals of two classes carried from a proven pair, or None
+    '''
+    table = known.get(relation)
+    if table == None:
+        return None
+    found = table.get((subject, object))
+    if found != None:
+        return found
+    for ancestor1 in ancestors(subject):
+        for ancestor2 in ancestors(object):
+            if table.get((ancestor1, ancestor2)) == False:
+                table[(subject, object)] = False
+                return False
+    return None
+
+
+def keep(relation, subject, object, verdict):
+    '''
+    Function to keep a proven verdict, with the verdicts it gives to the superclass pairs if it is allowed
+    '''
+    table = known.setdefault(relation, {})
+    if verdict == False:
+        table[(subject, object)] = False
+        return
+    for ancestor1 in ancestors(subject):
+        for ancestor2 in ancestors(object):
+            table.setdefault((ancestor1, ancestor2), True)
+
+
+def settled(key, verdict, record= None):
+    '''
+    Listener of tools.verdict_listeners, called when a check is decided, or given up on with verdict None
+    '''
+    assertion = pending.pop(key, None)
+    if assertion == None or verdict == None:    # Not sent to the reasoner, or not decided by it: nothing is carried
+        return
+    keep(assertion[1], assertion[0], assertion[2], verdict)
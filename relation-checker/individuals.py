@@ -0,0 +1,121 @@
+'''
+    Links between the objects of the user's code and the ontology. An object constructed by a declared class is only
+    linked to its ontology class. The individual of the ontology is created the first time a check needs it (the name
+    of the instance in a constraint error), and destroyed once the object is collected, so a long running program keeps
+    neither its objects nor their individuals alive.
+
+    Links are keyed by id() and hold a weak reference, so objects do not have to be hashable. Objects that cannot be
+    weakly referenced (classes with __slots__ and no __weakref__) are held strongly, as before.
+    Individuals are created and destroyed under world_lock, since threads of the user's code may need them at once.
+'''
+import threading
+import weakref
+import owlready2
+import ontology
+import metrics
+
+
+links = {}                      # id(object) -> [function returning the object while it lives, ontology class, individual or None]
+collected = []                  # Individuals of collected objects, destroyed at the next link() or individual()
+forget_listeners = []           # Functions called with the id of every collected object (see graph.py), from the weak reference callback
+individual_names = {}           # Class IRI -> name of an individual of the class, as str() gives it
+world_lock = threading.RLock()  # Held around the changes this module makes to the owlready2 world
+
+
+def forget(key):
+    '''
+    Returns the callback of the weak reference of a linked object. It may run in the middle of any code of the thread
+    that drops the object, so it only unlinks it: the individual is destroyed later, outside of owlready2 calls.
+    '''
+    def callback(reference):
+        entry = links.pop(key, None)
+        for listener in forget_listeners:
+            listener(key)
+        if entry != None and entry[2] != None:
+            collected.append(entry[2])
+    return callback
+
+
+def sweep():
+    '''
+    Function to destroy the individuals of the objects collected since the last call
+    '''
+    with world_lock:
+        while len(collected) != 0:
+            individual = collected.pop()
+            try:
+                owlready2.destroy_entity(individual)
+            except Exception:                   # Already destroyed with its ontology
+                pass
+            metrics.counts["individuals_destroyed"] += 1
+
+
+def link(object, cls):
+    '''
+    Function to link an object to an ontology class, called by instance_initializer
+
+    :param object: Object constructed by a declared class
+    :param cls: Ontology class of the object
+    '''
+    if len(collected) != 0:
+        sweep()
+    key = id(object)
+    entry = links.get(key)
+    if entry != None and entry[0]() is object:            # Initializers of a declared class and of its declared parent class
+        if entry[2] != None and entry[1] != cls:
+            collected.append(entry[2])
+            entry[2] = None
+        entry[1] = cls
+        return
+    try:
+        target = weakref.ref(object, forget(key))
+    except TypeError:
+        target = lambda: object
+    links[key] = [target, cls, None]
+
+
+def onto_class(object):
+    '''
+    :return: The ontology class the object is linked to, or None if it is not linked
+    '''
+    entry = links.get(id(object))
+    if entry == None or entry[0]() is not object:
+        return None
+    return entry[1]
+
+
+def individual(object):
+    '''
+    Function that returns the individual of a linked object, creating it the first time
+
+    :return: The individual, or None if the object is not linked
+    '''
+    entry = links.get(id(object))
+    if entry == None or entry[0]() is not object:
+        return None
+    if entry[2] != None:
+        return entry[2]
+    with world_lock:
+        sweep()
+        if entry[2] == None:                    # Another thread may have created it meanwhile
+            entry[2] = entry[1]()
+            metrics.counts["individuals_created"] += 1
+    return entry[2]
+
+
+def individual_name(iri):
+    '''
+    Function that returns str() of an individual of an ontology class, the form error reporters take it in,
+    without creating one if the snapshot of the ontology already knows it
+    '''
+    name = individual_names.get(iri, ontology.snapshot["individual_names"].get(iri))
+    if name == None:
+        with world_lock:
+            example = owlready2.default_world[iri]()
+            name = individual_names[iri] = str(example)
+            owlready2.destroy_entity(example)
+    return name
+
+
+metrics.gauges["linked_objects"] = lambda: len(links)
+metrics.gauges["individuals"] = lambda: metrics.counts["individuals_created"] - metrics.counts["individuals_destroyed"]
@@ -0,0 +1,224 @@
+'''
+    Locality-based modules of the ontology, so that a worker reasons about a check over the part of the ontology
+    the check depends on instead of the whole world.
+
+    The module of a relation or of a DataProperty starts from the signature of the property and of the classes
+    of the checked individuals. Every axiom that mentions the signature in a way that can constrain it (it is not
+    bottom-local) is added to the module, and its own entities to the signature, until nothing changes:
+        Student subClassOf Person       added once Student is in the signature
+        teaches domain Teacher          added once teaches is in the signature
+        Student disjointWith Teacher    added once both are in the signature
+        AllDisjoint([A, B, C])          added once two of them are in the signature
+        teaches inverseOf taught_by     added once either is in the signature
+    Anything else (restrictions, equivalences, axioms without a named subject) is added as soon as one of its entities
+    is in the signature, which can only make the module larger than needed, never wrong.
+
+    Axioms are read from the world as N-Triples, once per worker. A module grows when a check brings classes
+    it does not cover yet, and the worlds built from modules are kept for the next checks of the same relations.
+    Everything is keyed by the hash of the ontology file, as the snapshot is, so a changed ontology never reuses them.
+'''
+import io
+import re
+import owlready2
+import ontology
+import verdicts
+
+
+enabled = True                  # False reasons about every check over the whole world, as before
+worlds_kept = 16                # Worlds built from modules kept by each worker
+
+line_pattern = re.compile(r'(\S+) (\S+) (.*) \.$')
+builtin_prefixes = ("<http://www.w3.org/2002/07/owl#", "<http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+                    "<http://www.w3.org/2000/01/rdf-schema#", "<http://www.w3.org/2001/XMLSchema#")
+rdf_type = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+subject_predicates = {"<http://www.w3.org/2000/01/rdf-schema#subClassOf>", "<http://www.w3.org/2000/01/rdf-schema#subPropertyOf>",
+                      "<http://www.w3.org/2000/01/rdf-schema#domain>", "<http://www.w3.org/2000/01/rdf-schema#range>"}
+pair_predicates = {"<http://www.w3.org/2002/07/owl#disjointWith>", "<http://www.w3.org/2002/07/owl#propertyDisjointWith>"}
+pair_types = {"<http://www.w3.org/2002/07/owl#AllDisjointClasses>", "<http://www.w3.org/2002/07/owl#AllDisjointProperties>",
+              "<http://www.w3.org/2002/07/owl#AllDifferent>"}
+ontology_type = "<http://www.w3.org/2002/07/owl#Ontology>"
+
+fingerprint = None              # Hash of the ontology file the axioms were read for
+axioms = []                     # [triggers needed in the signature, trigger entities, entities added to the signature, lines]
+triggered_by = {}               # Entity -> indexes in axioms of the axioms it can add
+modules = {}                    # Property name -> [signature, set of axiom indexes, version]
+worlds = {}                     # ((property name, version), ...) -> owlready2 World of the union of the modules
+
+
+def set_module_extraction(on= True):
+    '''
+    Function to choose whether workers reason about each check over a module of the ontology (the default)
+    or over the whole ontology
+
+    :param on: False reasons over the whole ontology
+    '''
+    global enabled
+    enabled = bool(on)
+
+
+def named(term):
+    return term.startswith("<") and not term.startswith(builtin_prefixes)
+
+
+def read_axioms():
+    '''
+    Function that splits the ontology loaded in the worker into axioms: one triple with a named subject, or a tree
+    of triples under a blank node no triple points to, together with the blank nodes they point to
+    '''
+    global fingerprint
+    invalidate()
+    roots = set()
+    fingerprint = verdicts.ontology_fingerprint(ontology.ontology_path())
+    ontology.load()
+    triples = []
+    for number, onto in enumerate(owlready2.default_world.ontologies.values()):
+        data = io.BytesIO()
+        onto.save(file= data, format= "ntriples")
+        for line in data.getvalue().decode().splitlines():
+            match = line_pattern.match(line)
+            if match == None:
+                continue
+            terms = [term.replace("_:", "_:o" + str(number) + "n", 1) if term.startswith("_:") else term for term in match.groups()]
+            triples.append((*terms, " ".join(terms) + " ."))            # Blank nodes of two ontologies never share a label
+    ontologies = {triple[0] for triple in triples if triple[1] == rdf_type and triple[2] == ontology_type}
+    children = {}
+    pointed = set()
+    for triple in triples:
+        if triple[0].startswith("_:"):
+            children.setdefault(triple[0], []).append(triple)
+        if triple[2].startswith("_:"):
+            pointed.add(triple[2])
+
+    def tree(node, lines, entities):
+        for triple in children.get(node, []):
+            lines.append(triple[3])
+            entities.update(term for term in triple[1:3] if named(term))
+            if triple[2].startswith("_:"):
+                tree(triple[2], lines, entities)
+
+    for triple in triples:
+        subject, predicate, object = triple[:3]
+        if subject in ontologies:                   # Declarations and imports of the ontologies, whose axioms are all read here
+            continue
+        if subject.startswith("_:"):
+            if subject in pointed or subject in roots:
+                continue
+            roots.add(subject)
+            lines, entities = [], set()
+            tree(subject, lines, entities)
+            pairwise = any(triple[1] == rdf_type and triple[2] in pair_types for triple in children[subject])
+            add_axiom(2 if pairwise and len(entities) > 1 else 1, entities, entities, lines)
+            continue
+        lines, entities = [triple[3]], {subject}
+        entities.update(term for term in (predicate, object) if named(term))
+        if object.startswith("_:"):
+            tree(object, lines, entities)
+        if predicate in subject_predicates or (predicate == rdf_type and not named(object)):
+            add_axiom(1, {subject}, entities, lines)
+        elif predicate in pair_predicates and named(object) and object != subject:
+            add_axiom(2, {subject, object}, entities, lines)
+        else:
+            add_axiom(1, entities, entities, lines)
+
+
+def add_axiom(needed, triggers, entities, lines):
+    index = len(axioms)
+    axioms.append([needed, triggers, entities, lines])
+    for entity in triggers:
+        triggered_by.setdefault(entity, []).append(index)
+
+
+def grow(module, entities):
+    '''
+    Function that adds entities to the signature of a module, with every axiom they make non-local
+    '''
+    signature, included = module[0], module[1]
+    waiting = [entity for entity in entities if entity not in signature]
+    signature.update(waiting)
+    while len(waiting) != 0:
+        for index in triggered_by.get(waiting.pop(), []):
+            if index in included:
+                continue
+            needed, triggers, added = axioms[index][:3]
+            if needed > 1 and len(triggers & signature) < needed:
+                continue
+            included.add(index)
+            new = added - signature
+            signature.update(new)
+            waiting.extend(new)
+
+
+def module(name, classes):
+    '''
+    :param name: Name of the ObjectProperty or DataProperty of the checks
+    :param classes: IRIs of the classes of their individuals
+    :return: The module of the property, grown to cover the classes
+    '''
+    if name not in modules:
+        modules[name] = [set(), set(), 0]
+        grow(modules[name], ["<" + ontology.entity(name).iri + ">"])
+    entry = modules[name]
+    missing = ["<" + iri + ">" for iri in classes if "<" + iri + ">" not in entry[0]]
+    if len(missing) != 0:
+        grow(entry, missing)
+        entry[2] += 1
+    return entry
+
+
+def signature(task):
+    '''
+    :return: (property name, IRIs of the classes of its individuals) of each assertion of a check
+    '''
+    assertion = task[2]
+    if task[0] == "relation":
+        return [(assertion[1], [assertion[0], assertion[2]])]
+    if task[0] == "constraint":
+        return [(assertion[1], [assertion[0]])]
+    classes = assertion[0]                              # Part of the graph, see graph.py
+    return [(link[1], [classes[link[0]], classes[link[2]]]) for link in assertion[2][0]] + \
+           [(value[1], [classes[value[0]]]) for value in assertion[2][1]]
+
+
+def world_for(batch):
+    '''
+    Function called by think() to get the world it reasons about a batch in
+
+    :param batch: Checks (kind, arguments of the error reporter, arguments of the individual maker, attempt)
+    :return: owlready2 World holding the modules of the checks, or the default world if modules are not used
+    '''
+    if not enabled:
+        return owlready2.default_world
+    if fingerprint == None:
+        read_axioms()
+    classes = {}
+    for task in batch:
+        for name, iris in signature(task):
+            classes.setdefault(name, set()).update(iris)
+    used = [(name, module(name, iris)) for name, iris in sorted(classes.items())]
+    key = tuple((name, entry[2]) for name, entry in used)
+    if key in worlds:
+        return worlds[key]
+    included = set()
+    for name, entry in used:
+        included |= entry[1]
+    lines = [line for index in sorted(included) for line in axioms[index][3]]
+    world = owlready2.World()
+    world.get_ontology("http://relation-checker/module#").load(fileobj= io.BytesIO(("\n".join(lines) + "\n").encode()), format= "ntriples")
+    if len(worlds) >= worlds_kept:
+        oldest = next(iter(worlds))
+        worlds.pop(oldest).close()
+    worlds[key] = world
+    return world
+
+
+def invalidate():
+    '''
+    Function to drop every module and world, so they are extracted again from the ontology
+    '''
+    global fingerprint
+    fingerprint = None
+    for world in worlds.values():
+        world.close()
+    del axioms[:]
+    for table in (triggered_by, modules, worlds):
+        table.clear()
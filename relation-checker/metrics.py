@@ -0,0 +1,170 @@
+'''
+    Runtime metrics of the checker, read in-process with metrics_snapshot() or written periodically to a file:
+
+        set_metrics("metrics/checker.prom", interval= 15)       # Prometheus text format
+        set_metrics("metrics/checker.json", interval= 15)       # JSON, the same dictionary as metrics_snapshot()
+
+    Counters are only increased, without a lock: on the call path of declared functions they cost a dictionary update.
+    When many threads call declared functions at once, a few increments can be lost, which a metric can afford.
+'''
+from collections import defaultdict
+import json
+import os
+import threading
+import time
+
+
+reasoner_buckets = [0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300]          # Upper bounds in seconds of the reasoner time histogram
+
+counts = defaultdict(int)               # Name -> count, see snapshot() for the names
+reasoner_histogram = [0] * (len(reasoner_buckets) + 1)                  # Last one counts the runs slower than every bound
+reasoner_seconds = [0.0]
+violations = defaultdict(int)           # Relation / DataProperty name -> number of violations found
+wrapper_calls = defaultdict(int)        # Declared function -> calls timed
+wrapper_seconds = defaultdict(float)    # Declared function -> seconds spent checking after the function returned
+gauges = {}                             # Name -> function returning the current value, registered by utils and pool
+
+timing = False                          # Time the checks made by every declared function
+dump_path = None
+dump_interval = 60.0
+dump_format = None
+dump_timer = None
+
+
+def set_metrics(path= None, interval= None, format= None, timing= None):
+    '''
+    Function to write the metrics to a file every interval seconds, and at the end of the program
+
+    :param path: File the metrics are written to, None stops writing
+    :param interval: Seconds between two writes, 60 by default
+    :param format: "prometheus" or "json", chosen from the extension of path if not given (.json is JSON)
+    :param timing: Set to True to measure the time every declared function spends in the checker (wrappers in the snapshot)
+    '''
+    global dump_path, dump_interval, dump_format, dump_timer
+    if timing != None:
+        globals()["timing"] = timing
+    if interval != None:
+        dump_interval = float(interval)
+    dump_path = path
+    if path != None:
+        dump_format = format if format != None else ("json" if path.endswith(".json") else "prometheus")
+    if dump_timer != None:
+        dump_timer.cancel()
+        dump_timer = None
+    if path != None:
+        schedule()
+
+
+def schedule():
+    global dump_timer
+    dump_timer = threading.Timer(dump_interval, periodic_dump)
+    dump_timer.daemon = True
+    dump_timer.start()
+
+
+def periodic_dump():
+    dump()
+    if dump_path != None:
+        schedule()
+
+
+def reasoner_run(seconds, checks):
+    '''
+    Function called by the collector when a worker finishes a batch
+    '''
+    counts["reasoner_runs"] += 1
+    counts["reasoner_checks"] += checks
+    reasoner_seconds[0] += seconds
+    for position, bound in enumerate(reasoner_buckets):
+        if seconds <= bound:
+            reasoner_histogram[position] += 1
+            return
+    reasoner_histogram[-1] += 1
+
+
+def wrapper_time(name, seconds):
+    wrapper_calls[name] += 1
+    wrapper_seconds[name] += seconds
+
+
+def snapshot():
+    '''
+    Function that returns the current metrics as a dictionary
+    '''
+    cumulative = 0
+    buckets = {}
+    for bound, count in zip([str(bound) for bound in reasoner_buckets] + ["+Inf"], reasoner_histogram):
+        cumulative += count
+        buckets[bound] = cumulative
+    return {
+        "time": time.time(),
+        "triples": {"intercepted": counts["intercepted"], "dedup_hits": counts["dedup_hits"], "compiled": counts["compiled"],
+                    "facets": counts["facets"], "store_hits": counts["store_hits"], "submitted": counts["submitted"],
+                    "prechecked": counts["prechecked"], "propagated": counts["propagated"]},
+        "reasoner": {"runs": counts["reasoner_runs"], "checks": counts["reasoner_checks"], "timeouts": counts["timeouts"],
+                     "retries": counts["retries"], "killed": counts["killed"], "undecided": counts["undecided"],
+                     "seconds": {"buckets": buckets, "sum": reasoner_seconds[0], "count": counts["reasoner_runs"]}},
+        "service": {"connections": counts["service_connections"], "lost": counts["service_lost"], "refused": counts["refused"]},
+        "graph": {"changes": counts["graph_changes"], "hits": counts["graph_hits"], "submitted": counts["graph_submitted"]},
+        "load": {name: gauge() for name, gauge in list(gauges.items())},
+        "violations": dict(violations),
+        "wrappers": {name: {"calls": wrapper_calls[name], "seconds": wrapper_seconds[name]} for name in list(wrapper_calls.keys())},
+    }
+
+
+def escape(label):
+    return str(label).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus(metrics):
+    '''
+    Function to write a snapshot in the Prometheus text format
+    '''
+    lines = []
+    def add(name, kind, samples):
+        lines.append("# TYPE relation_checker_" + name + " " + kind)
+        for labels, value in samples:
+            lines.append("relation_checker_" + name + labels + " " + repr(value))
+    for name, value in metrics["triples"].items():
+        add("triples_" + name + "_total", "counter", [("", value)])
+    for name in ["runs", "checks", "timeouts", "retries", "killed", "undecided"]:
+        add("reasoner_" + name + "_total", "counter", [("", metrics["reasoner"][name])])
+    for section in ["service", "graph"]:
+        for name, value in metrics[section].items():
+            add(section + "_" + name + "_total", "counter", [("", value)])
+    seconds = metrics["reasoner"]["seconds"]
+    lines.append("# TYPE relation_checker_reasoner_seconds histogram")
+    for bound, count in seconds["buckets"].items():
+        lines.append('relation_checker_reasoner_seconds_bucket{le="' + bound + '"} ' + str(count))
+    lines.append("relation_checker_reasoner_seconds_sum " + repr(seconds["sum"]))
+    lines.append("relation_checker_reasoner_seconds_count " + str(seconds["count"]))
+    for name, value in metrics["load"].items():
+        add(name, "gauge", [("", value)])
+    add("violations_total", "counter", [('{relation="' + escape(name) + '"}', value) for name, value in metrics["violations"].items()])
+    add("wrapper_calls_total", "counter", [('{function="' + escape(name) + '"}', value["calls"]) for name, value in metrics["wrappers"].items()])
+    add("wrapper_seconds_total", "counter", [('{function="' + escape(name) + '"}', value["seconds"]) for name, value in metrics["wrappers"].items()])
+    return "\n".join(lines) + "\n"
+
+
+def dump(path= None, format= None):
+    '''
+    Function to write the metrics to a file once. The file is replaced at once, so a scraper never reads half of it.
+
+    :param path: File to write, the one given to set_metrics by default
+    :param format: "prometheus" or "json"
+    '''
+    path = path if path != None else dump_path
+    if path == None:
+        return
+    format = format if format != None else (dump_format if path == dump_path else ("json" if path.endswith(".json") else "prometheus"))
+    metrics = snapshot()
+    text = json.dumps(metrics, indent= 2) if format == "json" else prometheus(metrics)
+    try:
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path + ".tmp", 'w') as f:
+            f.write(text)
+        os.replace(path + ".tmp", path)
+    except OSError:                         # Metrics never stop the checked program
+        pass
@@ -0,0 +1,192 @@
+'''
+    Loading of the ontology the declarations are checked against.
+    The ontology is either a python module (Ontologies.py, built with owlready2) or an .owl file. Its location is,
+    in order: the path given to set_ontology() (or to --ontology of analyze.py and precheck.py), the
+    RELATION_CHECKER_ONTOLOGY environment variable, Ontologies.py in the current directory, the Ontologies module
+    found on the import path, Ontologies.py in the relation-checker folder.
+
+    What the checker derives from the ontology (name tables, class hierarchy, compiled tables) is kept in a snapshot
+    on disk, keyed by the hash of the ontology file, so importing relation-checker does not load the ontology.
+    The owlready2 world itself is only loaded when something needs an entity of the ontology: the first declare(),
+    the first check a worker reasons about, or an import of entities from this module:
+
+        from ontology import Student, teaches
+        from ontology import *
+'''
+import argparse
+import importlib.util
+import inspect
+import os
+import pickle
+import sys
+import owlready2
+import compiler
+import reports
+import verdicts
+
+
+snapshot_format = 2                 # Increased whenever the content of a snapshot changes
+snapshot_dir = os.path.join(os.path.expanduser("~"), ".cache", "relation-checker", "snapshots")
+
+path = None                         # File the ontology is loaded from
+entities = None                     # Name -> entity of the ontology, None until the world is loaded
+snapshot = None                     # Tables derived from the ontology, see build_snapshot
+
+
+def set_ontology(file):
+    '''
+    Function to check the declarations against another ontology than Ontologies.py.
+    Has to be called before relation-checker is imported:
+
+        import ontology
+        ontology.set_ontology("school.owl")
+        from tools import *
+
+    :param file: Path of a python module or of an .owl file
+    '''
+    global path
+    if entities != None or snapshot != None:
+        reports.report({"kind": "warning", "message": "set_ontology() called after the ontology was loaded, the call has no effect."})
+        return
+    path = os.path.abspath(file)
+
+
+def ontology_option(argv):
+    '''
+    Function that applies the --ontology option of analyze.py and precheck.py, read before relation-checker is imported
+
+    :param argv: Arguments of the command
+    '''
+    parser = argparse.ArgumentParser(add_help= False)
+    parser.add_argument("--ontology")
+    known = parser.parse_known_args(argv)[0]
+    if known.ontology != None:
+        set_ontology(known.ontology)
+
+
+def ontology_path():
+    '''
+    Function that returns the absolute path of the ontology file
+    '''
+    global path
+    if path == None:
+        if os.environ.get("RELATION_CHECKER_ONTOLOGY"):
+            path = os.path.abspath(os.environ["RELATION_CHECKER_ONTOLOGY"])
+        elif os.path.isfile("Ontologies.py"):                               # The import path starts with the folder of the script, not this one
+            path = os.path.abspath("Ontologies.py")
+        else:
+            spec = importlib.util.find_spec("Ontologies")                   # Finds the module without running it
+            path = spec.origin if spec != None else os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ontologies.py")
+    return path
+
+
+def load():
+    '''
+    Function that loads the ontology into the owlready2 default world the first time it is called
+
+    :return: Dictionary of the names of the ontology to its entities
+    '''
+    global entities
+    if entities != None:
+        return entities
+    file = ontology_path()
+    if file.endswith(".py"):
+        module = sys.modules.get("Ontologies")
+        if module == None or os.path.abspath(getattr(module, "__file__", "")) != file:     # Not imported yet by the user's script
+            spec = importlib.util.spec_from_file_location("Ontologies", file)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules["Ontologies"] = module
+            spec.loader.exec_module(module)
+        entities = vars(module)
+    else:
+        onto = owlready2.get_ontology("file://" + file).load()
+        entities = {"Thing": owlready2.Thing, "Nothing": owlready2.Nothing}
+        for entity in list(onto.classes()) + list(onto.properties()) + list(onto.individuals()):
+            entities[entity.name] = entity
+    return entities
+
+
+def entity(name):
+    '''
+    Function that returns the entity of the ontology with the given name, loading the ontology if needed
+    '''
+    return load()[name]
+
+
+def build_snapshot():
+    '''
+    Function that loads the ontology and derives everything the checker needs from it
+    '''
+    members = sorted(load().items())
+    property_types = [owlready2.prop.ObjectPropertyClass, owlready2.prop.DataPropertyClass]
+    method_names = [name for name, item in members if inspect.isfunction(item) or type(item) in property_types]
+    compiler.compile_ontology()
+    world_classes = list(owlready2.default_world.classes())
+    individual_names = {}
+    for cls in world_classes:
+        try:
+            individual = cls()
+            individual_names[cls.iri] = str(individual)             # Name an individual of the class gets, as reported in errors
+            owlready2.destroy_entity(individual)
+        except Exception:
+            pass
+    return {
+        "format": snapshot_format,
+        "owlready2": owlready2.VERSION,
+        "class_names": [name for name, item in members if inspect.isclass(item)],
+        "method_names": method_names,
+        "instance_names": [name for name, item in members if name[0].islower() and name not in method_names],
+        "hierarchy": {cls.iri: sorted(ancestor.iri for ancestor in cls.ancestors()) for cls in world_classes},
+        "individual_names": individual_names,
+        "relation_tables": dict(compiler.relation_tables),
+        "constraint_tables": dict(compiler.constraint_tables),
+    }
+
+
+def prepare():
+    '''
+    Function called when utils.py is imported. Reads the snapshot of the ontology from disk,
+    or builds it (loading the ontology) if the ontology file changed since it was written.
+
+    :return: The snapshot, a dictionary
+    '''
+    global snapshot
+    if snapshot != None:
+        return snapshot
+    fingerprint = verdicts.ontology_fingerprint(ontology_path())
+    cache = os.path.join(snapshot_dir, fingerprint + ".pickle")
+    try:
+        with open(cache, 'rb') as f:
+            snapshot = pickle.load(f)
+        if snapshot.get("format") != snapshot_format or snapshot.get("owlready2") != owlready2.VERSION:
+            snapshot = None
+    except Exception:                                   # Missing or unreadable, built again below
+        snapshot = None
+    if snapshot == None:
+        snapshot = build_snapshot()
+        try:
+            if not os.path.isdir(snapshot_dir):
+                os.makedirs(snapshot_dir)
+            with open(cache + "." + str(os.getpid()), 'wb') as f:
+                pickle.dump(snapshot, f)
+            os.replace(cache + "." + str(os.getpid()), cache)      # Other processes never read a half written snapshot
+        except Exception:                               # A read-only home directory only costs the speed up
+            pass
+    else:
+        compiler.relation_tables.update(snapshot["relation_tables"])
+        compiler.constraint_tables.update(snapshot["constraint_tables"])
+    return snapshot
+
+
+def __getattr__(name):
+    '''
+    Entities of the ontology are attributes of this module, and "from ontology import *" imports all of them
+    '''
+    if name == "__all__":
+        return [name for name in load().keys() if not name.startswith("_")]
+    if name.startswith("__"):
+        raise AttributeError(name)
+    try:
+        return entity(name)
+    except KeyError:
+        raise AttributeError("module 'ontology' has no attribute " + repr(name))
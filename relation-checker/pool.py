@@ -0,0 +1,447 @@
+'''
+    Long-lived checker workers.
+    Each worker is started once, keeps the ontology loaded and takes checks from a shared queue,
+    instead of a new Process being forked for every new triple.
+    Workers send their results back over a one-way queue, read by a collector thread of the main process.
+    Nothing is polled: workers take the next batch as soon as they are free, every batch gets a deadline timer
+    when it starts, and wait_all() / on_complete() are woken by the collector when the last check finishes.
+    Only processes started here are ever stopped: every worker and every reasoner (JVM) leads its own process group,
+    and the workers record the pid of the reasoner they run, so the process table is never scanned
+    and no other python or java process is touched.
+    After set_server(), batches go to a checker service (server.py, through client.py) and no worker is started
+    until a check has to run here: a check the service does not take, or one carried by a lost connection.
+'''
+import multiprocessing
+from multiprocessing import Process, Array
+import os
+import signal
+import threading
+import time
+import psutil
+import owlready2
+import timeouts
+import metrics
+import facets
+import client
+import reports
+
+
+pool_size = multiprocessing.cpu_count()         # Number of checker workers running at the same time
+worker_memory = None                            # JVM heap (in MB) of the reasoner of each worker, None keeps owlready2's JAVA_MEMORY
+
+batch_size = 1                                  # Number of checks reasoned together in one sync_reasoner run, 1 turns batching off
+batch_window = 0.5                              # Seconds a check waits for its batch to fill up
+
+task_queue = None                               # Batches of checks waiting for a free worker
+result_queue = None                             # "started", "passed", "failed", "timeout", "undecided", "unasserted" and "done" messages from the workers
+collector_thread = None
+pending = []                                    # Checks collected for the next batch
+pending_lock = threading.Lock()
+drained = threading.Condition(pending_lock)     # Notified when no check is pending anymore
+completion_callbacks = []                       # Functions called every time the last pending check finishes
+pending_count = None                            # The processes Value of utils, set by start_pool
+deadline_timers = {}                            # Worker index -> timer of the batch it is reasoning about
+batch_names = {}                                # Worker index -> names of the relations / DataProperties of its batch
+stopped = set()                                 # Indexes of the workers whose current batch hit its deadline
+flush_timer = None
+workers = []                                    # The running worker processes
+busy_since = None                               # Per worker: time at which the current check started, 0 if idle
+timed_out = None                                # Per worker: set to 1 when the current check was stopped by its deadline timer
+reasoner_pids = None                            # Per worker: pid of the reasoner (JVM) it is running, 0 if none
+killed = False                                  # Set by kill_pool, wait_all() stops waiting for checks that will never finish
+started_with = None                             # Arguments of start_pool, for workers started later by run_here
+start_lock = threading.Lock()
+process_groups = hasattr(os, "setpgid")         # POSIX: processes are stopped with their children by killpg
+server_address = os.environ.get("RELATION_CHECKER_SERVER")     # Address of a checker service, None runs the workers here
+
+
+def set_pool(size= None, memory= None):
+    '''
+    Function to configure the checker workers. Has to be called before the first call to declare.
+
+    :param size: Number of workers, defaults to the number of CPUs
+    :param memory: JVM heap of the reasoner of each worker in MB
+    '''
+    global pool_size, worker_memory
+    if workers:
+        reports.report({"kind": "warning", "message": "set_pool() called after the workers were started, the call has no effect."})
+        return
+    if size != None:
+        pool_size = max(1, int(size))
+    if memory != None:
+        worker_memory = int(memory)
+
+
+def set_server(address):
+    '''
+    Function to send the checks to a checker service (see server.py) instead of starting workers.
+    Has to be called before the first call to declare. If the service cannot be reached, workers are started as usual.
+
+    :param address: "unix:/path/of/socket" or "tcp:host:port", None runs the workers in this program
+    '''
+    global server_address
+    server_address = address
+
+
+def set_batching(size= None, window= None):
+    '''
+    Function to make the workers reason about several checks at once.
+    Checks are collected until there are size of them or window seconds have passed since the first one.
+
+    :param size: Maximum number of checks in a batch
+    :param window: Maximum time in seconds that a check waits for the batch to fill up
+    '''
+    global batch_size, batch_window
+    if size != None:
+        batch_size = max(1, int(size))
+    if window != None:
+        batch_window = float(window)
+
+
+def record_reasoner(index, pids, timed_out):
+    '''
+    Function run in the reasoner process, between its fork and the start of java.
+    The pid is written before the deadline is read, and expire() sets the deadline before it reads the pid,
+    so a reasoner started as its batch expires is either killed by expire() or never starts java.
+    '''
+    os.setpgid(0, 0)
+    pids[index] = os.getpid()
+    if timed_out[index] == 1:
+        os._exit(1)
+
+
+def worker_loop(index, tasks, results, handler, busy_since, timed_out, running, memory, pids):
+    '''
+    Body of a checker worker. Runs batches of checks from the queue until it receives None.
+
+    :param index: Position of the worker in busy_since and timed_out
+    :param tasks: Queue of lists of checks
+    :param results: Queue the failed checks are sent to
+    :param handler: The function that reasons about a batch (think)
+    :param pids: Array the pid of every reasoner started by the worker is written to
+    '''
+    if memory != None:
+        owlready2.reasoning.JAVA_MEMORY = memory
+    if process_groups:
+        os.setpgid(0, 0)
+        owlready2.reasoning._subprocess_kargs["preexec_fn"] = lambda: record_reasoner(index, pids, timed_out)      # Passed to every java call of owlready2
+    while True:
+        batch = tasks.get()
+        if batch == None:
+            break
+        with busy_since.get_lock():                 # expire() checks the batch and kills its reasoner under the same lock
+            timed_out[index] = 0
+            started = busy_since[index] = time.time()
+        results.put(("started", index, started, sorted({task[2][1] for task in batch}), max(task[3] for task in batch)))
+        with running.get_lock():
+            running.value += len(batch)
+        try:
+            handler(batch, results, timed_out, index)
+        except:
+            results.put(("undecided", batch))      # Every check of the batch is settled, those settled already are left as they are
+        finally:
+            with busy_since.get_lock():
+                elapsed = time.time() - busy_since[index]
+                busy_since[index] = 0
+                pids[index] = 0
+            with running.get_lock():
+                running.value -= len(batch)
+            results.put(("done", index, len(batch), elapsed))
+
+
+def collector(results, reporters, processes):
+    '''
+    Thread of the main process that merges the results of the workers.
+    Failed checks are reported here, so tested_triples only lives in the main process.
+
+    :param reporters: Maps the kind of a check to its error reporter (relation_error, constraint_error),
+                      and "settled" to the function told about checks that passed or ran out of retries
+    '''
+    while True:
+        message = results.get()
+        if message == None:
+            break
+        if message[0] == "started":
+            batch_names[message[1]] = message[3]
+            timer = threading.Timer(timeouts.deadline(message[3], message[4]), expire, args= (message[1], message[2]))
+            timer.daemon = True
+            deadline_timers[message[1]] = timer
+            timer.start()
+        elif message[0] == "passed":
+            for task in message[1]:
+                reporters["settled"](task, True)
+        elif message[0] == "failed":
+            task = message[1]
+            reporters[task[0]](*task[1])
+        elif message[0] == "timeout":
+            retry(message[1], processes, reporters)
+        elif message[0] == "undecided":
+            undecided(message[1], reporters)
+        elif message[0] == "unasserted":
+            for task in message[1]:
+                reporters["settled"](task, None)
+        else:
+            timer = deadline_timers.pop(message[1], None)
+            if timer != None:
+                timer.cancel()
+            metrics.reasoner_run(message[3], message[2])
+            if message[1] in stopped:
+                stopped.discard(message[1])
+            else:
+                timeouts.observe(batch_names.get(message[1], []), message[3])
+            finished(processes, message[2])
+
+
+def finished(processes, count):
+    '''
+    Function called by the collector, or by the client of a checker service, when count checks have finished
+    '''
+    with drained:
+        processes.value -= count
+        done = processes.value == 0
+        if done:
+            drained.notify_all()
+    if done:
+        for callback in completion_callbacks:
+            callback()
+
+
+def expire(index, started):
+    '''
+    Function called by the deadline timer of a batch. Stops the reasoner of the worker if it is still on that batch.
+    Only the reasoner is killed, the worker itself stays alive for the next batch.
+    The worker cannot start or finish a batch while the lock is held, so the kill never lands on the next batch.
+    '''
+    with busy_since.get_lock():
+        if busy_since[index] != started:
+            return
+        stopped.add(index)
+        timed_out[index] = 1
+        metrics.counts["killed"] += 1
+        kill_reasoner(index)
+
+
+def kill_reasoner(index):
+    '''
+    Function to stop the reasoner of a worker, without stopping the worker
+    '''
+    pid = reasoner_pids[index]
+    try:
+        if pid != 0:
+            if psutil.Process(pid).ppid() == workers[index].pid:       # The pid was not reused by another process since
+                os.killpg(pid, signal.SIGKILL)
+        elif not process_groups:                                # Windows: the reasoner is the only child of the worker
+            for child in psutil.Process(workers[index].pid).children():
+                child.kill()
+    except (psutil.NoSuchProcess, psutil.AccessDenied, ProcessLookupError, PermissionError):
+        pass
+
+
+def retry(tasks, processes, reporters):
+    '''
+    Function called by the collector with the checks a worker could not finish before the deadline.
+    Checks that have retries left are sent again as one batch, with a longer deadline.
+    '''
+    again = [task for task in tasks if task[3] < timeouts.max_retries]
+    timeouts.timed_out([task[2][1] for task in tasks], [task[2][1] for task in again])
+    metrics.counts["timeouts"] += len(tasks)
+    metrics.counts["retries"] += len(again)
+    for task in tasks:
+        if task[3] >= timeouts.max_retries:
+            reporters["settled"](task, None)
+    if len(again) == 0:
+        return
+    with pending_lock:
+        processes.value += len(again)
+    task_queue.put([(task[0], task[1], task[2], task[3] + 1) for task in again])
+
+
+def undecided(tasks, reporters):
+    '''
+    Function called by the collector with the checks the reasoner failed on without a verdict (java missing, JVM crash).
+    They are settled without a verdict, and the first failure is reported once.
+    '''
+    if metrics.counts["undecided"] == 0:
+        reports.report({"kind": "warning", "message": "The reasoner could not run (is java installed?), its checks are left without a verdict."})
+    metrics.counts["undecided"] += len(tasks)
+    for task in tasks:
+        reporters["settled"](task, None)
+
+
+def wait_all(timeout= None):
+    '''
+    Function that blocks until every submitted check has finished
+
+    :param timeout: Maximum number of seconds to wait, None waits as long as needed
+    :return: True if all checks finished, False if the timeout passed first
+    '''
+    facets.flush()
+    done = True
+    if pending_count != None:
+        flush()
+        with drained:
+            done = drained.wait_for(lambda: pending_count.value == 0 or killed, timeout)
+    reports.flush()                                 # The errors of the finished checks are written when wait_all returns
+    return done
+
+
+def on_complete(callback):
+    '''
+    Function to register a callback that is called (without arguments, in the collector thread)
+    every time all of the submitted checks have finished
+    '''
+    completion_callbacks.append(callback)
+
+
+def start_pool(handler, reporters, processes, running):
+    '''
+    Function to start the workers and the collector. Called by declare the first time it runs.
+    Workers are forked after the ontology is imported, so each of them loads it only once.
+    '''
+    global pending_count, started_with
+    pending_count = processes
+    started_with = (handler, reporters, processes, running)
+    if server_address != None and client.connect(server_address, reporters, lambda count: finished(processes, count), run_here):
+        return
+    start_workers()
+
+
+def start_workers():
+    '''
+    Function that starts the workers and the collector, once
+    '''
+    global task_queue, result_queue, collector_thread, busy_since, timed_out, reasoner_pids
+    with start_lock:
+        if task_queue != None:
+            return
+        handler, reporters, processes, running = started_with
+        tasks = multiprocessing.Queue()
+        result_queue = multiprocessing.Queue()
+        busy_since = Array('d', pool_size)
+        timed_out = Array('i', pool_size)
+        reasoner_pids = Array('i', pool_size)
+        for index in range(pool_size):
+            p = Process(target= worker_loop, args= (index, tasks, result_queue, handler, busy_since, timed_out, running, worker_memory, reasoner_pids), daemon= True)
+            p.start()
+            workers.append(p)
+        collector_thread = threading.Thread(target= collector, args= (result_queue, reporters, processes), daemon= True)
+        collector_thread.start()
+        task_queue = tasks                          # Set last: flush sends to the workers once they all exist
+
+
+def run_here(batch):
+    '''
+    Function to send checks to the workers of this program, starting them if a checker service was used until now
+    '''
+    if len(batch) == 0 or killed:                   # Checks of a connection closed by kill_pool
+        return
+    if task_queue == None:
+        start_workers()
+    task_queue.put(batch)
+
+
+def submit(task, processes):
+    '''
+    Function to hand a check to the workers. The check is sent once its batch is full or its window has passed.
+
+    :param task: Tuple (kind, arguments of the error reporter, arguments of the individual maker, number of the attempt)
+    '''
+    global flush_timer
+    with pending_lock:
+        processes.value += 1
+        pending.append(task)
+        if len(pending) < batch_size:
+            if flush_timer == None:
+                flush_timer = threading.Timer(batch_window, flush)
+                flush_timer.daemon = True
+                flush_timer.start()
+            return
+    flush()
+
+
+def flush():
+    '''
+    Function to send the collected checks to the workers as one batch
+    '''
+    global flush_timer
+    with pending_lock:
+        if flush_timer != None:
+            flush_timer.cancel()
+            flush_timer = None
+        if len(pending) == 0:
+            return
+        batch = pending[:]
+        del pending[:]
+    if client.address != None:
+        batch = client.send(batch)                  # Returns the checks the service cannot take
+    run_here(batch)
+
+
+def queued_batches():
+    try:
+        return task_queue.qsize() if task_queue != None else 0
+    except NotImplementedError:                     # qsize() is not available on macOS
+        return -1
+
+def busy_workers():
+    return len([started for started in busy_since if started != 0]) if busy_since != None else 0
+
+metrics.gauges["collecting_checks"] = lambda: len(pending)
+metrics.gauges["queued_batches"] = queued_batches
+metrics.gauges["busy_workers"] = busy_workers
+
+
+def alive():
+    '''
+    Function that returns the pids of the workers that are still running, and of the reasoners they are running
+    '''
+    pids = [p.pid for p in workers if p.is_alive()]
+    return pids + [pid for pid in (reasoner_pids if reasoner_pids != None else []) if pid != 0]
+
+
+def stop_pool():
+    '''
+    Function to let every worker finish its current check and exit
+    '''
+    flush()
+    if client.connection != None:
+        client.close()
+    if collector_thread == None:
+        return
+    for p in workers:
+        task_queue.put(None)
+    for p in workers:
+        p.join(timeout= 1)
+    for index, p in enumerate(workers):
+        if p.is_alive():                                    # Still reasoning, would leave its reasoner behind
+            kill_worker(index)
+    result_queue.put(None)
+    collector_thread.join(timeout= 1)
+
+
+def kill_worker(index):
+    '''
+    Function to stop a worker and its reasoner
+    '''
+    kill_reasoner(index)
+    try:
+        if process_groups:
+            os.killpg(workers[index].pid, signal.SIGKILL)
+            return
+    except (ProcessLookupError, PermissionError):             # Stopped, or stopped before it made its group
+        pass
+    workers[index].kill()
+
+
+def kill_pool():
+    '''
+    Function to stop every worker and reasoner at once, without waiting for their checks (fail_quit, errors in the user's script)
+    '''
+    global killed
+    killed = True
+    client.close()
+    for index in range(len(workers)):
+        kill_worker(index)
+    if pending_count != None:
+        with drained:
+            drained.notify_all()
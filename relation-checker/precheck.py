@@ -0,0 +1,474 @@
+'''
+    Static pre-check of a script: reads its source, follows its declarations, and finds the triples and DataProperty
+    values its calls will check wherever the source tells the classes of the arguments:
+
+        declare(Teacher, Person)
+        t = Person("Harry", 40)             t is a Teacher, and 40 is checked against age if "age" is declared with cls= Person
+        declare(teaches, Person.add_student)
+        t.add_student(s)                    (Teacher, teaches, Student), if s is known as well
+
+    precheck() starts the workers and hands them all of these checks at once, so the calls of the script mostly find
+    their checks decided already (dedup_hits in the metrics). Errors are reported as possible errors at the line of
+    the call they were found at, and as errors (counted in the violations of the metrics) once the call runs.
+    As a command, it checks scripts ahead of time and fills the verdict store:
+
+        python precheck.py my_app.py [more scripts] [--workers 8] [--batch 16] [--store verdicts.sqlite] [--at-end] [--ontology school.owl]
+
+    The analysis is conservative. A variable is only known if every path to the call assigns it the instance of the
+    same declared class. Inside functions, only classes and functions declared once in the whole script are used,
+    since the body may run after any of the declarations. Declarations with fail_quit, a checking level other than
+    full or first_seen, or keyword arguments that are not literals are left to the run time checks.
+'''
+import ast
+import os
+import sys
+from collections import defaultdict
+import ontology
+if __name__ == '__main__':
+    ontology.ontology_option(sys.argv[1:])         # Before tools is imported, which reads the snapshot of the ontology
+from tools import *
+from analyze import analyze, arguments, run
+import tools
+
+
+checked_levels = [None, "full", "first_seen"]      # Declarations whose calls can be checked before they happen
+
+
+def literal(node):
+    '''
+    :return: (True, value) for a literal number, string or boolean, (False, None) for anything else
+    '''
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float, str, bool):
+        return True, node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant) and type(node.operand.value) in (int, float):
+        return True, -node.operand.value
+    return False, None
+
+
+def dotted(node):
+    '''
+    :return: "name" or "Class.name" for a Name or an attribute of a Name, None for anything else
+    '''
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+        return node.value.id + "." + node.attr
+    return None
+
+
+def assigned_names(statements):
+    '''
+    :return: Set of the names bound anywhere in the statements, nested blocks included
+    '''
+    names = set()
+    for statement in statements:
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                names.add(node.id)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+            elif isinstance(node, ast.ExceptHandler) and node.name != None:
+                names.add(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+    return names
+
+
+def merge(*environments):
+    '''
+    :return: The variables known the same way in every environment
+    '''
+    first = environments[0]
+    return {name: known for name, known in first.items() if all(other.get(name) == known for other in environments[1:])}
+
+
+class Script:
+    '''
+    Analysis of one script. Declarations are applied in the order of the source, and the classes of variables are
+    followed through the statements of each function (or of the module), in a dictionary
+    variable name -> (python class name, ontology class name).
+    '''
+    def __init__(self, path, entities):
+        self.path = path
+        self.entities = entities
+        self.classes = {}                           # Python class name -> (ontology class name, checked) or None if unknown
+        self.functions = {}                         # "function" / "Class.method" -> [[relation, argument1, argument2, checked]] or None
+        self.attributes = defaultdict(list)         # Python class name -> [(DataProperty name, attribute name)]
+        self.initializers = {}                      # Python class name -> __init__ of the class, see initializer()
+        self.declared = defaultdict(set)            # Python class or function -> every declaration of it in the script
+        self.final = None                           # (classes, functions, attributes) at the end of the script
+        self.records = []                           # Checks found, in the form of the records of a trace log (see tracelog.py)
+
+    '''
+        Declarations
+    '''
+    def options(self, call, first_option):
+        '''
+        :return: Dictionary of the options of a declaration, or None if one of them is not a literal
+        '''
+        names = ["argument1", "argument2", "cls", "type_mismatch", "value_overwrite", "overwrite_handling", "display",
+                 "fail_quit", "checking", "sample_every", "sample_per_second"]
+        values = {}
+        for name, node in list(zip(names[first_option:], call.args[2:])) + [(keyword.arg, keyword.value) for keyword in call.keywords]:
+            if name == None:                        # **options
+                return None
+            if name == "cls":
+                if not isinstance(node, ast.Name):
+                    return None
+                values[name] = node.id
+                continue
+            known, value = literal(node) if not (isinstance(node, ast.Constant) and node.value == None) else (True, None)
+            if not known:
+                return None
+            values[name] = value
+        return values
+
+    def declaration(self, entity, target, options):
+        '''
+        Function that applies one declare(entity, target, ...) the way link_maker does
+
+        :param entity: Name of the ontology entity
+        :param target: "Class", "function", "Class.method", or (attribute name,) for an instance variable
+        :param options: Dictionary of the options, None if unknown
+        '''
+        item = self.entities.get(entity)
+        key = target if not isinstance(target, tuple) else None
+        if key != None and self.final == None:
+            self.declared[key].add((entity, repr(sorted((options or {"unknown": True}).items()))))
+        if options != None and options.get("display") != None:
+            return
+        checked = options != None and options.get("fail_quit") != True and options.get("checking") in checked_levels
+        if options != None and options.get("checking") == "off":
+            return                                  # declare returns without linking anything
+        if isinstance(target, tuple):
+            if options != None and options.get("cls") != None and isinstance(item, owlready2.prop.DataPropertyClass):
+                self.attributes[options["cls"]].append((entity, target[0]))
+            return
+        if isinstance(item, owlready2.ThingClass):
+            self.classes[key] = (entity, checked) if options != None else None
+        elif type(item) in [owlready2.prop.ObjectPropertyClass, owlready2.prop.DataPropertyClass]:
+            if options == None:
+                self.functions[key] = None
+                return
+            argument1 = options.get("argument1") if options.get("argument1") != None else 0
+            argument2 = options.get("argument2") if options.get("argument2") != None else 1
+            plan = self.functions.get(key) or []
+            if options.get("overwrite_handling") != False:
+                plan = [operation for operation in plan if operation[1] != argument1 or operation[2] != argument2]
+            self.functions[key] = plan + [[entity, argument1, argument2, checked]]
+
+    def declaring_call(self, call, function_scope, class_scope):
+        '''
+        Function that applies a call to declare or declare_many, if it is one
+
+        :return: True if the call declares something
+        '''
+        name = dotted(call.func)
+        name = name.rsplit(".", 1)[-1] if name != None else None
+        if name == "declare" and len(call.args) >= 2 and isinstance(call.args[0], ast.Name):
+            target = self.target(call.args[1])
+            if target != None:
+                self.declaration(call.args[0].id, target, self.options(call, 0))
+            return True
+        if name == "declare_many" and len(call.args) == 1:
+            options = self.options(ast.Call(args= [], keywords= call.keywords), 0)
+            if isinstance(call.args[0], ast.Dict):
+                pairs = [(key, value, []) for key, value in zip(call.args[0].keys, call.args[0].values)]
+            elif isinstance(call.args[0], (ast.List, ast.Tuple)):
+                pairs = [(item.elts[0], item.elts[1], item.elts[2:]) for item in call.args[0].elts if isinstance(item, ast.Tuple) and len(item.elts) >= 2]
+            else:
+                return True
+            for entity, object, positional in pairs:
+                target = self.target(object)
+                if isinstance(entity, ast.Name) and target != None:
+                    single = self.options(ast.Call(args= [None, None] + positional, keywords= []), 0)
+                    merged = None if single == None or options == None else dict(options, **single)
+                    self.declaration(entity.id, target, merged)
+            return True
+        return False
+
+    def target(self, node):
+        known, value = literal(node)
+        if known and isinstance(value, str):
+            return (value,)
+        return dotted(node)
+
+    def decorators(self, node, key, function_scope):
+        '''
+        Function that applies the declared_as decorators of a function or a class, innermost first
+        '''
+        for decorator in reversed(node.decorator_list):
+            if isinstance(decorator, ast.Call) and (dotted(decorator.func) or "").rsplit(".", 1)[-1] == "declared_as" and \
+               len(decorator.args) >= 1 and isinstance(decorator.args[0], ast.Name):
+                options = self.options(ast.Call(args= [None] + decorator.args, keywords= decorator.keywords), 0)
+                self.declaration(decorator.args[0].id, key, options)
+
+    '''
+        Classes of the values of the script
+    '''
+    def initializer(self, node):
+        '''
+        Function that reads the __init__ of a class
+
+        :return: (parameters, literal defaults, {attribute: expression its top level statements set it to}, names of
+                 the code of __init__). Attributes set anywhere else are left out, and all of them if __init__ calls
+                 a method of self, which could set any of them.
+        '''
+        arguments = node.args
+        positional = [argument.arg for argument in arguments.posonlyargs + arguments.args]
+        self_name = positional[0] if len(positional) != 0 else None
+        parameters = positional[1:] + [argument.arg for argument in arguments.kwonlyargs]
+        defaults = dict(zip(positional[len(positional) - len(arguments.defaults):], arguments.defaults))
+        defaults.update({argument.arg: default for argument, default in zip(arguments.kwonlyargs, arguments.kw_defaults) if default != None})
+        varnames = set(positional) | set(parameters) | assigned_names(node.body)
+        varnames.update(extra.arg for extra in [arguments.vararg, arguments.kwarg] if extra != None)
+        reassigned = assigned_names(node.body)
+        values = {}
+        written = set()
+        for statement in node.body:
+            target = statement.targets[0] if isinstance(statement, ast.Assign) and len(statement.targets) == 1 else None
+            if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and target.value.id == self_name:
+                values[target.attr] = statement.value
+                statement = statement.value
+            for inner in ast.walk(statement):
+                if isinstance(inner, ast.Call) and isinstance(inner.func, ast.Attribute) and isinstance(inner.func.value, ast.Name) and \
+                   inner.func.value.id == self_name:
+                    return (parameters, defaults, {}, varnames)
+                if isinstance(inner, ast.Attribute) and isinstance(inner.value, ast.Name) and inner.value.id == self_name and \
+                   not isinstance(inner.ctx, ast.Load):
+                    written.add(inner.attr)
+        for attribute, value in list(values.items()):
+            if attribute in written or (isinstance(value, ast.Name) and (value.id not in parameters or value.id in reassigned)):
+                del values[attribute]                   # Set elsewhere, or to something else than a parameter
+        return (parameters, defaults, values, varnames)
+
+    def class_of(self, name, function_scope):
+        '''
+        :return: (python class name, ontology class name, checked) of the instances a call to name creates, or None
+        '''
+        if function_scope and len(self.declared[name]) != 1:
+            return None
+        declared = (self.final[0] if function_scope else self.classes).get(name)
+        return (name, *declared) if declared != None else None
+
+    def plan_of(self, key, function_scope):
+        if function_scope and len(self.declared[key]) != 1:
+            return None
+        return (self.final[1] if function_scope else self.functions).get(key)
+
+    def value_class(self, node, environment, function_scope):
+        '''
+        :return: (python class name, ontology class name) of the value of an expression, or None if it is not known
+        '''
+        if isinstance(node, ast.Name):
+            return environment.get(node.id)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            created = self.class_of(node.func.id, function_scope)
+            return created[:2] if created != None else None
+        return None
+
+    def constructed(self, call, created, function_scope):
+        '''
+        Function that records the DataProperty values a constructor call sets, as instance_initializer checks them
+        '''
+        python_class, onto_class, checked = created
+        if not checked or python_class not in self.initializers or any(isinstance(argument, ast.Starred) for argument in call.args) or \
+           any(keyword.arg == None for keyword in call.keywords):
+            return
+        parameters, defaults, values, varnames = self.initializers[python_class]
+        given = dict(zip(parameters, call.args))
+        given.update({keyword.arg: keyword.value for keyword in call.keywords})
+        for constr, attribute in (self.final[2] if function_scope else self.attributes)[python_class]:
+            if constr not in varnames:
+                break
+            node = values.get(attribute)
+            if isinstance(node, ast.Name):
+                node = given.get(node.id, defaults.get(node.id))
+            known, value = literal(node) if node != None else (False, None)
+            if known:
+                self.records.append(("constraint", constr, self.entities[onto_class].iri, attribute, value, self.path, call.lineno))
+
+    def called(self, call, environment, function_scope, function_name):
+        '''
+        Function that records the triples a call to a declared function or method checks, as function_enhancer does
+        '''
+        if any(isinstance(argument, ast.Starred) for argument in call.args):
+            return
+        arguments = list(call.args)
+        key = dotted(call.func)
+        if isinstance(call.func, ast.Attribute) and isinstance(call.func.value, ast.Name) and call.func.value.id in environment:
+            key = environment[call.func.value.id][0] + "." + call.func.attr         # Method of a known instance, self is args[0]
+            arguments = [call.func.value] + arguments
+        plan = self.plan_of(key, function_scope) if key != None else None
+        if plan == None or key.rsplit(".", 1)[-1] == function_name:                # Recursion is not checked
+            return
+        for relation, argument1, argument2, checked in plan:
+            if not checked or max(argument1, argument2) >= len(arguments):
+                continue
+            known1 = self.value_class(arguments[argument1], environment, function_scope)
+            known2 = self.value_class(arguments[argument2], environment, function_scope)
+            if known1 != None and known2 != None:
+                self.records.append(("relation", relation, self.entities[known1[1]].iri, self.entities[known2[1]].iri, self.path, call.lineno))
+
+    def expression(self, node, environment, function_scope, function_name, class_scope= None):
+        '''
+        Function that follows the calls of an expression, in the order they are made
+        '''
+        if node == None:
+            return
+        if isinstance(node, ast.Lambda):                   # Runs later, with arguments that are not known
+            return
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+            inner = {name: known for name, known in environment.items() if name not in assigned_names([ast.Expr(value= node)])}
+            for child in ast.iter_child_nodes(node):
+                self.expression(child, inner, function_scope, function_name)
+            return
+        if isinstance(node, ast.NamedExpr):
+            self.expression(node.value, environment, function_scope, function_name)
+            known = self.value_class(node.value, environment, function_scope)
+            environment.pop(node.target.id, None)
+            if known != None:
+                environment[node.target.id] = known
+            return
+        for child in ast.iter_child_nodes(node):
+            self.expression(child, environment, function_scope, function_name)
+        if isinstance(node, ast.Call):
+            if self.declaring_call(node, function_scope, class_scope):
+                return
+            created = self.class_of(node.func.id, function_scope) if isinstance(node.func, ast.Name) else None
+            if created != None:
+                self.constructed(node, created, function_scope)
+            else:
+                self.called(node, environment, function_scope, function_name)
+
+    def block(self, statements, environment, function_scope, function_name, class_scope= None):
+        for statement in statements:
+            self.statement(statement, environment, function_scope, function_name, class_scope)
+
+    def statement(self, node, environment, function_scope, function_name, class_scope):
+        '''
+        Function that follows one statement, updating environment with the classes of the variables it assigns
+        '''
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for decorator in node.decorator_list:
+                self.expression(decorator, environment, function_scope, function_name)
+            key = node.name if class_scope == None else class_scope + "." + node.name
+            if class_scope != None and node.name == "__init__":
+                self.initializers[class_scope] = self.initializer(node)
+            self.decorators(node, key, function_scope)
+            environment.pop(node.name, None)
+            self.block(node.body, {}, True, node.name)
+        elif isinstance(node, ast.ClassDef):
+            self.block(node.body, {}, function_scope, function_name, node.name)
+            self.decorators(node, node.name, function_scope)
+            environment.pop(node.name, None)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            self.expression(node.value, environment, function_scope, function_name, class_scope)
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            known = self.value_class(node.value, environment, function_scope) if node.value != None else None
+            for name in assigned_names([ast.Assign(targets= targets, value= ast.Constant(None))]):
+                environment.pop(name, None)
+            if known != None and len(targets) == 1 and isinstance(targets[0], ast.Name):
+                environment[targets[0].id] = known
+        elif isinstance(node, ast.If):
+            self.expression(node.test, environment, function_scope, function_name)
+            branch = dict(environment)
+            self.block(node.body, environment, function_scope, function_name, class_scope)
+            self.block(node.orelse, branch, function_scope, function_name, class_scope)
+            merged = merge(environment, branch)
+            environment.clear()
+            environment.update(merged)
+        elif isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+            self.expression(node.iter if not isinstance(node, ast.While) else node.test, environment, function_scope, function_name)
+            for name in assigned_names([node]):                # Unknown on the next turn of the loop, and after it
+                environment.pop(name, None)
+            self.block(node.body, environment, function_scope, function_name, class_scope)
+            self.block(node.orelse, environment, function_scope, function_name, class_scope)
+            for name in assigned_names([node]):
+                environment.pop(name, None)
+        elif isinstance(node, ast.Try) or type(node).__name__ == "TryStar":
+            before = dict(environment)
+            self.block(node.body + node.orelse, environment, function_scope, function_name, class_scope)
+            assigned = assigned_names(node.body + node.orelse)
+            for handler in node.handlers:
+                self.block(handler.body, {name: known for name, known in before.items() if name not in assigned}, function_scope, function_name, class_scope)
+            for name in assigned_names([node]):
+                environment.pop(name, None)
+            self.block(node.finalbody, environment, function_scope, function_name, class_scope)
+        elif isinstance(node, (ast.With, ast.AsyncWith)):
+            for item in node.items:
+                self.expression(item.context_expr, environment, function_scope, function_name)
+            for name in assigned_names([ast.Assign(targets= [item.optional_vars for item in node.items if item.optional_vars != None], value= ast.Constant(None))]):
+                environment.pop(name, None)
+            self.block(node.body, environment, function_scope, function_name, class_scope)
+        elif type(node).__name__ == "Match":
+            self.expression(node.subject, environment, function_scope, function_name)
+            branches = [dict(environment)]                  # No case matched
+            for case in node.cases:
+                branch = dict(environment)
+                for inner in ast.walk(case.pattern):            # Names captured by the pattern
+                    branch.pop(getattr(inner, "name", None) or getattr(inner, "rest", None), None)
+                self.block(case.body, branch, function_scope, function_name, class_scope)
+                branches.append(branch)
+            merged = merge(*branches)
+            environment.clear()
+            environment.update(merged)
+        else:
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.expr):
+                    self.expression(child, environment, function_scope, function_name, class_scope)
+            for name in assigned_names([node]):             # AugAssign, del, import, global ...
+                environment.pop(name, None)
+
+
+def scan(path):
+    '''
+    Function to find the checks the calls of a script will make
+
+    :param path: Path of the python script
+    :return: List of the checks, in the form of the records of a trace log: ("relation", relation, IRI, IRI, file, line)
+             and ("constraint", DataProperty, class IRI, attribute, value, file, line)
+    '''
+    path = os.path.abspath(path)                        # Files are reported as the running script's frames name them
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename= path)
+    script = Script(path, ontology.load())
+    script.block(tree.body, {}, False, None)            # Collects every declaration, for the bodies of functions
+    script.final = (script.classes, script.functions, script.attributes)
+    script.classes, script.functions, script.attributes = {}, {}, defaultdict(list)
+    script.records = []
+    script.block(tree.body, {}, False, None)
+    return script.records
+
+
+def precheck(path= None):
+    '''
+    Function to check every triple and DataProperty value the source of a script shows, before its calls happen.
+    Starts the workers if no declaration has started them yet.
+
+    :param path: Path of the script, the file that calls precheck by default
+    :return: Number of checks found in the script
+    '''
+    if path == None:
+        path = sys._getframe(1).f_code.co_filename
+    if tracelog.trace_file != None:                 # Trace mode checks nothing while the program runs
+        return 0
+    records = scan(path)
+    tools.start_checker()
+    for record in records:
+        name = record[1]
+        if relation_checking.get(name, default_checking)[0] not in checked_levels:
+            continue
+        metrics.counts["prechecked"] += 1
+        analyze(record, processes, True)            # The call itself is not recorded again when it runs
+    return len(records)
+
+
+def main(argv= None):
+    args = arguments("Check the calls of python scripts that their source shows, ahead of time.", "scripts", "scripts to check",
+                     "SQLite file of the verdict store the scripts will use").parse_args(argv)
+    return run(args, (record for path in args.scripts for record in scan(path)), "checks found")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+'''
+    Output of the errors and warnings of the checker. Each one is a record (a dictionary with a "kind"), queued
+    without a lock and written by a thread of its own, in batches, through a formatter:
+
+        set_report_output()                                     # Coloured messages on the console, the default
+        set_report_output("checks.jsonl")                       # JSON Lines, one record per line
+        set_report_output(sys.stderr, format= my_formatter)     # Function record -> text
+
+    The reporters of the checker only append their record to the queue, so a program with many failing checks
+    never waits for the console. The queue is written out by wait_all(), at the end of the program and before
+    fail_quit stops it.
+
+    Kinds of records (line and file are those of the call or declaration):
+        relation            subject, relation, object; summary is True in the list printed at the end,
+                            static is True for a call found by precheck that has not run
+        constraint          instance, attribute, value, constraint; summary and static as above
+        graph               change, relation: a link or value that makes the linked objects inconsistent (see graph.py)
+        type_mismatch       declared, found: types of the ontology entity and of the declared object
+        redeclared          name, overwritten: False if both declarations are tested
+        declaration_error   name, reason (not_in_ontology, undeclared_class, not_an_attribute, ontology_member), cls
+        warning             message
+        quit                (fail_quit stops the program)
+'''
+from collections import deque
+import atexit
+import json
+import os
+import sys
+import threading
+
+
+queue = deque()                 # Records waiting for the writer, appended and popped without a lock
+waiting = threading.Event()     # Set when records are queued
+write_lock = threading.Lock()   # Held while a batch is formatted and written, never while the checker's state changes
+writer = None                   # Writer thread, started by the first record
+writer_pid = None               # Process the writer runs in, a forked process starts its own
+
+output = None                   # File the records are written to, sys.__stdout__ if None
+output_owned = False            # True if output was opened by set_report_output, which closes it
+formatter = None                # Function record -> text, console if None
+
+
+def set_report_output(path= None, format= None):
+    '''
+    Function to choose where and how the errors and warnings of the checker are written
+
+    :param path: File name or open file, sys.__stdout__ by default. A file name is appended to.
+    :param format: "console", "json", or a function taking a record and returning the text to write,
+        chosen from the extension of path if not given (.json and .jsonl are JSON)
+    '''
+    global output, output_owned, formatter
+    flush()
+    with write_lock:
+        if output_owned:
+            output.close()
+        output_owned = isinstance(path, str)
+        if format == None:
+            format = "json" if output_owned and path.endswith((".json", ".jsonl")) else "console"
+        output = open(path, "a") if output_owned else path
+        formatter = formatters[format] if isinstance(format, str) else format
+
+
+def report(record):
+    '''
+    Function to queue a record for the writer
+
+    :param record: Dictionary with a "kind", see above
+    '''
+    global writer, writer_pid
+    queue.append(record)
+    if writer_pid != os.getpid():
+        writer_pid = os.getpid()
+        writer = threading.Thread(target= write_forever, daemon= True)
+        writer.start()
+    waiting.set()
+
+
+def write_forever():
+    while True:
+        waiting.wait()
+        waiting.clear()
+        flush()
+
+
+def flush():
+    '''
+    Function that writes every queued record, called by the writer and wherever the output must be complete
+    '''
+    with write_lock:
+        texts = []
+        while len(queue) != 0:
+            texts.append((formatter or console)(queue.popleft()))
+        if len(texts) == 0:
+            return
+        stream = output if output != None else sys.__stdout__
+        try:
+            stream.write("".join(texts))
+            stream.flush()
+        except (OSError, ValueError):               # Closed console or full disk: the checks go on without their output
+            pass
+
+atexit.register(flush)                          # The writer is a daemon thread, stopped at exit without finishing its queue
+
+
+'''
+    Formatters: the coloured messages of the console, and JSON Lines
+'''
+def where(record):
+    return " on line " + '\033[94m' + str(record["line"]) + '\033[91m' + " in file " + '\033[94m' + str(record["file"]) + '\033[91m'
+
+def relation_text(record):
+    return ('\033[91m' + ("Possible error" if record.get("static") else "Fatal error" if record.get("summary") else "Error") + where(record) + ":\n\t" + '\033[94m' + record["subject"] + '\033[1m' + "."
+            + '\033[95m' + record["relation"] + '\033[91m' + "." + '\033[94m' + record["object"] + '\033[91m' + "\nIs not allowed in your ontology.\n" + '\033[0m')
+
+def constraint_text(record):
+    return ('\033[91m' + ("Possible constraint error" if record.get("static") else "Constraint error") + where(record) + ":\n\t" + '\033[94m' + record["instance"] + '\033[91m' + ": instance variable " + '\033[94m' + record["attribute"]
+            + '\033[91m' + " = " + '\033[94m' + str(record["value"]) + '\033[91m' + " violates the ontology constraint " + '\033[94m' + record["constraint"] + '\033[91m' + ".\n" + '\033[0m')
+
+def graph_text(record):
+    return ('\033[91m' + ("Fatal error" if record.get("summary") else "Error") + where(record) + ":\n\t" + '\033[94m' + record["change"] + '\033[91m'
+            + "\nMakes the linked objects inconsistent with your ontology.\n" + '\033[0m')
+
+def type_mismatch_text(record):
+    return '\033[1m' + "Warning:" + '\033[91m' + " Mismatching types at" + where(record)[3:] + ": \n" + '\033[94m' + record["declared"] + '\033[91m' + " and " + '\033[94m' + record["found"] + '\n\033[0m'
+
+def redeclared_text(record):
+    return ('\033[1m' + "Warning:" + '\033[91m' + " Declaration at" + where(record)[3:] + " :\n\t  " + '\033[94m' + record["name"] + '\033[91m' + " has already been declared. "
+            + ("The old value is now overwritten." if record["overwritten"] else "Both declarations will be tested.") + "\n" + '\033[0m')
+
+declaration_reasons = {
+    "not_in_ontology": lambda record: '\033[94m' + record["name"] + '\033[91m' + " is not a member of the ontology.\n" + '\033[91m' + "You cannot use it as the first argument to the declare() function.",
+    "undeclared_class": lambda record: '\033[94m' + record["name"] + '\033[91m' + " is not a defined class.\n" + "Please " + '\033[94m' + "declare(some_class , " + record["name"] + ")" + '\033[91m' + " before this statement.",
+    "not_an_attribute": lambda record: '\033[94m' + record["name"] + '\033[91m' + " is not an attribute of class " + '\033[94m' + str(record["cls"]),
+    "ontology_member": lambda record: '\033[94m' + record["name"] + '\033[91m' + " is a member of the ontology - it is not redefined in your script.\n" + '\033[91m' + "You cannot use it as the second argument to the " + '\033[94m' + "declare()" + '\033[91m' + " function.\n",
+}
+
+def declaration_error_text(record):
+    return '\033[91m' + "Fatal issue" + where(record) + ":\n\t  " + '\033[0m' + "\n" + declaration_reasons[record["reason"]](record) + '\033[0m'
+
+def warning_text(record):
+    return '\033[1m' + "Warning:" + '\033[91m' + " " + record["message"] + '\033[0m'
+
+def quit_text(record):
+    return '\033[1m' + "fail_quit : QUITTING THE PROGRAM" + '\033[0m'
+
+console_texts = {"relation": relation_text, "constraint": constraint_text, "graph": graph_text, "type_mismatch": type_mismatch_text, "redeclared": redeclared_text,
+                 "declaration_error": declaration_error_text, "warning": warning_text, "quit": quit_text}
+
+def console(record):
+    text = console_texts.get(record["kind"])
+    return text(record) + "\n" if text != None else str(record) + "\n"      # print() ended every message with a new line
+
+def json_line(record):
+    return json.dumps(record, default= str) + "\n"                          # Values of constraints can be any type
+
+formatters = {"console": console, "json": json_line}
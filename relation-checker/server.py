@@ -0,0 +1,214 @@
+'''
+    Checker service: loads the ontology once, and checks the triples and DataProperty values of every program that
+    calls set_server() (or runs with RELATION_CHECKER_SERVER set), with one pool of workers and one cache of verdicts:
+
+        python server.py --listen unix:/tmp/relation-checker.sock [--workers 8] [--batch 16] [--store verdicts.sqlite]
+        python server.py --listen tcp:0.0.0.0:7341
+
+    Requests and answers are JSON lines. The service greets every new connection with the hash of its ontology file,
+    which the client compares with its own:
+        {"ontology": "<sha256>"}
+        {"id": 7, "kind": "relation", "assertion": ["<class IRI>", "teaches", "<class IRI>"]}
+        {"id": 8, "kind": "constraint", "assertion": ["<class IRI>", "age", 42]}
+        {"id": 8, "verdict": true}                      true / false, or null if the reasoner kept timing out
+        {"id": 9, "verdict": null, "refused": true}     a check the service does not take, run by the client itself
+    Clients send requests without waiting for the answers, which are written back as soon as each check is decided.
+    A check asked by several clients at once is reasoned about once.
+'''
+import argparse
+import json
+import math
+import os
+import signal
+import socketserver
+import sys
+import threading
+from tools import *
+
+
+cache = {}                      # verdicts.key(kind, assertion) -> verdict of the reasoner, shared by all clients
+waiting = {}                    # verdicts.key(kind, assertion) -> [(client, request id)] waiting for a check that is being reasoned about
+cache_lock = threading.Lock()
+fingerprint = None              # Hash of the ontology file, sent to every client
+
+
+def answer(key, verdict):
+    '''
+    Function to send the verdict of a check to every client waiting for it
+    '''
+    with cache_lock:
+        waiters = waiting.pop(key, [])
+        if verdict != None:
+            cache[key] = verdict
+    if verdict != None and key[0] == "relation":
+        hierarchy.keep(key[2], key[1], key[3], verdict)
+    for client, request_id in waiters:
+        client.reply(request_id, verdict)
+
+
+service_reporters = {"relation": lambda key: answer(key, False), "constraint": lambda key: answer(key, False),
+                     "settled": lambda task, verdict: answer(task[1][0], verdict)}
+
+
+def assertable(kind, assertion):
+    '''
+    Function to check a request before anything is done with it. think() writes the names and the value of a check
+    into the code it runs, so only ontology classes, properties of the ontology and finite numbers are accepted
+    from the network.
+
+    :return: True if the individuals of the check can be made in the ontology
+    '''
+    if len(assertion) != 3 or not all(isinstance(part, str) for part in assertion[:2]):
+        return False
+    names = ontology.load()
+    if kind == "relation":
+        return isinstance(assertion[2], str) and isinstance(names.get(assertion[1]), owlready2.ObjectPropertyClass) and \
+               isinstance(default_world[assertion[0]], owlready2.ThingClass) and isinstance(default_world[assertion[2]], owlready2.ThingClass)
+    value = assertion[2]
+    return kind == "constraint" and isinstance(names.get(assertion[1]), owlready2.DataPropertyClass) and \
+           isinstance(default_world[assertion[0]], owlready2.ThingClass) and type(value) in (int, float, bool) and \
+           (type(value) != float or math.isfinite(value))
+
+
+def decide(kind, assertion):
+    '''
+    :return: The verdict of a check found without the reasoner, in the order of checks.py, or None
+    '''
+    if kind == "relation":
+        return checks.relation(assertion)
+    verdict, restrictions = checks.constraint(assertion)
+    if restrictions != None:                            # A single value, not worth waiting for a batch of facets
+        verdict = facets.evaluate(restrictions, [assertion[2]])[0]
+    return verdict
+
+
+def check(client, request):
+    kind = request["kind"]
+    assertion = tuple(request["assertion"])
+    if not assertable(kind, assertion):                 # Left to the client, as this service cannot assert it
+        metrics.counts["refused"] += 1
+        client.reply(request["id"], None, refused= True)
+        return
+    metrics.counts["intercepted"] += 1
+    verdict = decide(kind, assertion)
+    if verdict != None:
+        client.reply(request["id"], verdict)
+        return
+    key = verdicts.key(kind, assertion)                 # The type of the value is part of it, so 1, 1.0 and True differ
+    with cache_lock:
+        verdict = cache.get(key)
+        if verdict == None:
+            if key in waiting:                          # Asked by another client, answered with it
+                waiting[key].append((client, request["id"]))
+                metrics.counts["dedup_hits"] += 1
+                return
+            waiting[key] = [(client, request["id"])]
+    if verdict != None:
+        metrics.counts["dedup_hits"] += 1
+        client.reply(request["id"], verdict)
+        return
+    metrics.counts["submitted"] += 1
+    pool.submit((kind, (key,), assertion, 0), processes)
+
+
+class Client(socketserver.StreamRequestHandler):
+    '''
+    Connection of a program using the service, read by a thread of its own. Answers are written by the thread
+    that decides them, usually the collector of the pool.
+    '''
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+        self.closed = False
+
+    def reply(self, request_id, verdict, refused= False):
+        answer = {"id": request_id, "verdict": verdict, "refused": True} if refused else {"id": request_id, "verdict": verdict}
+        with self.write_lock:
+            if self.closed:
+                return
+            try:
+                self.wfile.write((json.dumps(answer) + "\n").encode())
+            except OSError:
+                self.closed = True
+
+    def handle(self):
+        with self.write_lock:
+            self.wfile.write((json.dumps({"ontology": fingerprint}) + "\n").encode())
+        for line in self.rfile:
+            request = None
+            try:
+                request = json.loads(line)
+                check(self, request)
+            except (ValueError, KeyError, TypeError, IndexError):      # Malformed request, left to the client
+                if isinstance(request, dict) and "id" in request:
+                    self.reply(request["id"], None, refused= True)
+
+    def finish(self):
+        with self.write_lock:
+            self.closed = True
+        super().finish()
+
+
+def make_server(address):
+    '''
+    :param address: "unix:/path/of/socket" or "tcp:host:port"
+    '''
+    kind, separator, place = address.partition(":")
+    if kind == "unix":
+        if os.path.exists(place):
+            os.remove(place)                            # Left by a service that did not stop cleanly
+        server = socketserver.ThreadingUnixStreamServer(place, Client, bind_and_activate= False)
+    elif kind == "tcp":
+        host, separator, port = place.rpartition(":")
+        server = socketserver.ThreadingTCPServer((host, int(port)), Client, bind_and_activate= False)
+        server.allow_reuse_address = True
+    else:
+        raise ValueError("Address must start with unix: or tcp:, not " + repr(address))
+    server.daemon_threads = True
+    server.server_bind()
+    server.server_activate()
+    return server
+
+
+def main(argv= None):
+    global fingerprint
+    parser = argparse.ArgumentParser(description= "Serve relation-checker checks to many programs.")
+    parser.add_argument("--listen", required= True, help= "unix:/path/of/socket or tcp:host:port")
+    parser.add_argument("--workers", type= int, help= "number of checker workers, defaults to the number of CPUs")
+    parser.add_argument("--memory", type= int, help= "JVM heap of the reasoner of each worker in MB")
+    parser.add_argument("--batch", type= int, help= "number of checks reasoned together")
+    parser.add_argument("--window", type= float, help= "seconds a check waits for its batch to fill up")
+    parser.add_argument("--store", help= "SQLite file of the verdict store")
+    parser.add_argument("--metrics", help= "file the metrics of the service are written to, see set_metrics")
+    args = parser.parse_args(argv)
+
+    set_pool(args.workers, args.memory)
+    set_batching(args.batch, args.window)
+    if args.store != None:
+        set_verdict_store(args.store)
+    if args.metrics != None:
+        set_metrics(args.metrics)
+    pool.server_address = None                          # The service runs its own workers
+    ontology.load()
+    fingerprint = verdicts.ontology_fingerprint(ontology.ontology_path())
+    pool.start_pool(think, service_reporters, processes, running)
+    server = make_server(args.listen)
+    metrics.gauges["cached_verdicts"] = lambda: len(cache)
+    print('\033[1m' + "relation-checker service listening on " + args.listen + '\033[0m', file= sys.__stdout__)
+    sys.__stdout__.flush()
+    signal.signal(signal.SIGTERM, signal.default_int_handler)     # Stopped by kill as by Ctrl-C, with its workers
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.stop_pool()
+        metrics.dump()
+        if args.listen.startswith("unix:") and os.path.exists(args.listen[5:]):
+            os.remove(args.listen[5:])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+'''
+    Reasoner deadlines derived from measured latency.
+    Every relation / DataProperty keeps an exponentially weighted moving average of the time its checks take,
+    and the deadline of a batch is that average times a multiplier, kept between a floor and a ceiling.
+'''
+from collections import defaultdict
+import threading
+
+
+initial_timeout = 30.0          # Deadline in seconds for relations that have not been measured yet
+multiplier = 4.0                # Deadline = multiplier * average latency
+floor = 5.0                     # Smallest deadline, leaves room for the start of the JVM
+ceiling = 300.0                 # Largest deadline of a first attempt
+smoothing = 0.2                 # Weight of a new measurement in the average
+max_retries = 2                 # Times a timed out check is tried again
+backoff = 2.0                   # Each retry multiplies the deadline by this factor
+
+latency = {}                            # Relation / DataProperty name -> average seconds of a reasoner run
+timeout_counts = defaultdict(int)       # Relation / DataProperty name -> number of timed out checks
+retry_counts = defaultdict(int)         # Relation / DataProperty name -> number of retried checks
+stats_lock = threading.Lock()
+
+
+def set_timeouts(multiplier= None, floor= None, ceiling= None, initial= None, retries= None, backoff= None):
+    '''
+    Function to tune the deadlines of the reasoner
+
+    :param multiplier: Deadline as a multiple of the measured average latency
+    :param floor: Smallest deadline in seconds
+    :param ceiling: Largest deadline in seconds (before backoff)
+    :param initial: Deadline in seconds before a relation has been measured
+    :param retries: Number of times a timed out check is tried again
+    :param backoff: Factor applied to the deadline on every retry
+    '''
+    settings = globals()
+    for name, value in [("multiplier", multiplier), ("floor", floor), ("ceiling", ceiling), ("initial_timeout", initial), ("max_retries", retries), ("backoff", backoff)]:
+        if value != None:
+            settings[name] = type(settings[name])(value)
+
+
+def observe(names, seconds):
+    '''
+    Function called by the collector with the duration of a batch that finished in time
+    '''
+    with stats_lock:
+        for name in names:
+            if name in latency:
+                latency[name] += smoothing * (seconds - latency[name])
+            else:
+                latency[name] = seconds
+
+
+def deadline(names, attempt= 0):
+    '''
+    Function that gives the deadline of a batch
+
+    :param names: Names of the relations / DataProperties checked in the batch
+    :param attempt: 0 for a first try, n for the n-th retry
+    :return: Seconds before the reasoner of the batch is killed
+    '''
+    with stats_lock:
+        seconds = max([latency[name] * multiplier if name in latency else initial_timeout for name in names] or [initial_timeout])
+    return min(max(seconds, floor), ceiling) * backoff ** attempt
+
+
+def timed_out(names, retried):
+    '''
+    Function called by the collector when a batch is stopped by its deadline
+
+    :param names: Names of the relations / DataProperties of the stopped checks, one per check
+    :param retried: Names of the checks that are tried again
+    '''
+    with stats_lock:
+        for name in names:
+            timeout_counts[name] += 1
+        for name in retried:
+            retry_counts[name] += 1
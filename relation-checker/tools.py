@@ -2,7 +2,6 @@ from utils import *
 import threading
 import _thread as thread
 import os
-from multiprocessing import Process
 import csv
 import psutil
 import signal
@@ -11,7 +10,15 @@ import re
 '''
     Functions for creating the link
 '''
-def link_maker(name, object, argument1, argument2, cls, tm, vo, oh, onto_properties):
+def declaration_error(reason, name, calling_line, calling_file, cls= None):
+    '''
+    Function that reports a declaration that cannot be made, and stops the program
+    '''
+    reports.report({"kind": "declaration_error", "line": calling_line, "file": calling_file, "name": name, "reason": reason, "cls": cls})
+    reports.flush()
+    exit(1)
+
+def link_maker(name, object, argument1, argument2, cls, tm, vo, oh, onto_properties, chk= None, caller= None):
     '''
     This function creates a link between the user's script and an ontology entity.
     This function should be called after a variable is introduced in the code to link that variable to the Ontology.
@@ -24,242 +31,365 @@ def link_maker(name, object, argument1, argument2, cls, tm, vo, oh, onto_propert
     :param tm: Optional argument, set to False to turn off type mismatch warnings
     :param vo: Optional argument, set to False to turn off value overwrite warnings
     :param oh: Optional argument, set to False if you want declaration to not stop another declaration that it overwrites
+    :param chk: Optional argument, checking setting of this declaration that overrides set_checking
+    :param caller: Optional argument, frame of the user's code that declares object, the caller of declare by default
     :return:
     '''
     if object == None:
         pass                                                            # Needs to be modified for automatic object recognition from line below
 
     name_string = stringified_name(name)
-    calling_line = getframeinfo(stack()[2][0]).lineno                   # Line from which script calls the declare function
-    calling_file = getframeinfo(stack()[2][0]).filename                 # File in which function is called
+    original_globals = ontology.load()                                  # Names of the Ontology, loaded by the first declaration
+    caller = caller if caller != None else sys._getframe(2)
+    calling_line = caller.f_lineno                                      # Line from which script calls the declare function
+    calling_file = caller.f_code.co_filename                            # File in which function is called
 
     # Ensure that the name of the Ontology element is in the Ontology
     if name_string not in original_globals.keys():
-        print('\033[91m' + "Fatal issue on line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m' + ":\n\t  " + '\033[0m')
-        print('\033[94m' + name_string + '\033[91m' + " is not a member of the ontology.")
-        print('\033[91m' + "You cannot use it as the first argument to the declare() function.")
-        exit(1)
+        declaration_error("not_in_ontology", name_string, calling_line, calling_file)
 
     orig_name = original_globals[name_string]                           # To avoid confusion in case of duplicate name in script
 
     # Handle case when class argument is provided, used to catch errors in arguments
     if cls != None:
         if cls not in classes.keys():
-            print('\033[91m' + "Fatal issue on line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m' + ":\n\t  " + '\033[0m')
-            print('\033[94m' + stringified_name(cls) + '\033[91m' + " is not a defined class.")
-            print( "Please " + '\033[94m' + "declare(some_class , " + stringified_name(cls) + ")" + '\033[91m' + " before this statement." + '\033[0m')
-            exit(1)
+            declaration_error("undeclared_class", stringified_name(cls), calling_line, calling_file)
         if (stringified_name(object) not in instance_variables):# and stringified_name(object) not in cls.__init__.__code__.co_varnames):
-            print('\033[91m' + "Fatal issue on line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m' + ":\n\t  " + '\033[0m')
-            print('\033[94m' + stringified_name(object) + '\033[91m' + " is not an attribute of class " + '\033[94m' + str(cls.__name__) + '\033[0m')
-            exit(1)
+            declaration_error("not_an_attribute", stringified_name(object), calling_line, calling_file, cls.__name__)
         else:
-            onto_properties[cls].append((name_string, stringified_name(object)))
-
-    if tm == False:
-        disable_print()
+            onto_properties[cls].append((name_string, stringified_name(object), chk))      # Checking setting of the attribute's own declaration
 
     # Issue warnings for type mismatches in arguments
+    mismatched = False
     while(True):
         if ((type(orig_name) == owlready2.prop.ObjectPropertyClass or type(orig_name) == owlready2.prop.DataPropertyClass) and inspect.isfunction(object)):
             break
-        if (object in instance_variables):          # Needs to be changed to account for type of variable declared
+        if (isinstance(object, str) and object in instance_variables):          # Needs to be changed to account for type of variable declared
             break
         if (inspect.isclass(object) and inspect.isclass(type(orig_name)) != inspect.isclass(type(object))):
-            print('\033[1m' + "Warning:" + '\033[91m' + " Mismatching types at line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m' + ": \n" + '\033[94m' + str(type(orig_name)) + '\033[91m' + " and " + '\033[94m' + str(type(object)) + '\n\033[0m')
+            mismatched = True
             break
         if (inspect.isclass(object) != inspect.isclass(orig_name)):
-            print('\033[1m' + "Warning:" + '\033[91m' + " Mismatching types at line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m' + ": \n" + '\033[94m' + str(type(orig_name)) + '\033[91m' + " and " + '\033[94m' + str(type(object)) + '\n\033[0m')
+            mismatched = True
             break
         if (inspect.isclass(object) and inspect.isclass(type(orig_name)) == inspect.isclass(type(object))):
             break
         if (inspect.isfunction(object) == False and inspect.isfunction(orig_name) == False and inspect.isclass(object) == False and inspect.isclass(type(object)) and inspect.isclass(type(orig_name)) == inspect.isclass(type(object)) and inspect.isclass(orig_name) == inspect.isclass(object)):
             break
         if (type(orig_name) != type(object)):
-            print('\033[1m' + "Warning:" + '\033[91m' + " Mismatching types at line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m' + ": \n" + '\033[94m' + str(type(orig_name)) + '\033[91m' + " and " + '\033[94m' + str(type(object)) + '\n\033[0m')
+            mismatched = True
             break
         break
 
-    enable_print()
+    if mismatched and tm != False:
+        reports.report({"kind": "type_mismatch", "line": calling_line, "file": calling_file, "declared": str(type(orig_name)), "found": str(type(object))})
 
     lines[name][object] = calling_line                                  # Helps the entry_line function
-
-    if vo == False:
-        disable_print()
+    declared_entities[object][name] = calling_line
 
     # Ensure that the script object is not taken directly from the Ontology
     if stringified_name(object) in original_globals.keys():
         if object == orig_name:
-            print('\033[91m' + "Fatal issue on line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m'  + ":\n\t  " + '\033[0m')
-            print('\033[94m' + stringified_name(object) + '\033[91m' + " is a member of the ontology - it is not redefined in your script.")
-            print('\033[91m' + "You cannot use it as the second argument to the " + '\033[94m' + "declare()" + '\033[91m' + " function.\n")
-            exit(1)
+            declaration_error("ontology_member", stringified_name(object), calling_line, calling_file)
 
     warning = 0
-    for name_list in [method_names, class_names, instance_names]:
+    kinds = name_kinds[name_string]
+    for kind, name_list in name_lists:
         # If script object is being reassigned to another Ontology entity, delete the reference to the previous Ontology entity
-        if enchanced_to_orig[object] in list_dict_map[object_name(name_list)].keys() and [argument1, argument2, name_list] in func_args[enchanced_to_orig[object]]:
+        if enchanced_to_orig[object] in list_dict_map[kind].keys() and [argument1, argument2, kind] in func_args[enchanced_to_orig[object]]:
             if warning == 0:
-                if oh == True:
-                    print('\033[1m' + "Warning:" + '\033[91m' + " Declaration at line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m' + " :\n\t  " + '\033[94m' + stringified_name(enchanced_to_orig[object]) + '\033[91m' + " has already been declared. The old value is now overwritten.\n" + '\033[0m')
-                else:
-                    print('\033[1m' + "Warning:" + '\033[91m' + " Declaration at line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m' + " :\n\t  " + '\033[94m' + stringified_name(enchanced_to_orig[object]) + '\033[91m' + " has already been declared. Both declarations will be tested.\n" + '\033[0m')
+                if vo != False:
+                    reports.report({"kind": "redeclared", "line": calling_line, "file": calling_file, "name": stringified_name(enchanced_to_orig[object]), "overwritten": oh == True})
                 overwrites.append([calling_line, stringified_name(enchanced_to_orig[object])])
                 warning += 1
-            del list_dict_map[object_name(name_list)][enchanced_to_orig[object]]
+            del list_dict_map[kind][enchanced_to_orig[object]]
         else:
-            func_args[enchanced_to_orig[object]].append([argument1, argument2, name_list])      # Name list ensures that warning is not throws erraneously if object is in multiple lists
+            func_args[enchanced_to_orig[object]].append([argument1, argument2, kind])      # Name list ensures that warning is not throws erraneously if object is in multiple lists
 
         # Specifically for the appropriate list
-        if name_string in name_list:
+        if kind in kinds:
             if name_list != instance_names:
-                list_dict_map[object_name(name_list)][enchanced_to_orig[object]] = copy.copy(orig_name)         # Shallow copy allows to create distinct objects from same Ontology object
+                list_dict_map[kind][enchanced_to_orig[object]] = copy.copy(orig_name)         # Shallow copy allows to create distinct objects from same Ontology object
             else:
                 # Instance names keyed by calling line, since instance values change
-                list_dict_map[object_name(name_list)][calling_line] = copy.copy(orig_name)                    # Proposed to replace object with calling_line because variable can change
-                count = 0
-                for line in lines.keys():
-                    if lines[line][object]:
-                        count += 1
+                list_dict_map[kind][calling_line] = copy.copy(orig_name)                    # Proposed to replace object with calling_line because variable can change
                 # If the variable has been declared before, issue a warning, and delete it from instances
-                if count > 1:
-                    print('\033[1m' + "Warning:" + '\033[91m' + " Declaration at line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m' + " : " + '\033[94m' + stringified_name(
-                        enchanced_to_orig[object]) + '\033[91m' + " has already been declared. The old value is now overwritten." + '\033[0m')
-                    for line in lines.keys():
-                        if lines[line][object] != calling_line:
-                            del instances[lines[line][object]]
+                if len(declared_entities[object]) > 1:
+                    if vo != False:
+                        reports.report({"kind": "redeclared", "line": calling_line, "file": calling_file, "name": stringified_name(enchanced_to_orig[object]), "overwritten": True})
+                    for line in list(declared_entities[object].values()):
+                        if line != calling_line:
+                            instances.pop(line, None)
                             overwrites.append([calling_line, stringified_name(enchanced_to_orig[object])])
 
             # If the object is a class and it is from the script, add it to the script's globals and add the instance variables to the script's globals
             if name_list == class_names and type(object) != owlready2.prop.DataPropertyClass and type(object) != owlready2.prop.ObjectPropertyClass:   # Adds class to globals and then adds instance variables to globals, avoids owl objects
-                inspect.stack()[2][0].f_globals[stringified_name(object)] = object
+                caller.f_globals[stringified_name(object)] = object
                 try:
-                    instance = inspect.stack()[2][0].f_globals[stringified_name(object)].__init__.__code__.co_names
+                    instance = inspect.unwrap(caller.f_globals[stringified_name(object)].__init__).__code__.co_names      # Names of the user's __init__, not of instance_initializer
                     for i in instance:
-                        inspect.stack()[2][0].f_globals[i] = i
-                        instance_variables.append(i)
+                        caller.f_globals[i] = i
+                        instance_variables.add(i)
                 except:
-                    inspect.stack()[2][0].f_globals[stringified_name(object)] = object              # Set global to object, not stringified name
+                    caller.f_globals[stringified_name(object)] = object              # Set global to object, not stringified name
 
             if name_list == method_names:
-                if oh == True:
-                    position = 0
-                    for func in func_props[enchanced_to_orig[object]]:
-                        if func[1] == argument1 and func[2] == argument2:
-                            del func_props[enchanced_to_orig[object]][position]
-                        position += 1
-                func_props[enchanced_to_orig[object]].append([methods[enchanced_to_orig[object]], argument1, argument2])
+                if oh == True:                      # Replaced in place, function_enhancer reads the same list
+                    func_props[enchanced_to_orig[object]][:] = [func for func in func_props[enchanced_to_orig[object]] if func[1] != argument1 or func[2] != argument2]
+                relation = methods[enchanced_to_orig[object]]
+                func_props[enchanced_to_orig[object]].append([relation, argument1, argument2, sys.intern(stringified_name(relation)), chk])     # Check plan read by function_enhancer
 
 '''
-    Function that uses sync_reasoner() to find inconsistencies in the source code
+    Functions called with the key of tested_triples whenever a check is decided.
+    Listeners (see aio.py) are called with (key, verdict, violation record); verdict is None for a check that timed out.
 '''
-def think(inst1, relation, inst2, calling_line, type1, type2, fail_quit, lock, processes, running, calling_file, tested_triples, at_end):
-    lock.acquire()
-    onto1 = type1()
-    onto2 = type2()
-    exec("onto1" + "." + relation + ".append(" + "onto2" + ")")
-    lock.release()
-    try:
-        sync_reasoner(debug=0)             # Debug = 0 to avoid printing messages
+verdict_listeners = [hierarchy.settled]         # Keeps the verdicts of the reasoner for the sub and superclasses, see hierarchy.py
 
-    except:
-        lock.acquire()
-        noNum_inst1 = re.sub(r'\d+$', '', inst1[5:])
-        noNum_inst2 = re.sub(r'\d+$', '', inst2[5:])
-        if at_end.value == 0:
-            print('\033[91m' + "Error on line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m' + ":\n\t" + '\033[94m' + noNum_inst1 + '\033[1m' + "." + '\033[95m' + relation + '\033[91m' + "." + '\033[94m' + noNum_inst2 + '\033[91m' + "\nIs not allowed in your ontology.\n" + '\033[0m')
+def settle(key, verdict, record= None):
+    if verdict == True:
+        tested_triples[key][0] = 1                  # Set pass indicator to 1
+    for listener in verdict_listeners:
+        listener(key, verdict, record)
 
-        processes.value -= 1
+def task_key(task):
+    '''
+    Function that returns the key of tested_triples of a check sent to the workers
+    '''
+    if task[0] == "relation":
+        return (individual_stem(task[1][0]), task[1][1], individual_stem(task[1][2]))
+    return (task[1][0], task[1][6], task[1][5])
 
-        tested_triples[(noNum_inst1, relation, noNum_inst2)] = [-1, *tested_triples[(noNum_inst1, relation, noNum_inst2)][1:]]        # Set fail indicator to -1
+def check_settled(task, verdict):
+    if task[0] == "graph":
+        graph.settled(task[2], verdict)
+        return
+    settle(task_key(task), verdict)
 
+'''
+    Functions that report a triple or a DataProperty value that is not allowed in the ontology.
+    Only called in the main process: by the collector for failures found by the workers, and by the paths that decide without the reasoner.
+    The lock only covers the status of the check: the record is queued for the writer of reports.py once it is released.
+'''
+def relation_error(inst1, relation, inst2, calling_line, calling_file, fail_quit):
+    noNum_inst1 = individual_stem(inst1)
+    noNum_inst2 = individual_stem(inst2)
+    record = {"kind": "relation", "line": calling_line, "file": calling_file, "subject": noNum_inst1, "relation": relation, "object": noNum_inst2}
+    with lock:
+        tested_triples[(noNum_inst1, relation, noNum_inst2)][0] = -1    # Set fail indicator to -1
+        if ((noNum_inst1, relation, noNum_inst2), calling_line, calling_file) in static_sites:
+            record["static"] = True                 # Found by precheck, at a call that has not run
+        else:
+            metrics.violations[relation] += 1
+    if at_end.value == 0:
+        reports.report(record)
+    if fail_quit:
+        reports.report({"kind": "quit"})
+        quit_program()
+    settle((noNum_inst1, relation, noNum_inst2), False, record)
+
+def constraint_error(constr, onto_inst, calling_line, calling_file, fail_quit, tested_value, inst_name):
+    record = {"kind": "constraint", "line": calling_line, "file": calling_file,
+              "instance": stringified_name(onto_inst), "attribute": inst_name, "value": tested_value, "constraint": constr}
+    with lock:
+        tested_triples[(constr, inst_name, tested_value)][0] = -2
+        if ((constr, inst_name, tested_value), calling_line, calling_file) in static_sites:
+            record["static"] = True
+        else:
+            metrics.violations[constr] += 1
+    if at_end.value == 0:
+        reports.report(record)
+    if fail_quit:
+        reports.report({"kind": "quit"})
+        quit_program()
+    settle((constr, inst_name, tested_value), False, record)
+
+def graph_error(description, changes= None):
+    for record, fail_quit, undo, triple in graph.failed(description, changes):
+        if triple != None and tested_triples.get(triple, [0])[0] == -1:
+            continue                                # The call itself is not allowed, and is reported as such
+        with lock:
+            metrics.violations[record["relation"]] += 1
+        graph.errors.append(record)
+        if at_end.value == 0:
+            reports.report(record)
         if fail_quit:
-            print('\033[1m' + "fail_quit : QUITTING THE PROGRAM" + '\033[0m')
-            if finder('java'):
-                killer("java")
-            killer("python")
-
-        lock.release()
-    finally:
-        running.value -= 1
+            reports.report({"kind": "quit"})
+            quit_program()
+        settle(None, False, record)
 
 '''
-    Function that uses sync_reasoner() to find violations of DataProperty constraints
+    Functions that add a triple or a DataProperty value to the worker's world, returning the individuals created for it.
+    type1, type2 and type_onto_inst are IRIs, resolved in the worker's own copy of the ontology.
 '''
-def constraint(constr, onto_inst, type_onto_inst, running, at_end, lock, calling_line, calling_file, fail_quit, tested_value, processes, inst_name, tested_triples):
-    lock.acquire()
-    onto_inst = type_onto_inst()
-    exec("onto_inst" + "." + constr + " = " + str(tested_value))
-    lock.release()
+def relation_individuals(world, type1, relation, type2):
+    onto1 = world[type1]()
+    onto2 = world[type2]()
+    exec("onto1" + "." + relation + ".append(" + "onto2" + ")")
+    return [onto1, onto2]
+
+def constraint_individuals(world, type_onto_inst, constr, tested_value):
+    new_inst = world[type_onto_inst]()
     try:
-        sync_reasoner(debug=0)
+        exec("new_inst" + "." + constr + " = " + str(tested_value))
     except:
-        lock.acquire()
-        if at_end.value == 0:
-            print('\033[91m' + "Constraint error on line " + '\033[94m' + str(calling_line) + '\033[91m' + " in file " + '\033[94m' + calling_file + '\033[91m' + ":\n\t" + '\033[94m' + stringified_name(onto_inst) + '\033[91m' + ": instance variable " + '\033[94m' + inst_name + '\033[91m' + " = " + '\033[94m' + str(tested_value) + '\033[91m' + " violates the ontology constraint " + '\033[94m' + constr + '\033[91m' + ".\n" + '\033[0m')
+        destroy_entity(new_inst)
+        raise
+    return [new_inst]
 
-        tested_triples[(constr, inst_name, tested_value)] = [-2, *tested_triples[(constr, inst_name, tested_value)][1:]]
-
-        processes.value -= 1
+def graph_individuals(world, classes, name, links):
+    created = [world[iri]() for iri in classes]
+    try:
+        if len(created) > 1:                                    # OWL has no unique name assumption: without it, two objects given to a
+            created.append(owlready2.AllDifferent(created[:]))  # functional relation would be one individual and never inconsistent
+        for number1, relation, number2 in links[0]:
+            current = getattr(created[number1], relation)
+            if isinstance(current, list):
+                current.append(created[number2])
+            else:                                               # FunctionalProperty, whose attribute only holds one value
+                world._props[relation][created[number1]].append(created[number2])
+        for number, constr, value in links[1]:
+            current = getattr(created[number], constr)
+            if isinstance(current, list):
+                current.append(value)
+            else:
+                setattr(created[number], constr, value)         # FunctionalProperty
+    except:
+        destroy_individuals(created)
+        raise
+    return created
+
+def destroy_individuals(created):
+    for individual in reversed(created):                        # An AllDifferent goes before the individuals it lists
+        if isinstance(individual, owlready2.AllDifferent):
+            individual.destroy()
+        else:
+            destroy_entity(individual)
 
-        if fail_quit:
-            print('\033[1m' + "fail_quit : QUITTING THE PROGRAM" + '\033[0m')
-            if finder('java'):
-                killer("java")
-            killer("python")
+individual_makers = {"relation": relation_individuals, "constraint": constraint_individuals, "graph": graph_individuals}
+error_reporters = {"relation": relation_error, "constraint": constraint_error, "graph": graph_error, "settled": check_settled}
+facets.reporters = error_reporters
+graph.reporters = error_reporters
 
-        lock.release()
+'''
+    Function that uses sync_reasoner() to find inconsistencies in the source code.
+    Each task of the batch is (kind, arguments of the error reporter, arguments of the individual maker, number of the attempt).
+    The whole batch is reasoned at once; if it is inconsistent, it is split in halves until the failing tasks are isolated.
+'''
+def think(batch, results, timed_out, index):
+    if timed_out[index] == 1:                   # Reasoner was stopped by its deadline timer, the batch is neither proven nor refuted
+        results.put(("timeout", batch))
+        return
+    ontology.load()                             # Workers of analyze.py load the ontology with their first batch
+    try:
+        world = locality.world_for(batch)       # Module of the ontology the checks depend on, see locality.py
+    except Exception:
+        world = default_world
+    created = []
+    checked = []
+    unasserted = []
+    for task in batch:
+        try:
+            created += individual_makers[task[0]](world, *task[2])
+            checked.append(task)
+        except:
+            unasserted.append(task)             # Value cannot be asserted in the ontology at all
+    if len(unasserted) != 0:
+        results.put(("unasserted", unasserted)) # Settled without a verdict, so nothing keeps waiting for them
+    if len(checked) == 0:
+        return
+    try:
+        sync_reasoner(world, debug=0)           # Debug = 0 to avoid printing messages
+        consistent = True
+    except owlready2.OwlReadyInconsistentOntologyError:
+        consistent = False
+    except Exception:
+        consistent = None                       # No java, JVM out of memory or crashed: the reasoner did not answer
     finally:
-        running.value -= 1
+        destroy_individuals(created)            # The worker's world is reused for the next check
+
+    if timed_out[index] == 1:
+        results.put(("timeout", checked))
+        return
+    if consistent == None:
+        results.put(("undecided", checked))     # Neither recorded nor split, like a timeout without retries
+        return
+    if consistent:
+        verdicts.record(checked, True)
+        results.put(("passed", checked))
+        return
+    if len(checked) == 1:
+        verdicts.record(checked, False)
+        results.put(("failed", checked[0]))
+        return
+    half = len(checked) // 2
+    think(checked[:half], results, timed_out, index)
+    think(checked[half:], results, timed_out, index)
+
+'''
+    Function that decides a check claimed by a call, in the order of checks.py, or sends it to the workers.
+    Called by declared functions and classes, and by analyze.py for the checks of a trace log or of precheck.
+    The task is (kind, arguments of the error reporter, assertion, 0), as the workers take it.
+'''
+def dispatch(key, task, procs):
+    if task[0] == "relation":
+        verdict = checks.relation(task[2])
+    else:
+        verdict, restrictions = checks.constraint(task[2])
+        if restrictions != None:                    # Only the facets of the range are left, evaluated in batches
+            facets.submit(restrictions, task)
+            return
+    if verdict == False:
+        error_reporters[task[0]](*task[1])
+    elif verdict == True:
+        settle(key, True)
+    else:
+        metrics.counts["submitted"] += 1
+        if task[0] == "relation":
+            hierarchy.pending[key] = task[2]        # Its verdict is carried to the sub and superclasses, see hierarchy.py
+        pool.submit(task, procs)
 
 '''
     Functions for testing the label against the Ontology
 '''
 def function_enhancer(fn, fail_quit, procs, argument1, argument2):
+    fn_name = fn.__name__
+    metric_name = stringified_name(fn)
+    relevant_ops = func_props[enchanced_to_orig[fn]]           # Check plan: [relation, argument index, argument index, relation name, checking setting], updated in place by link_maker
+    onto_class = individuals.onto_class
     def new_function(*args, **kwargs):
-        fn(*args, **kwargs)
-        #print("New")                            # This is where the checking against Ontology is defined
-                                                # Do try/except to check for an error
-                                                # Build an ontology for the model in Ontologies.py
-        if getframeinfo(stack()[1][0]).function == fn.__name__:         # Identifies recursion
-            return
-        relevant_ops = func_props[enchanced_to_orig[fn]]
-        calling_file = getframeinfo(stack()[1][0]).filename
+        result = fn(*args, **kwargs)
+        caller = sys._getframe(1)                               # Only the raw frame of the caller, stack() would read the source of every frame
+        if caller.f_code.co_name == fn_name:                    # Identifies recursion
+            return result
+        started = time.perf_counter() if metrics.timing else None
+        calling_line = caller.f_lineno                          # Line of error for think() in case of error
+        calling_file = caller.f_code.co_filename
         for operation in relevant_ops:
-            relation = stringified_name(operation[0])
-            arg1 = args[operation[1]]
-            arg2 = args[operation[2]]
-            inst1 = item_to_onto[arg1]
-            inst2 = item_to_onto[arg2]
-            calling_line = getframeinfo(stack()[1][0]).lineno                                       # Line of error for think() in case of error
-
-            #exec("inst1" + "." + stringified_name(relation) + ".append(" + "inst2" + ")")
-    #    p = threading.Thread(target=think, args= (inst1, relation, inst2, calling_line), daemon= True)
-    #    p.start()
-        #p.join(timeout= waiting_time)
-    #    timer = threading.Timer(waiting_time, p.join, kwargs={'timeout' : 0})
-    #    timer.start()
-            #global fail_indicators
-            #fail_indicators.append(Value('i', 0))
-            noNum_inst1 = re.sub(r'\d+$', '', str(inst1)[5:])
-            noNum_inst2 = re.sub(r'\d+$', '', str(inst2)[5:])
-            global tested_triples
-            if (noNum_inst1, stringified_name(relation), noNum_inst2) in tested_triples.keys():       # Need to identify recursion
-                tested_triples[(noNum_inst1, stringified_name(relation), noNum_inst2)] = tested_triples[(noNum_inst1, stringified_name(relation), noNum_inst2)] + [[calling_line, calling_file]]
+            relation = operation[3]
+            setting = operation[4] or relation_checking.get(relation, default_checking)
+            if setting[0] == "off" or (setting[0] == "sampled" and not sampled(setting, (calling_file, calling_line, relation))):
                 continue
-            else:
-                tested_triples[(noNum_inst1, stringified_name(relation), noNum_inst2)] = [0, [calling_line, calling_file]]
-            global running
-            global at_end
-            p = Process(target= think, args= (str(inst1), stringified_name(relation), str(inst2), calling_line, type(inst1), type(inst2), fail_quit, lock, procs, running, calling_file, tested_triples, at_end ))
-            processes.value += 1
-            if processes.value > CPUs:
-                queue_processes.put(p)
-                start_times[p] = 0
-            else:
-                p.start()
-                start_times[p] = time.time()
-                running.value += 1
+            cls1 = onto_class(args[operation[1]])               # Only the classes, no individual is needed for a relation
+            cls2 = onto_class(args[operation[2]])
+            if cls1 == None or cls2 == None:                    # Argument is not linked to the ontology
+                continue
+            if tracelog.trace_file != None:                     # Trace mode, analyze.py checks the triple later
+                tracelog.relation(relation, cls1.iri, cls2.iri, calling_file, calling_line)
+                continue
+            metrics.counts["intercepted"] += 1
+            key = (class_stem(cls1), relation, class_stem(cls2))
+            if graph.enabled:                                   # The link between the two objects, checked with the objects around them
+                graph.added(args[operation[1]], relation, args[operation[2]], {"kind": "graph", "line": calling_line, "file": calling_file,
+                            "change": key[0] + "." + relation + "." + key[2], "relation": relation}, key, fail_quit, procs)
+            if not claim(key, [calling_line, calling_file], setting[0] != "first_seen"):        # Checked by the first call, in whichever thread
+                metrics.counts["dedup_hits"] += 1
+                continue
+            inst1 = individuals.individual_name(cls1.iri)
+            inst2 = individuals.individual_name(cls2.iri)
+            dispatch(key, ("relation", (inst1, relation, inst2, calling_line, calling_file, fail_quit), (cls1.iri, relation, cls2.iri), 0), procs)
+        if started != None:
+            metrics.wrapper_time(metric_name, time.perf_counter() - started)
+        return result
 
     enchanced_to_orig[new_function] = fn
     return new_function
@@ -267,53 +397,82 @@ def function_enhancer(fn, fail_quit, procs, argument1, argument2):
 '''
     Function for creating new Ontology instance
 '''
-def instance_initializer(initializer, item_to_onto, onto_properties, fail_quit, procs, object):
+def instance_initializer(initializer, onto_properties, fail_quit, procs, object, chk= None):
+    varnames = initializer.__code__.co_varnames if hasattr(initializer, '__code__') else ()
+    metric_name = stringified_name(object) + ".__init__"
     def new_function(*args, **kwargs):
         initializer(*args, **kwargs)
-        #print("New")                            # This is where the instance is created in the Ontology
-        cls_name = stringified_name(initializer).split('.')[0]
-        cls = inspect.stack()[1][0].f_globals[cls_name]
-        cls_onto = classes[cls]
-        instance = cls_onto()
-        item_to_onto[args[0]] = instance                              # Create the new ontology instance for self of initializer
-        calling_file = getframeinfo(stack()[1][0]).filename
-        calling_line = getframeinfo(stack()[1][0]).lineno
-        global tested_triples
-        global running
-        global at_end
-        global tested_triples
-        #print(args)
-        #print(initializer.__code__.co_varnames)
+        onto_cls = classes[object]
+        individuals.link(args[0], onto_cls)                         # The individual is only created when a constraint is checked
+        constraints = onto_properties[object]
+        if graph.enabled and tracelog.trace_file == None:
+            graph.constructed(args[0], [(constr[0], args[0].__dict__[constr[1]]) for constr in constraints if constr[1] in getattr(args[0], "__dict__", {})])
+        if len(constraints) == 0:
+            return
+        caller = sys._getframe(1)
+        started = time.perf_counter() if metrics.timing else None
+        calling_line = caller.f_lineno
+        calling_file = caller.f_code.co_filename
+        instance = None
         try:
-            for constr in onto_properties[cls]:                        # constr is a string of the name of the DataProperty constraint corresponding to an instance variable
-                index = initializer.__code__.co_varnames.index(constr[0])
+            for constr in constraints:                              # constr is (DataProperty name, instance variable name, checking setting of its declaration)
+                if constr[0] not in varnames:
+                    break
+                setting = constr[2] or chk or relation_checking.get(constr[0], default_checking)
+                if setting[0] == "off" or (setting[0] == "sampled" and not sampled(setting, (calling_file, calling_line, constr[0]))):
+                    continue
                 inst_name = constr[1]
                 tested_value = args[0].__dict__[inst_name]                              # args[0] is the declared object
-                if (constr[0], constr[1], tested_value) in tested_triples.keys():
-                    tested_triples[(constr[0], constr[1], tested_value)] = tested_triples[(constr[0], constr[1], tested_value)] + [[calling_line, calling_file]]
+                if tracelog.trace_file != None:
+                    tracelog.constraint(constr[0], onto_cls.iri, inst_name, tested_value, calling_file, calling_line)
+                    continue
+                metrics.counts["intercepted"] += 1
+                if instance == None:
+                    instance = individuals.individual(args[0])         # Its name is reported with every line of the value
+                key = (constr[0], inst_name, tested_value)
+                if not claim(key, [calling_line, calling_file, stringified_name(instance)], setting[0] != "first_seen"):     # print_errors needs the instance of every line
+                    metrics.counts["dedup_hits"] += 1
                     continue
-                else:
-                    tested_triples[(constr[0], constr[1], tested_value)] = [0, [calling_line, calling_file, stringified_name(instance)]]
-                p = Process(target= constraint, args= (constr[0], stringified_name(instance), type(instance), running, at_end, lock, calling_line, calling_file, fail_quit, tested_value, procs, inst_name, tested_triples))
-                processes.value += 1
-                if processes.value > CPUs:
-                    queue_processes.put(p)
-                    start_times[p] = 0
-                else:
-                    p.start()
-                    start_times[p] = time.time()
-                    running.value += 1
+                dispatch(key, ("constraint", (constr[0], stringified_name(instance), calling_line, calling_file, fail_quit, tested_value, inst_name),
+                               (onto_cls.iri, constr[0], tested_value), 0), procs)
         except:
             pass
+        if started != None:
+            metrics.wrapper_time(metric_name, time.perf_counter() - started)
+    new_function.__wrapped__ = initializer                         # Lets link_maker read the instance variables of a redeclared class
     return new_function
 
+def attribute_watcher(object, onto_properties, fail_quit, procs):
+    '''
+    Function that makes the declared instance variables of a class report their new values to graph.py (incremental mode)
+
+    :param onto_properties: List of (DataProperty name, instance variable name, checking setting) of the class, extended by later declarations
+    '''
+    if getattr(object.__dict__.get("__setattr__"), "watched", None) is onto_properties:
+        return
+    original = object.__setattr__
+    def new_setattr(self, name, value):
+        original(self, name, value)
+        for constr, inst_name, setting in onto_properties:
+            if inst_name != name or tracelog.trace_file != None:
+                continue
+            cls = individuals.onto_class(self)
+            if cls == None:                                         # Still in its initializer
+                return
+            caller = sys._getframe(1)
+            graph.changed(self, constr, value, {"kind": "graph", "line": caller.f_lineno, "file": caller.f_code.co_filename,
+                          "change": class_stem(cls) + "." + inst_name + " = " + str(value), "relation": constr}, fail_quit, procs)
+    new_setattr.watched = onto_properties
+    object.__setattr__ = new_setattr
+
 
 '''
     display makes sure that only the declarations up to the one marked with display True will be in effect
                                      declarations marked with display False will not be in effect
     Otherwise all declarations are in effect
+    Returns what now stands for object in the user's code: the checked function, or object itself
 '''
-def declare(name, object, argument1 = None, argument2 = None, cls = None, type_mismatch= None, value_overwrite= None, overwrite_handling= None, display= None, fail_quit= None):
+def declare(name, object, argument1 = None, argument2 = None, cls = None, type_mismatch= None, value_overwrite= None, overwrite_handling= None, display= None, fail_quit= None, checking= None, sample_every= None, sample_per_second= None):
     if type_mismatch == None:
         type_mismatch = True
     if value_overwrite == None:
@@ -328,44 +487,121 @@ def declare(name, object, argument1 = None, argument2 = None, cls = None, type_m
         argument2 = 1
 
     procs = processes
+    caller = declaring_frame()
 
     if display == False:
-        return
+        return object
     if display == True:
-        declare.__defaults__ = ("", "", None, None, None, None, None, True, True, False)
-        display_lines.append(str(getframeinfo(stack()[1][0]).lineno) + " : " + str(getframeinfo(stack()[1][0]).filename))
+        declare.__defaults__ = ("", "", None, None, None, None, None, True, True, False, None, None, None)
+        display_lines.append(str(caller.f_lineno) + " : " + str(caller.f_code.co_filename))
+
+    # Checking level of this declaration: the keyword argument, else the setting of the ontology entity, else the global one
+    chk = checking_setting(checking, sample_every, sample_per_second) if checking != None else None
+    if (chk or relation_checking.get(stringified_name(name), default_checking))[0] == "off":
+        return object
 
     if stringified_name(object) != 'function_enhancer.<locals>.new_function':
         enchanced_to_orig[object] = object
 
-    global first
-    if first == True:
-        first = False
-        global tested_triples
-        tested_triples = Manager().dict()
-        global at_end
-        time_all = threading.Thread(target= multi_timer, args=(tested_triples, at_end ))
-        time_all.start()
-
+    start_checker()
 
-    global onto_properties
-    link_maker(name, object, argument1, argument2, cls, type_mismatch, value_overwrite, overwrite_handling, onto_properties)
-    if object in list_dict_map[object_name(method_names)].keys():
+    link_maker(name, object, argument1, argument2, cls, type_mismatch, value_overwrite, overwrite_handling, onto_properties, chk, caller)
+    if cls != None:                                 # Instance variable, checked by the initializer of its declared class
+        return object
+    if object in methods.keys():
+        enhanced = function_enhancer(object, fail_quit, procs, argument1, argument2)
         if '.' not in stringified_name(object):
-            inspect.stack()[1][0].f_globals[stringified_name(object)] = function_enhancer(object, fail_quit, procs, argument1, argument2)
+            caller.f_globals[stringified_name(object)] = enhanced
         else:
             cl_meth = stringified_name(object).split('.')
             cl = cl_meth[0]
             meth = cl_meth[1]
-            cla = inspect.stack()[1][0].f_globals[cl]
-            setattr(cla, meth, function_enhancer(object, fail_quit, procs, argument1, argument2))
-        return
+            if caller.f_locals.get("__qualname__") != cl:          # The class does not exist yet while its body runs (declared_as on a method)
+                cla = caller.f_globals[cl]
+                setattr(cla, meth, enhanced)
+        return enhanced
 
     #global changed
-    global declared_classes
     global ini
-    if object in list_dict_map[object_name(class_names)].keys():
+    if object in classes.keys():
         if object not in declared_classes:
             ini = object.__init__
-            declared_classes.append(object)
-        setattr(object, '__init__', instance_initializer(ini, item_to_onto, onto_properties, fail_quit, procs, object))
\ No newline at end of file
+            declared_classes.add(object)
+        setattr(object, '__init__', instance_initializer(ini, onto_properties, fail_quit, procs, object, chk))
+        if graph.enabled:
+            attribute_watcher(object, onto_properties[object], fail_quit, procs)
+    return object
+
+
+def start_checker():
+    '''
+    Function that loads the ontology and starts the workers, called by the first declaration (or by precheck)
+    '''
+    global first
+    if first == True:
+        first = False
+        ontology.load()                                 # Before the workers are forked, so that they share it
+        if tracelog.trace_file == None:                 # Nothing is reasoned about in trace mode
+            pool.start_pool(think, error_reporters, processes, running)
+        time_all = threading.Thread(target= multi_timer, args=(tested_triples, at_end ))
+        time_all.start()
+
+
+def declaring_frame():
+    '''
+    Function that returns the frame of the user's code that called declare, declare_many or a declared_as decorator
+    '''
+    frame = sys._getframe(1)
+    while frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    return frame
+
+
+def declare_many(declarations, **options):
+    '''
+    Function to make many declarations at once, in the order they are given
+
+        declare_many({Teacher: Person, teaches: Person.add_student, taught_by: learn})
+        declare_many([(teaches, multiarg, 0, 1), (taught_by, multiarg, 1, 2)], fail_quit= True)
+
+    :param declarations: Dictionary {ontology entity: object}, or list of tuples of the positional arguments of declare
+    :param options: Keyword arguments of declare, applied to every declaration
+    :return: List of what declare returned for every declaration
+    '''
+    items = declarations.items() if isinstance(declarations, dict) else declarations
+    return [declare(*declaration, **options) for declaration in items]
+
+
+def declared_as(name, argument1= None, argument2= None, **options):
+    '''
+    Decorator form of declare, for functions, methods and classes:
+
+        @declared_as(teaches)
+        def add_student(self, student): ...
+
+    :param name: The ontology entity the decorated object is linked to
+    :param options: Keyword arguments of declare
+    '''
+    def decorator(object):
+        return declare(name, object, argument1, argument2, **options)
+    return decorator
+
+
+def __getattr__(name):
+    '''
+    Entities of the ontology are attributes of this module, and "from tools import *" imports them into the scripts
+    that use relation-checker, as it did before the ontology was loaded lazily. The modules of relation-checker itself
+    import tools without loading the ontology.
+    '''
+    if name == "__all__":
+        names = [name for name in globals() if not name.startswith("_")]
+        importer = sys._getframe(1).f_globals.get("__file__") or ""
+        if os.path.dirname(os.path.abspath(importer)) != os.path.dirname(os.path.abspath(__file__)):
+            names += [name for name in ontology.__getattr__("__all__") if name not in globals()]
+        return names
+    if name.startswith("__"):
+        raise AttributeError(name)
+    try:
+        return ontology.entity(name)
+    except KeyError:
+        raise AttributeError("module 'tools' has no attribute " + repr(name))
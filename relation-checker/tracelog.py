@@ -0,0 +1,165 @@
+'''
+    Record-now, check-later trace mode.
+    In trace mode declared functions and classes do not reason at all: every check is appended to a binary log
+    and the log is checked afterwards by analyze.py, possibly on another machine.
+
+    A log is a sequence of records, each starting with one byte:
+        H   start of a session, every name defined before it is forgotten
+        S   definition of a name: id, length, utf-8 bytes
+        R   relation check: relation, subject class, object class, file, line (ids of names, except for the line)
+        C   constraint check: DataProperty, class, instance variable, file, line, then the value
+    Values are stored as i (integer), f (float), b (bool), s (id of a name) or p (pickle), followed by the data.
+'''
+import os
+import pickle
+import struct
+import threading
+
+
+magic = b'RCTRACE1'
+name_format = struct.Struct('<IH')
+relation_format = struct.Struct('<IIIII')
+constraint_format = struct.Struct('<IIIII')
+int_format = struct.Struct('<q')
+float_format = struct.Struct('<d')
+id_format = struct.Struct('<I')
+
+trace_file = None                   # Log the checks are written to, None when trace mode is off
+names = {}                          # Name -> id, since the start of the current session
+trace_lock = threading.Lock()
+
+
+def open_trace(path):
+    '''
+    Function to turn on trace mode. A new session is appended to the log if it already exists.
+
+    :param path: Path of the log, "{pid}" is replaced by the id of the process
+    '''
+    global trace_file
+    close_trace()
+    path = path.replace("{pid}", str(os.getpid()))
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with trace_lock:
+        trace_file = open(path, 'ab', buffering= 1 << 16)
+        names.clear()
+        trace_file.write(b'H' + magic)
+
+
+def close_trace():
+    '''
+    Function to write out what is still buffered and turn trace mode off
+    '''
+    global trace_file
+    with trace_lock:
+        if trace_file != None:
+            trace_file.close()
+            trace_file = None
+
+
+def name_id(name):
+    '''
+    Function that returns the id of a name, writing its definition the first time it is seen. Called with trace_lock held.
+    '''
+    id = names.get(name)
+    if id == None:
+        id = names[name] = len(names)
+        data = name.encode('utf-8')
+        trace_file.write(b'S' + name_format.pack(id, len(data)) + data)
+    return id
+
+
+def encode_value(value):
+    if type(value) == bool:
+        return b'b' + (b'\x01' if value else b'\x00')
+    if type(value) == int and -2**63 <= value < 2**63:
+        return b'i' + int_format.pack(value)
+    if type(value) == float:
+        return b'f' + float_format.pack(value)
+    if type(value) == str:
+        return b's' + id_format.pack(name_id(value))
+    data = pickle.dumps(value)
+    return b'p' + id_format.pack(len(data)) + data
+
+
+def relation(relation, type1, type2, calling_file, calling_line):
+    '''
+    Function called by function_enhancer instead of checking a triple
+
+    :param type1: IRI of the ontology class of the first argument
+    :param type2: IRI of the ontology class of the second argument
+    '''
+    with trace_lock:
+        if trace_file == None:
+            return
+        record = relation_format.pack(name_id(relation), name_id(type1), name_id(type2), name_id(calling_file), calling_line)
+        trace_file.write(b'R' + record)
+
+
+def constraint(constr, cls, inst_name, value, calling_file, calling_line):
+    '''
+    Function called by instance_initializer instead of checking a DataProperty value
+
+    :param cls: IRI of the ontology class of the instance
+    :param inst_name: Name of the instance variable linked to the DataProperty
+    '''
+    with trace_lock:
+        if trace_file == None:
+            return
+        record = constraint_format.pack(name_id(constr), name_id(cls), name_id(inst_name), name_id(calling_file), calling_line)
+        trace_file.write(b'C' + record + encode_value(value))
+
+
+def read_exactly(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise EOFError
+    return data
+
+
+def read_value(f, defined):
+    tag = read_exactly(f, 1)
+    if tag == b'b':
+        return read_exactly(f, 1) == b'\x01'
+    if tag == b'i':
+        return int_format.unpack(read_exactly(f, 8))[0]
+    if tag == b'f':
+        return float_format.unpack(read_exactly(f, 8))[0]
+    if tag == b's':
+        return defined[id_format.unpack(read_exactly(f, 4))[0]]
+    return pickle.loads(read_exactly(f, id_format.unpack(read_exactly(f, 4))[0]))
+
+
+def read(path):
+    '''
+    Generator over the checks of a log, read as a stream. A record cut off at the end of the log
+    (the traced program is still running or was killed) ends the iteration.
+
+    :return: Tuples ("relation", relation, subject class IRI, object class IRI, file, line)
+             and ("constraint", DataProperty, class IRI, instance variable, value, file, line)
+    '''
+    defined = {}
+    with open(path, 'rb') as f:
+        while True:
+            kind = f.read(1)
+            try:
+                if kind == b'H':
+                    if read_exactly(f, len(magic)) != magic:
+                        raise ValueError(path + " is not a relation-checker trace")
+                    defined = {}
+                elif kind == b'S':
+                    id, length = name_format.unpack(read_exactly(f, name_format.size))
+                    defined[id] = read_exactly(f, length).decode('utf-8')
+                elif kind == b'R':
+                    r, t1, t2, file, line = relation_format.unpack(read_exactly(f, relation_format.size))
+                    yield ("relation", defined[r], defined[t1], defined[t2], defined[file], line)
+                elif kind == b'C':
+                    c, t, inst_name, file, line = constraint_format.unpack(read_exactly(f, constraint_format.size))
+                    yield ("constraint", defined[c], defined[t], defined[inst_name], read_value(f, defined), defined[file], line)
+                elif kind == b'':
+                    return
+                else:
+                    raise ValueError(path + " is not a relation-checker trace")
+            except EOFError:
+                return
@@ -1,58 +1,82 @@
-import Ontologies as onto                      # handled in ontology_finder
-from Ontologies import *                       # Import needed for access in __main__ script
-
-
-onto_size = sys.getsizeof(onto)                 # Size of the Ontologies file in bytes
-waiting_time = float(onto_size / 2)             # Approximate timeout for reasoner
 update_constant = 1.1                           # Constant for extending the time for which the program runs
                                                 # Alternatively could be set to (CPUs + 1) / CPUs
                                                 # Or keep track of currently active processes and use (num + 1) / num
 
-original_globals = globals()                    # Copy of the globals() dictionary before running __main__
-
+import ontology                                 # Location, snapshot and lazy loading of the ontology, see ontology.py
 from inspect import getframeinfo, stack
 import copy
 import importlib
 import inspect
+import itertools
+import os
+import re
 from collections import defaultdict
 import sys
-from sys import platform
 import multiprocessing
-from multiprocessing import Lock, Value, Manager
+from multiprocessing import Value
+import threading
+import time
 import psutil
+import owlready2
+from owlready2 import default_world, sync_reasoner, destroy_entity
 from traceback import format_exception
-from multiprocessing import Process
-from queue import Queue
-
-class_names = []
-method_names = [item[0] for item in inspect.getmembers(onto) if (inspect.isfunction(item[1]) or type(item[1]) == owlready2.prop.ObjectPropertyClass or type(item[1]) == owlready2.prop.DataPropertyClass)]
-instance_names = [item for item in dir(onto) if item[0].islower() and item not in method_names]
-instance_variables = []
-
-for name, obj in inspect.getmembers(onto):
-    if inspect.isclass(obj):
-        class_names.append(name)
+import pool
+from pool import set_pool, set_server, set_batching, wait_all, on_complete
+import compiler
+import checks                                   # Order in which checks are decided without the reasoner, see checks.py
+import facets
+import locality                                 # Modules of the ontology the workers reason over, see locality.py
+import individuals                              # Objects of the user's code linked to the ontology, see individuals.py
+from facets import set_facet_batching
+from locality import set_module_extraction
+import verdicts
+import hierarchy                                # Verdicts carried to the sub and superclasses of a proven pair, see hierarchy.py
+import tracelog
+import metrics
+from metrics import set_metrics
+import reports                                  # Errors and warnings, written by a thread of their own, see reports.py
+from reports import set_report_output
+import graph                                    # Mirror of the linked objects checked change by change, see graph.py
+from graph import set_incremental, retract
+from timeouts import set_timeouts
+
+snapshot = ontology.prepare()                   # Also fills the tables of the relations and constraints that are decided without the reasoner
+class_names = list(snapshot["class_names"])
+method_names = list(snapshot["method_names"])
+instance_names = list(snapshot["instance_names"])
+instance_variables = set()
 
 classes = defaultdict(None)
 methods = defaultdict(None)
 instances = defaultdict(None)
-lines = defaultdict(dict)
+lines = defaultdict(dict)                       # Ontology entity -> {declared object: line}
+declared_entities = defaultdict(dict)           # Declared object -> {ontology entity: line}, the reverse of lines
+
+name_kinds = defaultdict(list)                  # Ontology name -> the name lists it is in, so declare does not search the lists
+for kind, name_list in [("class_names", class_names), ("method_names", method_names), ("instance_names", instance_names)]:
+    for entity_name in name_list:
+        name_kinds[entity_name].append(kind)
 
 '''
     Enabling and disabling printing of messages
 '''
+devnull = None                                  # Opened by the first disable_print and kept for the next ones
+
 def enable_print():
     sys.stdout = sys.__stdout__
 
 def disable_print():
-    sys.stdout = open(os.devnull, 'w')
+    global devnull
+    if devnull == None:
+        devnull = open(os.devnull, 'w')
+    sys.stdout = devnull
 
 '''
     This function converts the function, class, or instance variable into its own name as a string
 '''
 def stringified_name(name):
     if inspect.isfunction(name):
-        name_string = str(name)[10:-15]
+        name_string = name.__qualname__
     elif inspect.isclass(name):
         name_string = name.__name__
     elif str(name)[0:5] == "onto.":
@@ -61,6 +85,25 @@ def stringified_name(name):
         name_string = str(name)                          # Need to fix this up for variables
     return name_string
 
+'''
+    Name under which individuals of an ontology class are stored in tested_triples (e.g. onto.student3 -> student),
+    taken from the snapshot of the ontology, so no individual is created for it.
+    Computed once per ontology class, since it is needed on every call of a declared function.
+'''
+instance_stems = {}
+
+def class_stem(cls):
+    stem = instance_stems.get(cls)
+    if stem == None:
+        stem = instance_stems[cls] = sys.intern(individual_stem(individuals.individual_name(cls.iri)))
+    return stem
+
+def individual_stem(name):
+    '''
+    Function that removes the ontology prefix and the number of the name of an individual (onto.student3 -> student)
+    '''
+    return re.sub(r'\d+$', '', name.rsplit('.', 1)[-1])
+
 
 def entry_line(name, object= None, printer=True):
     '''
@@ -72,7 +115,10 @@ def entry_line(name, object= None, printer=True):
     :param printer: Default prints messages to user
     :return: THe values of the lines at which objects are linked to ontology
     '''
-    sys.stdout = open(os.devnull, 'w') if printer == False else sys.__stdout__      # Enable / disable print statements
+    if printer == False:                                                            # Enable / disable print statements
+        disable_print()
+    else:
+        enable_print()
     name_samples = lines[name]
     if len(name_samples) == 0:
         print("You have not declared any cases of " + stringified_name(name))
@@ -94,23 +140,24 @@ list_dict_map = {"class_names": classes,
                  "method_names": methods,
                  "instance_names": instances}
 
+name_lists = [("method_names", method_names), ("class_names", class_names), ("instance_names", instance_names)]
+list_names = {id(name_list): kind for kind, name_list in name_lists}
+
 '''
     This function returns the name of the list object as a string
 '''
 def object_name(object):                                    # For globals of current module
+    if id(object) in list_names:
+        return list_names[id(object)]
     for key, value in list(globals().items()):
         if type(value) == type(object) and value == object:
             return key
 
-'''
-    Dictionary to connect specific item in source code to instance of Ontology
-'''
-item_to_onto = defaultdict(lambda: None)
 
 '''
     Dictionary to ensure that modified __init__ method of a source class is not used in instance_initializer when redeclaring a class
 '''
-declared_classes = []
+declared_classes = set()
 
 if sys.platform == 'win32':
     timer = time.clock
@@ -119,8 +166,7 @@ else:
 
 display_lines = []
 def print_display_lines():
-    while(processes.value != 0 or queue_processes.empty() == False):        # Wait for the rest of the program to finish executing
-        time.sleep(7)
+    pool.wait_all()                     # Wait for the rest of the program to finish executing
     if len(display_lines) == 0:
         print('\033[95m' + "You have either not made any declarations, or you forgot to use the display keyword argument in the first declare call." + '\033[0m')
     else:
@@ -128,105 +174,33 @@ def print_display_lines():
         print(*display_lines, sep= '\n')
 
 
-def queue_proc_start():
-    '''
-    Function called by alive to start new processes if other processes failed and the CPUs can handle another process
+def quit_program():
     '''
-    global running
-    while queue_processes.empty() == False and running.value < CPUs:
-        new_process = queue_processes.get()
-        new_process.start()
-        running.value += 1
-        start_times[new_process] = time.time()
-    if (processes.value == 0) and finder('java') and queue_processes.empty():
-        killer("java")
-
-def alive(p, lock1):
+    Function to stop the program when fail_quit is set. Only the workers and reasoners started by relation-checker are stopped.
     '''
-    Function to stop a process if it is running.
-    If no more processes are left, kill the java.exe process from the Hermit reasoner
-
-    :param p: The python.exe process that has timed out
-    '''
-    with lock1:
-        global running
-        running.value -= 1
-        p.terminate()
-        processes.value -= 1
-        queue_proc_start()
-
+    pool.kill_pool()
+    reports.flush()
+    sys.__stdout__.flush()
+    os._exit(1)                                 # Also called from the collector thread, where sys.exit() would only end the thread
 
-def killer(proc_name):
-    '''
-    Function to stop the python or the java process
-
-    :param proc_name: String representing python or java
-    '''
-    if platform == "linux" or platform == "linux2" or platform == "darwin":
-        sub = subprocess.Popen(['ps', '-A'], stdout=subprocess.PIPE)
-        output, error = sub.communicate()
-        for line in output.splitlines():
-            if proc_name in str(line):
-                pid = int(line.split(None, 1)[0])
-                try:
-                    os.kill(pid, 0)
-                except:
-                    pass
-
-    elif platform == "win32" or platform == "win64":
-        os.system("taskkill /im " + proc_name + ".exe /f")
-
-def finder(proc_name):
-    '''
-        Function to check if the python or the java process is running
-
-        :param proc_name: String representing python or java
-        '''
-    if platform == "linux" or platform == "linux2" or platform == "darwin":
-        sub = subprocess.Popen(['ps', '-A'], stdout=subprocess.PIPE)
-        output, error = sub.communicate()
-        for line in output.splitlines():
-            if proc_name in str(line):
-                return True
-
-    elif platform == "win32" or platform == "win64":
-        for proc in psutil.process_iter():
-            try:
-                if proc_name.lower() in proc.name().lower():
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
+lock = threading.Lock()                         # Only taken in the main process, around the status of a failed check and the traceback
 
-    return False
-
-def process_runner(think, inst1, relation, inst2, calling_line, type1, type2, fail_quit, lock, lock1, procs):
-    p = Process(target= think, args= (inst1, relation, inst2, calling_line, type1, type2, fail_quit, lock, procs, ))
-    p.start()
-    processes.value += 1
-    time.sleep(waiting_time)
-    alive(p, lock1)
-
-
-lock = Lock()
-lock1 = Lock()
-
-processes = Value('i', 0)
+processes = Value('i', 0, lock= False)          # Number of checks sent to the workers and not finished, only updated in the main process
 java_killed = Value('i', 0)
 value_decremented = Value('i', 0)
 
 def custom_excepthook(exctype, value, traceback):
     '''
     Function to handle errors in the main script. Terminates program on error.
-    On error, print error message, kill running java process and kill python process.
+    On error, print error message and stop the workers and their reasoners.
     '''
     #for p in multiprocessing.active_children():
     #    p.terminate()
+    reports.flush()                             # Errors found before the exception come first
     with lock:
         for line in format_exception(exctype, value, traceback):
             print('\033[91m' + line[:-1] + '\033[0m')
-        if finder('java'):
-            killer('java')
-        killer('python')
+        pool.kill_pool()
 
 sys.excepthook = custom_excepthook
 
@@ -237,8 +211,7 @@ enchanced_to_orig = defaultdict(lambda: None)       # Links enchanced function t
 overwrites = []
 
 def print_overwrites():
-    while (processes.value != 0 or queue_processes.empty() == False):  # Wait for the rest of the program to finish executing
-        time.sleep(7)
+    pool.wait_all()                 # Wait for the rest of the program to finish executing
     if len(overwrites) == 0:
         print('\033[95m' + "You did not overwrite any declarations.")
     else:
@@ -247,56 +220,177 @@ def print_overwrites():
 
 
 func_props  = defaultdict(list)      # Lists arguments for functions, used in function_enchancer
-start_times = defaultdict(int)       # Start times of the processes
 
 first = True            # Flag indicating that declare is called for the first time
                         # Makes multi_timer thread run
 
 def multi_timer(tested_triples, at_end):
-    global running
-    while(threading.main_thread().is_alive() or processes.value != 0):
-        now = time.time()
-        for key in start_times.keys():
-            if now >= waiting_time + start_times[key]:
-                if key.is_alive():
-                    for child in psutil.Process(key.pid).children():
-                        child.kill()
-                    alive(key, lock1)
-
-        queue_proc_start()
-        #print(running.value)
-        #print("QUEUE SIZE : " + str(queue_processes.qsize()))
-        time.sleep(5)
-    now = time.time()
-    for key in list(start_times):
-        if now >= waiting_time + start_times[key]:
-            if key.is_alive():
-                alive(key, lock1)
-                del start_times[key]
-    queue_proc_start()
-
+    threading.main_thread().join()                  # Returns once the user's script has finished
+    pool.wait_all()                                 # Overdue reasoners are stopped by the deadline timers of the pool, see timeouts.py
+    pool.stop_pool()
+    tracelog.close_trace()
+    metrics.dump()
+    print_errors(tested_triples, at_end)
+
+def print_errors(tested_triples, at_end):
+    '''
+    Function that prints the errors that were caught but were the same triple as a printed one
+    '''
     for k, v in tested_triples.items():         # Print out the errors that were caught but were the same triple as a printed
-        if v[0] == -1:                          #STILL NEED TO SET -1 FOR FAILURES -- ADDING TOO MANY KEYS, STILL NEED TO HANDLE RECURSION
+        if v[0] < 0:                            #STILL NEED TO SET -1 FOR FAILURES -- ADDING TOO MANY KEYS, STILL NEED TO HANDLE RECURSION
             for val in v[2-at_end.value:]:
-                noNum_inst1 = re.sub(r'\d+$', '', k[0])
-                noNum_inst2 = re.sub(r'\d+$', '', k[2])
-                print('\033[91m' + "Fatal error on line " + '\033[94m' + str(val[0]) + '\033[91m' + " in file " + '\033[94m' + val[1] + '\033[91m' + ":\n\t" + '\033[94m' + noNum_inst1 + '\033[1m' + "." + '\033[95m' + k[1] + '\033[91m' + "." + '\033[94m' + noNum_inst2 + '\033[91m' + "\nIs not allowed in your ontology.\n" + '\033[0m')
-        if v[0] == -2:
-            for val in v[2 - at_end.value:]:
-                print('\033[91m' + "Constraint error on line " + '\033[94m' + str(val[0]) + '\033[91m' + " in file " + '\033[94m' + val[1] + '\033[91m' + ":\n\t" + '\033[94m' + stringified_name(
-                    val[2]) + '\033[91m' + ": instance variable " + '\033[94m' + str(k[1]) + '\033[91m' + " = " + '\033[94m' + str(k[2]) + '\033[91m' + " violates the ontology constraint " + '\033[94m' + k[0] + '\033[91m' + ".\n" + '\033[0m')
-
-#tested_triples = defaultdict(list)            # Stores the ontology triples and their passed/failed status (True/False)
-queue_processes = Queue()                     # FIFO queue of processes, to ensure that only as many processes as CPUs run at a time
-CPUs = multiprocessing.cpu_count()            # Number of CPUs
-
-running = Value("i", 0)                                         # Number of processes running right now
+                reports.report(dict(failure_record(k, v[0], val), summary= True))
+    if at_end.value:
+        for record in graph.errors:
+            reports.report(dict(record, summary= True))
+    reports.flush()
+
+def failure_record(key, status, site):
+    '''
+    :param status: -1 for a relation, -2 for a constraint, as in tested_triples
+    :param site: [line, file] of a call of the check, and the name of the instance for a DataProperty
+    :return: Record of the error of a failed check at one of its calls, static if precheck found the call and it has not run
+    '''
+    if status == -1:
+        record = {"kind": "relation", "line": site[0], "file": site[1], "subject": re.sub(r'\d+$', '', key[0]), "relation": key[1],
+                  "object": re.sub(r'\d+$', '', key[2])}
+    else:
+        record = {"kind": "constraint", "line": site[0], "file": site[1], "instance": stringified_name(site[2]), "attribute": str(key[1]),
+                  "value": key[2], "constraint": key[0]}
+    if (key, site[0], site[1]) in static_sites:
+        record["static"] = True
+    return record
+
+tested_triples = {}                             # Stores the ontology triples and their passed/failed status, only in the main process
+static_sites = set()                            # (key, line, file) of the calls precheck recorded that have not run yet
+
+def claim(key, record, repeats= True, static= False):
+    '''
+    Function that records a call of a check in tested_triples. Safe to call from many threads at once without a lock:
+    setdefault is a single operation on the dictionary, so exactly one thread gets its own entry back.
+
+    :param key: Key of the check, a tuple of names and the value of a DataProperty
+    :param record: [line, file] of the call, and the name of the instance for a DataProperty
+    :param repeats: False to not record the calls after the first one ("first_seen")
+    :param static: True for a call found by precheck, whose errors are only possible ones until it runs
+    :return: True for the first call of the check, which has to check it
+    '''
+    entry = [0, record]
+    found = tested_triples.setdefault(key, entry)
+    if static:
+        static_sites.add((key, record[0], record[1]))
+        if found is not entry:
+            found.append(record)
+        return found is entry
+    if found is entry:
+        return True
+    if len(static_sites) != 0 and (key, record[0], record[1]) in static_sites:
+        with lock:                              # Against a reporter deciding whether the call is still static
+            static_sites.discard((key, record[0], record[1]))      # Recorded by precheck already, not again
+            failed = found[0] < 0
+        if failed and found[1][:2] == record[:2]:       # A possible error that is now a real one, the other calls are listed by print_errors
+            with lock:
+                metrics.violations[key[1] if found[0] == -1 else key[0]] += 1
+            if at_end.value == 0:
+                reports.report(failure_record(key, found[0], found[1]))
+        return False
+    if repeats:
+        found.append(record)
+    return False
+
+running = Value("i", 0)                                         # Number of checks being reasoned right now
+metrics.gauges["running_checks"] = lambda: running.value
+metrics.gauges["pending_checks"] = lambda: processes.value
+
+def metrics_snapshot():
+    '''
+    Function that returns the metrics of the checker as a dictionary, see metrics.py
+    '''
+    return metrics.snapshot()
 #fail_indicators = []                            # multiprocessing.Value values that can be passed to processes to determine failure
 
+def set_verdict_store(path= None):
+    '''
+    Function to keep the verdicts of the reasoner on disk, so that later runs do not prove them again.
+    Has to be called before the first call to declare.
+
+    :param path: Path of the SQLite file, defaults to ~/.cache/relation-checker/verdicts.sqlite
+    '''
+    verdicts.open_store(ontology.ontology_path(), path)
+
+def set_trace(path):
+    '''
+    Function to turn on trace mode: checks are written to a log instead of being reasoned about,
+    and the log is checked later with analyze.py. Has to be called before the first call to declare.
+
+    :param path: Path of the log, "{pid}" is replaced by the id of the process. None turns trace mode off.
+    '''
+    if path == None:
+        tracelog.close_trace()
+    else:
+        tracelog.open_trace(path)
+
+'''
+    Checking levels, from cheapest to most thorough:
+        "off"           declare() leaves the object untouched
+        "sampled"       a call site is checked on 1 of every `every` calls and / or at most `per_second` times per second
+        "first_seen"    a triple is checked the first time it is seen, repeated calls are not recorded
+        "full"          every call is checked and recorded
+    Settings are (level, every, per_second) tuples.
+'''
+checking_levels = ["off", "sampled", "first_seen", "full"]
+default_checking = ["full", None, None]         # Global setting, changed in place so that modules importing it see the change
+relation_checking = {}                          # Name of relation / class / DataProperty -> setting that overrides the global one
+sample_counts = {}                              # (file, line, relation) -> counter of the calls seen at that call site, next() is atomic
+sample_times = {}                               # (file, line, relation) -> time of the last checked call
+
+def checking_setting(level, every= None, per_second= None):
+    if level not in checking_levels:
+        raise ValueError("Checking level must be one of " + str(checking_levels) + ", not " + repr(level))
+    if level == "sampled" and every == None and per_second == None:
+        every = 100
+    return (level, every, per_second)
+
+def set_checking(level, relation= None, every= None, per_second= None):
+    '''
+    Function to choose how thoroughly declared objects are checked. Declarations that are already made follow the new setting,
+    except that switching to "off" only affects later declarations of classes.
+
+    :param level: "off", "sampled", "first_seen" or "full"
+    :param relation: Ontology relation, class or DataProperty the setting is for, all of them if not given
+    :param every: For "sampled": check 1 of every `every` calls of a call site (100 if neither every nor per_second is given)
+    :param per_second: For "sampled": check a call site at most this many times per second
+    '''
+    setting = checking_setting(level, every, per_second)
+    if relation == None:
+        default_checking[:] = setting
+    else:
+        relation_checking[stringified_name(relation)] = setting
+
+def sampled(setting, site):
+    '''
+    Function that decides whether a call of a sampled declaration is checked
+
+    :param setting: (level, every, per_second) tuple
+    :param site: (file, line, relation) of the call
+    '''
+    counter = sample_counts.get(site)
+    if counter == None:
+        counter = sample_counts.setdefault(site, itertools.count(1))
+    count = next(counter)
+    if setting[1] != None and count % setting[1] != 1 % setting[1]:        # First call of a site is always checked
+        return False
+    if setting[2] != None:
+        now = time.monotonic()
+        last = sample_times.get(site)
+        if last != None and now - last < 1 / setting[2]:
+            return False
+        sample_times[site] = now
+    return True
+
 at_end = Value('b', False)                      # Set to True to make errors print out at the end of execution
 def set_end():
-    global at_end
     at_end.value = True
 
-onto_properties = defaultdict(list)             # Classes mapped to instance variables that are linked to data properties
+onto_properties = defaultdict(list)             # Classes mapped to (data property, instance variable, checking setting) of their linked instance variables
                                                 # Each value is a pair (data property, instance variable name)
\ No newline at end of file
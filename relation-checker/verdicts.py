@@ -0,0 +1,108 @@
+'''
+    On-disk store of the verdicts of the reasoner, shared between runs and between processes.
+    Verdicts are keyed by a fingerprint of the ontology, so they are dropped as soon as the ontology changes.
+'''
+import hashlib
+import os
+import sqlite3
+import threading
+
+
+store_path = None                   # Path of the SQLite file, None when the store is turned off
+store_version = "3"                 # Part of the fingerprint: version 1 could keep a failed reasoner run (no java) as a refuted check,
+                                    # version 2 proved parts of the graph without AllDifferent (see graph_individuals)
+fingerprint = None                  # Hash of the content of the ontology the verdicts were proven for
+connections = threading.local()     # Connection of each thread, so threads of the user's code read the store at the same time
+
+
+def ontology_fingerprint(ontology_file):
+    '''
+    Function to hash the content of the file the ontology is loaded from
+
+    :param ontology_file: Path of Ontologies.py or of an .owl file
+    '''
+    with open(ontology_file, 'rb') as f:
+        return hashlib.sha256(store_version.encode() + f.read()).hexdigest()
+
+
+def connect():
+    '''
+    Function that returns the connection of the current thread, opening it if needed.
+    Connections cannot be shared with forked workers either, each process opens its own.
+    '''
+    if store_path == None:
+        return None
+    if getattr(connections, "pid", None) != os.getpid() or connections.path != store_path:
+        connections.db = sqlite3.connect(store_path, timeout= 30, isolation_level= None)
+        connections.db.execute("PRAGMA journal_mode=WAL")       # Readers are not blocked by a writing worker
+        connections.pid = os.getpid()
+        connections.path = store_path
+    return connections.db
+
+
+def open_store(ontology_file, path= None):
+    '''
+    Function to turn on the verdict store. Verdicts proven for any other version of the ontology are removed.
+
+    :param ontology_file: Path of the file the ontology is loaded from
+    :param path: Path of the SQLite file, defaults to ~/.cache/relation-checker/verdicts.sqlite
+    '''
+    global store_path, fingerprint
+    if path == None:
+        path = os.path.join(os.path.expanduser("~"), ".cache", "relation-checker", "verdicts.sqlite")
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    store_path = path
+    fingerprint = ontology_fingerprint(ontology_file)
+    db = connect()
+    db.execute("CREATE TABLE IF NOT EXISTS verdicts (fingerprint TEXT, kind TEXT, subject TEXT, predicate TEXT, object TEXT, verdict INTEGER, "
+               "PRIMARY KEY (fingerprint, kind, subject, predicate, object))")
+    db.execute("DELETE FROM verdicts WHERE fingerprint != ?", (fingerprint,))
+
+
+def key(kind, assertion):
+    '''
+    Function to turn a check into the columns of its row
+
+    :param kind: "relation", "constraint" or "graph"
+    :param assertion: (class IRI, relation, class IRI), (class IRI, DataProperty, value) or a part of the graph (see graph.py)
+    '''
+    if kind == "relation":
+        return (kind, assertion[0], assertion[1], assertion[2])
+    if kind == "graph":
+        return (kind, repr(assertion[0]), assertion[1], repr(assertion[2]))
+    value = assertion[2]
+    return (kind, assertion[0], assertion[1], type(value).__name__ + ":" + repr(value))
+
+
+def lookup(kind, assertion):
+    '''
+    :return: True / False if the check has been proven before for this ontology, None otherwise
+    '''
+    db = connect()
+    if db == None:
+        return None
+    try:
+        row = db.execute("SELECT verdict FROM verdicts WHERE fingerprint = ? AND kind = ? AND subject = ? AND predicate = ? AND object = ?",
+                         (fingerprint, *key(kind, assertion))).fetchone()
+    except sqlite3.Error:                           # A busy store never stops the checked program, the reasoner decides instead
+        return None
+    return None if row == None else bool(row[0])
+
+
+def record(tasks, verdict):
+    '''
+    Function called by think() to store the verdict of checks
+
+    :param tasks: Checks in the form (kind, arguments of the error reporter, arguments of the individual maker)
+    :param verdict: True if the checks are allowed in the ontology
+    '''
+    db = connect()
+    if db == None:
+        return
+    try:
+        db.executemany("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)",
+                       [(fingerprint, *key(task[0], task[2]), int(verdict)) for task in tasks])
+    except sqlite3.Error:
+        pass
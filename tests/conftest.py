@@ -0,0 +1,110 @@
+'''
+    Set-up shared by the tests: relation-checker on the import path, checked against the ontology of school.py,
+    with its snapshots and verdict stores in a temporary home directory.
+
+    The workers of the checker are started once per process, by the first declaration, so everything that runs them
+    is a script run in a process of its own (the script fixture). The other tests import the modules of the checker
+    in the process of pytest and never declare anything.
+'''
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import pytest
+
+
+tests = os.path.dirname(os.path.abspath(__file__))
+package = os.path.join(os.path.dirname(tests), "relation-checker")
+home = tempfile.mkdtemp(prefix= "relation-checker-tests-")
+os.environ["RELATION_CHECKER_ONTOLOGY"] = os.path.join(tests, "school.py")
+sys.path.insert(0, package)
+sys.path.insert(0, tests)
+
+import ontology
+ontology.snapshot_dir = os.path.join(home, "snapshots")
+import tools
+
+prelude = '''
+import json
+import os
+import sys
+sys.path.insert(0, {package!r})
+sys.path.insert(0, {tests!r})
+import ontology
+ontology.snapshot_dir = {snapshots!r}
+import fakes
+import tools
+from tools import *
+import compiler
+import hierarchy
+import metrics
+import pool
+'''.format(package= package, tests= tests, snapshots= os.path.join(home, "snapshots"))
+
+
+class Run:
+    '''
+    Outcome of a script: its exit status and output, the RESULT it printed and the records of its report
+    '''
+    def __init__(self, done, folder):
+        self.status = done.returncode
+        self.output = done.stdout + done.stderr
+        lines = [line for line in done.stdout.splitlines() if line.startswith("RESULT ")]
+        self.result = json.loads(lines[-1][7:]) if len(lines) != 0 else None
+        report = os.path.join(folder, "report.jsonl")
+        self.records = []
+        if os.path.exists(report):
+            with open(report) as f:
+                self.records = [json.loads(line) for line in f if line.strip()]
+
+    def kinds(self, kind):
+        return [record for record in self.records if record["kind"] == kind]
+
+
+@pytest.fixture
+def script(tmp_path):
+    '''
+    Runs python code after the prelude, in tmp_path, and returns a Run. The code writes its report to report.jsonl
+    with set_report_output("report.jsonl") and hands its values to the test with fakes.result(...).
+    '''
+    def run(code, *arguments, timeout= 120, name= "script.py"):
+        path = tmp_path / name
+        path.write_text(prelude + textwrap.dedent(code))
+        return execute([sys.executable, str(path), *arguments], tmp_path, timeout)
+    return run
+
+
+@pytest.fixture
+def command(tmp_path):
+    '''
+    Runs a command of relation-checker in tmp_path, and returns a Run: command([os.path.join(package, "analyze.py"), ...])
+    '''
+    def run(arguments, timeout= 120):
+        return execute([sys.executable] + arguments, tmp_path, timeout)
+    return run
+
+
+def execute(arguments, folder, timeout):
+    environment = dict(os.environ, HOME= home, PYTHONPATH= package)
+    done = subprocess.run(arguments, cwd= folder, env= environment, capture_output= True, text= True, timeout= timeout)
+    return Run(done, str(folder))
+
+
+@pytest.fixture
+def tables():
+    '''
+    Keeps the compiled tables and the verdicts of the hierarchy of the process, for tests that change them
+    '''
+    import compiler
+    import hierarchy
+    saved = dict(compiler.relation_tables), dict(compiler.constraint_tables)
+    yield
+    compiler.relation_tables.clear()
+    compiler.relation_tables.update(saved[0])
+    compiler.constraint_tables.clear()
+    compiler.constraint_tables.update(saved[1])
+    hierarchy.known.clear()
+    hierarchy.pending.clear()
+
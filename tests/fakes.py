@@ -0,0 +1,83 @@
+'''
+    Stand-ins for sync_reasoner, so the tests run without java. Each one is given the world think() asserted its
+    checks in, and raises OwlReadyInconsistentOntologyError the way HermiT would for the axioms of school.py:
+    a link whose subject or object is disjoint from the domain or range of its relation, two different objects
+    given to a functional relation, and a DataProperty value outside of its facets.
+'''
+import json
+import subprocess
+import sys
+import owlready2
+
+
+runs = []                           # Worlds reasoned about in this process
+
+
+def clashes(individual, classes, world):
+    '''
+    :return: True if the individual belongs to a class disjoint with one of the classes
+    '''
+    for group in world.disjoint_classes():
+        for first in group.entities:
+            for second in group.entities:
+                if first is not second and isinstance(individual, first) and any(issubclass(cls, second) for cls in classes):
+                    return True
+    return False
+
+
+def inconsistent(world):
+    different = [set(group.entities) for group in world.different_individuals()]
+    for prop in world.object_properties():
+        values = {}
+        for subject, object in prop.get_relations():
+            if clashes(subject, prop.domain, world) or clashes(object, prop.range, world):
+                return True
+            values.setdefault(subject, []).append(object)
+        if owlready2.FunctionalProperty in prop.is_a:
+            for subject, objects in values.items():
+                if any(first is not second and any(first in group and second in group for group in different)
+                       for first in objects for second in objects):
+                    return True
+    for individual in world.individuals():
+        age = getattr(individual, "age", None)
+        if age != None and not 0 <= age <= 150:
+            return True
+        if any(len(nickname) > 5 for nickname in getattr(individual, "nickname", [])):
+            return True
+    return False
+
+
+def reasoner(world, debug= 0):
+    runs.append(world)
+    if inconsistent(world):
+        raise owlready2.OwlReadyInconsistentOntologyError()
+
+
+def hanging_reasoner(world, debug= 0):
+    '''
+    Starts a process the way owlready2 starts java, so the worker records its pid, and waits for it. The tests
+    expect the deadline of the batch to kill it.
+    '''
+    runs.append(world)
+    java = subprocess.Popen(["sleep", "60"], **owlready2.reasoning._subprocess_kargs)
+    with open("reasoners.txt", "a") as f:
+        f.write(str(java.pid) + "\n")
+    if java.wait() != 0:
+        raise owlready2.OwlReadyJavaError("java was stopped")
+
+
+def hanging_once(world, debug= 0):
+    '''
+    Hangs on the first batch of the worker, and reasons about the next ones
+    '''
+    if len(runs) == 0:
+        return hanging_reasoner(world, debug)
+    return reasoner(world, debug)
+
+
+def result(**values):
+    '''
+    Function that hands the values checked by a test to the test, which reads the last RESULT line of the output
+    '''
+    print("RESULT " + json.dumps(values, default= str), file= sys.__stdout__)
+    sys.__stdout__.flush()
@@ -0,0 +1,34 @@
+import owlready2
+from owlready2 import *
+
+school = get_ontology("https://test.org/onto.owl")
+
+with school:
+    class Person(Thing):
+        namespace = school
+    class Student(Person):
+        namespace = school
+    class Teacher(Person):
+        namespace = school
+    class ClassClown(Student):
+        namespace = school
+    AllDisjoint([Student, Teacher])
+    class teaches(ObjectProperty):
+        domain = [Teacher]
+        range = [Student]
+    class taught_by(ObjectProperty):
+        domain = [Student]
+        range = [Teacher]
+        inverse_property = teaches
+    class advisor(ObjectProperty, FunctionalProperty):
+        domain = [Student]
+        range = [Teacher]
+    class knows(ObjectProperty, TransitiveProperty):        # Not compiled, always left to the reasoner
+        domain = [Person]
+        range = [Person]
+    class age(DataProperty, FunctionalProperty):
+        domain = [Person]
+        range = [ConstrainedDatatype(int, min_inclusive= 0, max_inclusive= 150)]
+    class nickname(DataProperty):
+        domain = [Person]
+        range = [ConstrainedDatatype(str, max_length= 5)]
@@ -0,0 +1,83 @@
+'''
+    Trace mode and analyze.py: the checks of a traced program are written to a log, and analyze.py reports the
+    errors of the log with the lines and files of the program. Only compiled checks and facets are traced, so
+    the workers of analyze.py never need java.
+'''
+import os
+import tracelog
+from conftest import package
+
+
+traced = '''
+set_trace("trace.log")
+
+class Person:
+    def __init__(self, name, age):
+        self.name = name
+        self.age = age
+
+    def add_student(self, other):
+        pass
+
+declare(Teacher, Person)
+declare(age, "age", cls= Person)
+t = Person("t", 40)
+declare(Student, Person)
+s = Person("s", 200)                                    # age out of range
+declare(teaches, Person.add_student)
+t.add_student(s)
+s.add_student(t)                                        # Student teaches Teacher
+s.add_student(t)                                        # Same triple, checked once
+set_trace(None)
+fakes.result(checked= len(tested_triples))
+'''
+
+
+def line_of(code, text):
+    return [number for number, line in enumerate(code.splitlines(), 1) if text in line][0]
+
+
+def test_traced_program_is_checked_by_analyze(script, command, tmp_path):
+    run = script(traced, name= "traced.py")
+    assert run.status == 0, run.output
+    assert run.result == {"checked": 0}                 # Nothing is reasoned about while tracing
+    code = (tmp_path / "traced.py").read_text()
+    run = command([os.path.join(package, "analyze.py"), "trace.log", "--workers", "1", "--report", "report.jsonl"])
+    assert run.status == 1, run.output
+    assert "5 calls, 4 distinct checks, 2 not allowed in your ontology." in run.output
+    relations = [record for record in run.kinds("relation") if not record.get("summary")]
+    assert [(record["subject"], record["relation"], record["object"]) for record in relations] == [("student", "teaches", "teacher")]
+    assert relations[0]["line"] == line_of(code, "# Student teaches Teacher")
+    assert relations[0]["file"] == str(tmp_path / "traced.py")
+    constraints = [record for record in run.kinds("constraint") if not record.get("summary")]
+    assert [(record["constraint"], record["value"]) for record in constraints] == [("age", 200)]
+    assert constraints[0]["line"] == line_of(code, "# age out of range")
+
+
+def test_log_round_trip(tmp_path):
+    path = str(tmp_path / "values.log")
+    values = [7, -2**63, 2**70, 1.5, True, False, "forty", "forty", None, (1, "a"), [2.5]]
+    tracelog.open_trace(path)
+    for number, value in enumerate(values):
+        tracelog.constraint("age", "https://test.org/onto.owl#Teacher", "age", value, "program.py", number)
+    tracelog.relation("teaches", "https://test.org/onto.owl#Teacher", "https://test.org/onto.owl#Student", "program.py", 99)
+    tracelog.close_trace()
+    tracelog.open_trace(path)                           # A second session appended to the log
+    tracelog.relation("teaches", "https://test.org/onto.owl#Student", "https://test.org/onto.owl#Teacher", "other.py", 3)
+    tracelog.close_trace()
+    records = list(tracelog.read(path))
+    assert [record[4] for record in records[:len(values)]] == values
+    assert [type(record[4]) for record in records[:len(values)]] == [type(value) for value in values]
+    assert records[len(values)] == ("relation", "teaches", "https://test.org/onto.owl#Teacher", "https://test.org/onto.owl#Student", "program.py", 99)
+    assert records[-1] == ("relation", "teaches", "https://test.org/onto.owl#Student", "https://test.org/onto.owl#Teacher", "other.py", 3)
+
+
+def test_log_cut_off_at_the_end(tmp_path):
+    path = str(tmp_path / "cut.log")
+    tracelog.open_trace(path)
+    tracelog.relation("teaches", "https://test.org/onto.owl#Teacher", "https://test.org/onto.owl#Student", "program.py", 1)
+    tracelog.relation("teaches", "https://test.org/onto.owl#Student", "https://test.org/onto.owl#Teacher", "program.py", 2)
+    tracelog.close_trace()
+    with open(path, "rb+") as f:
+        f.truncate(os.path.getsize(path) - 3)           # The traced program was killed while writing
+    assert [record[5] for record in tracelog.read(path)] == [1]
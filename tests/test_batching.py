@@ -0,0 +1,84 @@
+'''
+    Batches of think(): a batch is reasoned at once and split in halves until its failing checks are isolated.
+    Runs think() in the process of pytest, with the fake reasoner of fakes.py.
+'''
+import queue
+import owlready2
+import pytest
+import fakes
+import tools
+
+
+school = "https://test.org/onto.owl#"
+
+
+def relation(subject, name, object):
+    return ("relation", (subject.lower(), name, object.lower(), 1, "batch.py", False), (school + subject, name, school + object), 0)
+
+
+def think(batch):
+    results = queue.Queue()
+    tools.think(batch, results, [0], 0)
+    outcomes = []
+    while not results.empty():
+        outcomes.append(results.get())
+    return outcomes
+
+
+@pytest.fixture
+def reasoner(monkeypatch):
+    monkeypatch.setattr(tools, "sync_reasoner", fakes.reasoner)
+    fakes.runs.clear()
+    yield
+    fakes.runs.clear()
+
+
+def test_consistent_batch_is_reasoned_once(reasoner):
+    batch = [relation("Teacher", "teaches", "Student"), relation("Teacher", "teaches", "ClassClown")]
+    assert think(batch) == [("passed", batch)]
+    assert len(fakes.runs) == 1
+
+
+def test_bisection_isolates_the_failing_checks(reasoner):
+    good = [relation("Teacher", "teaches", "Student"), relation("Teacher", "teaches", "ClassClown"), relation("Student", "taught_by", "Teacher")]
+    bad = [relation("Student", "teaches", "Teacher"), relation("Teacher", "taught_by", "Student")]
+    batch = [bad[0], good[0], good[1], bad[1], good[2]]
+    outcomes = think(batch)
+    failed = [outcome[1] for outcome in outcomes if outcome[0] == "failed"]
+    passed = [task for outcome in outcomes if outcome[0] == "passed" for task in outcome[1]]
+    assert failed == bad
+    assert sorted(passed) == sorted(good)
+    assert len(fakes.runs) > 1
+
+
+def test_nothing_is_left_in_the_world(reasoner):
+    before = len(list(owlready2.default_world.individuals()))
+    think([relation("Student", "teaches", "Teacher"), relation("Teacher", "teaches", "Student")])
+    assert len(list(owlready2.default_world.individuals())) == before
+    assert list(owlready2.default_world.different_individuals()) == []
+
+
+def test_undecided_batch_is_not_split(monkeypatch):
+    runs = []
+    def crashed(world, debug= 0):
+        runs.append(world)
+        raise owlready2.OwlReadyJavaError("no java")
+    monkeypatch.setattr(tools, "sync_reasoner", crashed)
+    batch = [relation("Student", "teaches", "Teacher"), relation("Teacher", "teaches", "Student")]
+    assert think(batch) == [("undecided", batch)]
+    assert len(runs) == 1
+
+
+def test_unasserted_checks_are_settled_apart(reasoner):
+    broken = ("constraint", ("age", school + "Teacher", 1, "batch.py", False, "two words", "teacher"), (school + "Teacher", "age", "two words"), 0)
+    good = relation("Teacher", "teaches", "Student")
+    assert think([broken, good]) == [("unasserted", [broken]), ("passed", [good])]
+    assert think([broken]) == [("unasserted", [broken])]
+
+
+def test_timed_out_batch_is_returned(reasoner):
+    results = queue.Queue()
+    batch = [relation("Teacher", "teaches", "Student")]
+    tools.think(batch, results, [1], 0)
+    assert results.get() == ("timeout", batch)
+    assert fakes.runs == []
@@ -0,0 +1,55 @@
+'''
+    Compiled tables of compiler.py: relations and DataProperty values decided without the reasoner.
+'''
+import owlready2
+import checks
+import compiler
+import metrics
+
+
+school = "https://test.org/onto.owl#"
+
+
+def test_relations_decided_by_domain_and_range():
+    assert compiler.relation_verdict("teaches", school + "Teacher", school + "Student") == True
+    assert compiler.relation_verdict("teaches", school + "Student", school + "Teacher") == False
+    assert compiler.relation_verdict("teaches", school + "ClassClown", school + "Student") == False
+    assert compiler.relation_verdict("teaches", school + "Teacher", school + "ClassClown") == True
+    assert compiler.relation_verdict("taught_by", school + "Teacher", school + "Student") == False      # Inverse of teaches
+    assert compiler.relation_verdict("teaches", school + "Person", school + "Student") == True          # A Person may be a Teacher
+
+
+def test_relations_left_to_the_reasoner():
+    assert "knows" not in compiler.relation_tables          # Transitive
+    assert compiler.relation_verdict("knows", school + "Teacher", school + "Student") == None
+
+
+def test_constraints():
+    assert compiler.constraint_verdict("age", school + "Teacher", "forty") == False
+    assert compiler.constraint_verdict("age", school + "Teacher", 40) == None           # Left to the facets
+    assert compiler.constraint_facets("age", school + "Teacher", 40) == [{"min_inclusive": 0, "max_inclusive": 150}]
+    assert compiler.constraint_facets("nickname", school + "Student", "Sam") == [{"max_length": 5}]
+    assert compiler.constraint_facets("age", school + "Teacher", "forty") == None
+
+
+def test_equivalent_classes_compile_nothing(tables):
+    world = owlready2.World()
+    onto = world.get_ontology("http://test.org/equivalent.owl")
+    with onto:
+        class Person(owlready2.Thing):
+            pass
+        class teaches(owlready2.ObjectProperty):
+            domain = [Person]
+            range = [Person]
+        class Adult(owlready2.Thing):
+            equivalent_to = [Person]
+    compiler.compile_ontology(world)
+    assert compiler.relation_tables == {} and compiler.constraint_tables == {}
+
+
+def test_checks_count_compiled_verdicts():
+    compiled = metrics.counts["compiled"]
+    assert checks.relation((school + "Student", "teaches", school + "Teacher")) == False
+    assert checks.constraint((school + "Teacher", "age", "forty")) == (False, None)
+    assert checks.constraint((school + "Teacher", "age", 40)) == (None, [{"min_inclusive": 0, "max_inclusive": 150}])
+    assert metrics.counts["compiled"] == compiled + 2
@@ -0,0 +1,73 @@
+'''
+    Facets of facets.py: values of DataProperties evaluated in batches, with NumPy or one at a time, and reported
+    through the error reporters.
+'''
+import pytest
+import facets
+
+
+ages = [{"min_inclusive": 0, "max_inclusive": 150}]
+nicknames = [{"max_length": 5}]
+
+
+def constraint(name, value):
+    return ("constraint", (name, "teacher", 1, "facets.py", False, value, name), ("https://test.org/onto.owl#Teacher", name, value), 0)
+
+
+@pytest.fixture
+def reported(monkeypatch):
+    '''
+    Reporters that collect what they are given: (kind, value)
+    '''
+    seen = []
+    monkeypatch.setattr(facets, "reporters", {"settled": lambda task, verdict: seen.append(("settled", task[2][2])),
+                                              "constraint": lambda *arguments: seen.append(("constraint", arguments[5]))})
+    yield seen
+    facets.flush()
+
+
+def test_vectorized_and_scalar_evaluation_agree(monkeypatch):
+    values = list(range(-50, 250, 7)) + [0, 150, 150.5, -0.5]
+    vectorized = facets.evaluate(ages, values)
+    assert vectorized == facets.vectorized(ages, values)
+    monkeypatch.setattr(facets, "numpy", None)
+    assert facets.evaluate(ages, values) == vectorized
+    assert vectorized == [0 <= value <= 150 for value in values]
+
+
+def test_exclusive_bounds():
+    values = [0, 1, 9, 10] * 5
+    assert facets.evaluate([{"min_exclusive": 0, "max_exclusive": 10}], values) == [False, True, True, False] * 5
+
+
+def test_strings_are_measured():
+    values = ["Sam", "Alexander", "", "Teddy", "Robert"] * 4
+    assert facets.evaluate(nicknames, values) == [True, False, True, True, False] * 4
+    assert facets.evaluate([{"length": 3}], ["Sam", "Alex"]) == [True, False]
+
+
+def test_integers_beyond_64_bits_are_compared_one_at_a_time():
+    values = [2**70, -2**70] + list(range(20))
+    assert facets.vectorized(ages, values) == None
+    assert facets.evaluate(ages, values) == [False, False] + [True] * 20
+    assert facets.evaluate([{"max_inclusive": 2**70}, {"min_inclusive": -2**70}], list(range(20))) == [True] * 20
+
+
+def test_submitted_values_are_reported(reported, monkeypatch):
+    monkeypatch.setattr(facets, "batch_size", 3)
+    monkeypatch.setattr(facets, "batch_window", 60)
+    facets.submit(ages, constraint("age", 40))
+    facets.submit(nicknames, constraint("nickname", "Alexander"))
+    assert reported == [] and facets.pending_count == 2
+    facets.submit(ages, constraint("age", 200))             # Third value: the batch is evaluated
+    assert reported == [("settled", 40), ("constraint", 200), ("constraint", "Alexander")]      # Per DataProperty
+    assert facets.pending == {} and facets.pending_count == 0 and facets.flush_timer == None
+
+
+def test_window_flushes_waiting_values(reported, monkeypatch):
+    monkeypatch.setattr(facets, "batch_size", 100)
+    monkeypatch.setattr(facets, "batch_window", 0.05)
+    facets.submit(ages, constraint("age", -1))
+    timer = facets.flush_timer
+    timer.join(5)
+    assert reported == [("constraint", -1)]
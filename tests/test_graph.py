@@ -0,0 +1,70 @@
+'''
+    Incremental mode of graph.py: the objects linked to the ontology checked as a graph, change by change.
+    An object given a second value of a functional relation is only inconsistent if the two values are
+    different individuals, so the parts of the graph are declared AllDifferent.
+'''
+import shutil
+import owlready2
+import pytest
+import fakes
+import tools
+
+
+school = "https://test.org/onto.owl#"
+
+advised = '''
+set_report_output("report.jsonl")
+set_incremental()
+
+class Person:
+    def __init__(self, name):
+        self.name = name
+
+    def set_advisor(self, other):
+        pass
+
+declare(Teacher, Person)
+first = Person("first")
+second = Person("second")
+declare(Student, Person)
+s = Person("s")
+declare(advisor, Person.set_advisor)
+s.set_advisor(first)
+wait_all(60)
+s.set_advisor(second)                           # Second advisor
+drained = wait_all(60)
+fakes.result(drained= drained, graph= metrics.snapshot()["graph"])
+'''
+
+
+def test_part_of_the_graph_with_a_second_functional_value():
+    parts = [tools.graph_individuals(owlready2.default_world, [school + "Student", school + "Teacher", school + "Teacher"], "advisor", links)
+             for links in [([(0, "advisor", 1)], []), ([(0, "advisor", 1), (0, "advisor", 2)], [])]]
+    try:
+        student = parts[1][0]
+        assert [object for subject, object in owlready2.default_world._props["advisor"].get_relations() if subject is student] == parts[1][1:3]
+        assert isinstance(parts[1][3], owlready2.AllDifferent) and list(parts[1][3].entities) == parts[1][:3]
+        assert fakes.inconsistent(owlready2.default_world)
+        tools.destroy_individuals(parts.pop())
+        assert not fakes.inconsistent(owlready2.default_world)
+    finally:
+        for created in parts:
+            tools.destroy_individuals(created)
+    assert list(owlready2.default_world.different_individuals()) == []
+
+
+def test_second_functional_value_is_reported(script, tmp_path):
+    run = script("tools.sync_reasoner = fakes.reasoner\n" + advised)
+    assert run.result["drained"], run.output
+    code = (tmp_path / "script.py").read_text()
+    line = [number for number, text in enumerate(code.splitlines(), 1) if "# Second advisor" in text][0]
+    errors = [record for record in run.kinds("graph") if not record.get("summary")]
+    assert [(record["line"], record["relation"]) for record in errors] == [(line, "advisor")]
+    assert run.kinds("relation") == []                 # A Student may have a Teacher as advisor
+
+
+@pytest.mark.skipif(shutil.which("java") == None, reason= "needs java for HermiT")
+def test_second_functional_value_is_reported_by_hermit(script):
+    run = script(advised)
+    assert run.result["drained"], run.output
+    assert [record["relation"] for record in run.kinds("graph") if not record.get("summary")] == ["advisor"]
@@ -0,0 +1,49 @@
+'''
+    Verdicts of hierarchy.py: an allowed pair of classes allows its superclasses, a forbidden pair forbids its subclasses.
+    knows is transitive, so its checks are never compiled and always reach the hierarchy.
+'''
+import checks
+import hierarchy
+import metrics
+
+
+school = "https://test.org/onto.owl#"
+
+
+def test_allowed_pair_allows_its_superclasses(tables):
+    hierarchy.keep("knows", school + "ClassClown", school + "Teacher", True)
+    assert hierarchy.verdict("knows", school + "Student", school + "Teacher") == True
+    assert hierarchy.verdict("knows", school + "Person", school + "Person") == True
+    assert hierarchy.verdict("knows", school + "Teacher", school + "Student") == None       # Not a superclass pair
+    assert hierarchy.verdict("teaches", school + "Student", school + "Teacher") == None     # Another relation
+
+
+def test_forbidden_pair_forbids_its_subclasses(tables):
+    hierarchy.keep("knows", school + "Student", school + "Teacher", False)
+    assert hierarchy.verdict("knows", school + "ClassClown", school + "Teacher") == False
+    assert (school + "ClassClown", school + "Teacher") in hierarchy.known["knows"]          # Kept for the next calls
+    assert hierarchy.verdict("knows", school + "Person", school + "Teacher") == None
+    hierarchy.keep("knows", school + "ClassClown", school + "Student", True)               # Does not overwrite a proven verdict
+    hierarchy.keep("knows", school + "Student", school + "Teacher", True)
+    assert hierarchy.verdict("knows", school + "Student", school + "Teacher") == False
+
+
+def test_only_verdicts_of_the_reasoner_are_carried(tables):
+    key = ("student", "knows", "teacher")
+    hierarchy.pending[key] = (school + "Student", "knows", school + "Teacher")
+    hierarchy.settled(key, None)                                # The reasoner could not run
+    assert key not in hierarchy.pending and hierarchy.known == {}
+    hierarchy.settled(key, False)                               # No longer pending
+    assert hierarchy.known == {}
+    hierarchy.pending[key] = (school + "Student", "knows", school + "Teacher")
+    hierarchy.settled(key, False)
+    assert hierarchy.verdict("knows", school + "ClassClown", school + "Teacher") == False
+
+
+def test_checks_count_propagated_verdicts(tables):
+    propagated = metrics.counts["propagated"]
+    assert checks.relation((school + "ClassClown", "knows", school + "Teacher")) == None
+    hierarchy.keep("knows", school + "Student", school + "Teacher", False)
+    assert checks.relation((school + "ClassClown", "knows", school + "Teacher")) == False
+    assert checks.relation((school + "Student", "knows", school + "Teacher")) == False
+    assert metrics.counts["propagated"] == propagated + 2
@@ -0,0 +1,113 @@
+'''
+    Workers of pool.py: checks reasoned by long-lived workers, deadlines that kill the reasoner and retry its batch,
+    and kill_pool stopping every worker and reasoner at once.
+'''
+
+
+people = '''
+set_report_output("report.jsonl")
+
+class Person:
+    def __init__(self, name):
+        self.name = name
+
+    def add_student(self, other):
+        pass
+
+    def meet(self, other):
+        pass
+'''
+
+
+def test_workers_report_each_triple(script):
+    run = script(people + '''
+set_pool(2)
+tools.sync_reasoner = fakes.reasoner
+compiler.relation_tables.clear()                # Every triple goes to the workers
+
+declare(Teacher, Person)
+t = Person("t")
+declare(Student, Person)
+s = Person("s")
+declare(teaches, Person.add_student)
+t.add_student(s)
+s.add_student(t)
+drained = wait_all(60)
+workers = [p.pid for p in pool.workers]
+pool.stop_pool()
+fakes.result(drained= drained, workers= workers, alive= pool.alive(), submitted= metrics.counts["submitted"],
+             statuses= sorted([list(key), entry[0]] for key, entry in tested_triples.items()))
+''')
+    assert run.result["drained"]
+    assert len(run.result["workers"]) == 2 and run.result["alive"] == []
+    assert run.result["submitted"] == 2
+    assert run.result["statuses"] == [[["student", "teaches", "teacher"], -1], [["teacher", "teaches", "student"], 1]]
+    errors = [record for record in run.kinds("relation") if not record.get("summary")]
+    assert [(record["subject"], record["relation"], record["object"]) for record in errors] == [("student", "teaches", "teacher")]
+
+
+def test_deadline_kills_reasoner_and_retries(script):
+    run = script(people + '''
+import psutil
+set_pool(1)
+set_timeouts(initial= 1, floor= 0.5, retries= 1, backoff= 1)
+tools.sync_reasoner = fakes.hanging_reasoner
+
+declare(Student, Person)
+s = Person("s")
+declare(knows, Person.meet)
+s.meet(s)
+drained = wait_all(60)
+pids = [int(line) for line in open("reasoners.txt")]
+fakes.result(drained= drained, status= tested_triples[("student", "knows", "student")][0], killed= metrics.counts["killed"],
+             timeouts= metrics.counts["timeouts"], retries= metrics.counts["retries"], pids= pids,
+             running= [pid for pid in pids if psutil.pid_exists(pid)], workers= [p.is_alive() for p in pool.workers])
+''')
+    assert run.result["drained"]
+    assert len(run.result["pids"]) == 2                 # The first attempt and its retry
+    assert run.result["running"] == []
+    assert run.result["killed"] == 2 and run.result["timeouts"] == 2 and run.result["retries"] == 1
+    assert run.result["status"] == 0                    # Out of retries: settled without a verdict
+    assert run.result["workers"] == [True]              # Only the reasoner was killed
+
+
+def test_retry_after_deadline_decides(script):
+    run = script(people + '''
+set_pool(1)
+set_timeouts(initial= 1, floor= 0.5, retries= 1, backoff= 1)
+tools.sync_reasoner = fakes.hanging_once
+
+declare(Student, Person)
+s = Person("s")
+declare(knows, Person.meet)
+s.meet(s)
+drained = wait_all(60)
+fakes.result(drained= drained, status= tested_triples[("student", "knows", "student")][0], killed= metrics.counts["killed"],
+             retries= metrics.counts["retries"])
+''')
+    assert run.result == {"drained": True, "status": 1, "killed": 1, "retries": 1}
+
+
+def test_kill_pool_stops_workers_and_reasoners(script):
+    run = script(people + '''
+import time
+import psutil
+set_pool(2)
+tools.sync_reasoner = fakes.hanging_reasoner
+
+declare(Student, Person)
+s = Person("s")
+declare(knows, Person.meet)
+s.meet(s)
+pool.flush()
+while not os.path.exists("reasoners.txt"):
+    time.sleep(0.05)
+time.sleep(0.2)
+pids = [int(line) for line in open("reasoners.txt")] + [p.pid for p in pool.workers]
+pool.kill_pool()
+drained = wait_all(5)
+time.sleep(0.5)
+fakes.result(drained= drained, running= [pid for pid in pids if psutil.pid_exists(pid) and psutil.Process(pid).status() != psutil.STATUS_ZOMBIE])
+os._exit(0)
+''')
+    assert run.result == {"drained": True, "running": []}
@@ -0,0 +1,90 @@
+'''
+    Static pre-check of precheck.py: the checks the source of a script shows, found before its calls happen.
+    Errors at calls that have not run are possible errors; they become errors, counted in the metrics, when they run.
+'''
+import os
+import precheck
+from conftest import package
+
+
+school = "https://test.org/onto.owl#"
+
+source = '''
+import sys
+from tools import *
+
+class Person:
+    def __init__(self, name, age= 7):
+        self.name = name
+        self.age = age
+
+    def add_student(self, other):
+        pass
+
+    def follow(self, other):
+        pass
+
+declare(Teacher, Person)
+declare(age, "age", cls= Person)
+t = Person("t", 40)
+declare(Student, Person)
+s = Person("s", 200)                                    # age out of range
+u = Person("u")                                         # Default age
+declare(teaches, Person.add_student)
+declare(taught_by, Person.follow)
+t.add_student(s)
+t.follow(s)                                             # Teacher taught_by Student
+if len(sys.argv) > 5:
+    s.add_student(t)                                    # Never runs
+if len(sys.argv) > 5:
+    s = t
+s.add_student(s)                                        # s is not known here, Student teaches Student when it runs
+for x in range(2):
+    t.add_student(s)
+'''
+
+
+def line_of(code, text):
+    return [number for number, line in enumerate(code.splitlines(), 1) if text in line][0]
+
+
+def test_scan_finds_the_checks_of_the_source(tmp_path):
+    path = tmp_path / "app.py"
+    path.write_text(source)
+    file = str(path)
+    assert precheck.scan(str(path)) == [
+        ("constraint", "age", school + "Teacher", "age", 40, file, line_of(source, 't = Person("t", 40)')),
+        ("constraint", "age", school + "Student", "age", 200, file, line_of(source, "# age out of range")),
+        ("constraint", "age", school + "Student", "age", 7, file, line_of(source, "# Default age")),
+        ("relation", "teaches", school + "Teacher", school + "Student", file, line_of(source, "t.add_student(s)")),
+        ("relation", "taught_by", school + "Teacher", school + "Student", file, line_of(source, "# Teacher taught_by Student")),
+        ("relation", "teaches", school + "Student", school + "Teacher", file, line_of(source, "# Never runs"))]
+
+
+def test_possible_errors_and_errors(script, tmp_path):
+    run = script('''
+from precheck import precheck
+set_report_output("report.jsonl")
+found = precheck()
+''' + source.replace("from tools import *", "") + '''
+drained = wait_all(60)
+fakes.result(drained= drained, found= found, prechecked= metrics.counts["prechecked"], violations= dict(metrics.violations))
+''', name= "app.py")
+    assert run.result == {"drained": True, "found": 6, "prechecked": 6, "violations": {"age": 1, "taught_by": 1, "teaches": 1}}, run.output
+    code = (tmp_path / "app.py").read_text()
+    errors = [(record["kind"], record["line"], bool(record.get("static"))) for record in run.records if record["kind"] in ("relation", "constraint")]
+    assert ("relation", line_of(code, "# Never runs"), True) in errors
+    assert ("relation", line_of(code, "# Teacher taught_by Student"), True) in errors        # Found by precheck
+    assert ("relation", line_of(code, "# Teacher taught_by Student"), False) in errors       # Then run
+    assert ("relation", line_of(code, "# s is not known here"), False) in errors
+    assert ("constraint", line_of(code, "# age out of range"), False) in errors
+    assert [line for kind, line, static in errors if static] == [line_of(code, "# Teacher taught_by Student"), line_of(code, "# Never runs")]
+
+
+def test_command_checks_scripts_ahead_of_time(command, tmp_path):
+    (tmp_path / "app.py").write_text(source)
+    run = command([os.path.join(package, "precheck.py"), "app.py", "--workers", "1", "--report", "report.jsonl"])
+    assert run.status == 1, run.output
+    assert "6 checks found, 6 distinct checks, 3 not allowed in your ontology." in run.output
+    assert sorted(record["line"] for record in run.records if record["kind"] in ("relation", "constraint")) == \
+           sorted([line_of(source, "# age out of range"), line_of(source, "# Teacher taught_by Student"), line_of(source, "# Never runs")])
@@ -0,0 +1,182 @@
+'''
+    Checker service of server.py and its client: checks of a program answered by the service, requests it refuses,
+    the cache of verdicts shared by its clients, and a program that loses the service while checks are outstanding.
+'''
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import psutil
+import pytest
+import server
+import verdicts
+from conftest import home, package, prelude, tests
+
+
+school = "https://test.org/onto.owl#"
+
+serving = '''
+import server
+tools.sync_reasoner = fakes.{reasoner}
+sys.exit(server.main(["--listen", "unix:" + {socket!r}, "--workers", "1", "--batch", "1", "--window", "0"]))
+'''
+
+people = '''
+set_report_output("report.jsonl")
+set_server("unix:" + sys.argv[1])
+tools.sync_reasoner = fakes.reasoner            # Only for the checks that run in this program
+compiler.relation_tables.clear()                # Every triple goes to the service
+
+class Person:
+    def __init__(self, name):
+        self.name = name
+
+    def add_student(self, other):
+        pass
+
+    def meet(self, other):
+        pass
+
+declare(Teacher, Person)
+t = Person("t")
+declare(Student, Person)
+s = Person("s")
+declare(teaches, Person.add_student)
+declare(knows, Person.meet)
+'''
+
+
+@pytest.fixture
+def service(tmp_path):
+    '''
+    Starts server.py with a fake reasoner in tmp_path, and returns its process and the path of its socket.
+    Its workers and their reasoners are killed with it, even if it was killed by the test.
+    '''
+    started = []
+    def start(reasoner= "reasoner"):
+        path = str(tmp_path / "checker.sock")
+        code = tmp_path / "service.py"
+        code.write_text(prelude + serving.format(reasoner= reasoner, socket= path))
+        environment = dict(os.environ, HOME= home, PYTHONPATH= package)
+        process = subprocess.Popen([sys.executable, str(code)], cwd= tmp_path, env= environment, stdout= subprocess.PIPE,
+                                   stderr= subprocess.STDOUT, text= True)
+        assert "listening" in process.stdout.readline()
+        started.append((process, psutil.Process(process.pid).children()))      # Its workers, started before it listens
+        return process, path
+    yield start
+    for process, workers in started:
+        children = list(workers)
+        for worker in workers:
+            try:
+                children += worker.children(recursive= True)
+            except psutil.NoSuchProcess:
+                pass
+        if process.poll() == None:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        for child in children:
+            try:
+                child.kill()
+            except psutil.NoSuchProcess:
+                pass
+
+
+def request(sock, stream, **fields):
+    sock.sendall((json.dumps(fields) + "\n").encode())
+    return json.loads(stream.readline())
+
+
+def test_program_checked_by_the_service(service, script):
+    process, path = service()
+    run = script(people + '''
+t.add_student(s)
+s.add_student(t)
+s.meet(t)
+drained = wait_all(60)
+fakes.result(drained= drained, connections= metrics.counts["service_connections"], workers= len(pool.workers),
+             statuses= sorted([list(key), entry[0]] for key, entry in tested_triples.items()))
+''', path)
+    assert run.result["drained"], run.output
+    assert run.result["connections"] == 1 and run.result["workers"] == 0
+    assert run.result["statuses"] == [[["student", "knows", "teacher"], 1], [["student", "teaches", "teacher"], -1],
+                                      [["teacher", "teaches", "student"], 1]]
+    errors = [record for record in run.kinds("relation") if not record.get("summary")]
+    assert [(record["subject"], record["object"]) for record in errors] == [("student", "teacher")]
+    assert run.kinds("warning") == []
+
+
+def test_refused_and_malformed_requests(service):
+    process, path = service()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    stream = sock.makefile('rb')
+    try:
+        greeting = json.loads(stream.readline())
+        assert greeting == {"ontology": verdicts.ontology_fingerprint(os.path.join(tests, "school.py"))}
+        assert request(sock, stream, id= 1, kind= "constraint", assertion= [school + "Student", "nickname", "Sam"]) == \
+               {"id": 1, "verdict": None, "refused": True}                  # Only numbers are taken
+        assert request(sock, stream, id= 2, kind= "relation", assertion= [school + "Teacher", "__import__('os').getpid()", school + "Student"]) == \
+               {"id": 2, "verdict": None, "refused": True}
+        assert request(sock, stream, id= 3, kind= "constraint", assertion= [school + "Teacher", "age", float("nan")]) == \
+               {"id": 3, "verdict": None, "refused": True}
+        assert request(sock, stream, id= 4) == {"id": 4, "verdict": None, "refused": True}
+        sock.sendall(b"not json\n")                                         # No id to answer
+        assert request(sock, stream, id= 5, kind= "relation", assertion= [school + "Teacher", "teaches", school + "Student"]) == \
+               {"id": 5, "verdict": True}
+        assert request(sock, stream, id= 6, kind= "constraint", assertion= [school + "Teacher", "age", 200]) == {"id": 6, "verdict": False}
+        assert request(sock, stream, id= 7, kind= "relation", assertion= [school + "Student", "knows", school + "Teacher"]) == \
+               {"id": 7, "verdict": True}                                   # Reasoned about by the workers of the service
+    finally:
+        sock.close()
+
+
+def test_lost_service_leaves_the_checks_to_the_program(service, script):
+    process, path = service("hanging_reasoner")
+    run = script(people + '''
+import signal
+s.meet(t)
+pool.flush()
+while not os.path.exists("reasoners.txt"):      # The service is reasoning about the check
+    time.sleep(0.05)
+os.kill(int(sys.argv[2]), signal.SIGKILL)
+drained = wait_all(60)
+fakes.result(drained= drained, lost= metrics.counts["service_lost"], workers= len(pool.workers),
+             status= tested_triples[("student", "knows", "teacher")][0])
+''', path, str(process.pid))
+    assert run.result == {"drained": True, "lost": 1, "workers": 1, "status": 1}, run.output
+    assert [record["message"] for record in run.kinds("warning")] == \
+           ["the connection to the checker service at unix:" + path + " was lost, its checks run in this program."]
+
+
+class Listener:
+    def __init__(self):
+        self.answers = []
+
+    def reply(self, request_id, verdict, refused= False):
+        self.answers.append((request_id, verdict))
+
+
+def test_cache_keeps_the_type_of_values(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(server, "decide", lambda kind, assertion: None)
+    monkeypatch.setattr(server.pool, "submit", lambda task, processes: submitted.append(task[2]))
+    monkeypatch.setattr(server, "cache", {})
+    monkeypatch.setattr(server, "waiting", {})
+    first, second = Listener(), Listener()
+    for client, request_id, value in [(first, 1, 1), (second, 2, 1), (first, 3, True), (first, 4, 1.0)]:
+        server.check(client, {"id": request_id, "kind": "constraint", "assertion": [school + "Teacher", "age", value]})
+    assert [assertion[2] for assertion in submitted] == [1, True, 1.0]     # The second 1 waits for the first
+    assert [type(assertion[2]) for assertion in submitted] == [int, bool, float]
+    server.answer(verdicts.key("constraint", (school + "Teacher", "age", 1)), True)
+    assert first.answers == [(1, True)] and second.answers == [(2, True)]
+    server.check(second, {"id": 5, "kind": "constraint", "assertion": [school + "Teacher", "age", 1]})
+    assert second.answers[-1] == (5, True) and len(submitted) == 3        # From the cache
+    server.answer(verdicts.key("constraint", (school + "Teacher", "age", True)), None)
+    assert first.answers[-1] == (3, None)
+    assert verdicts.key("constraint", (school + "Teacher", "age", True)) not in server.cache
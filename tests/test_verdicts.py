@@ -0,0 +1,75 @@
+'''
+    Verdict store of verdicts.py: verdicts of the reasoner kept between runs, dropped when the ontology or the
+    version of the store changes.
+'''
+import shutil
+import pytest
+import verdicts
+from conftest import tests
+
+
+school = "https://test.org/onto.owl#"
+
+
+@pytest.fixture
+def store(tmp_path):
+    '''
+    Copy of school.py with a store of its own, turned off again after the test
+    '''
+    source = tmp_path / "school.py"
+    shutil.copy(tests + "/school.py", source)
+    verdicts.open_store(str(source), str(tmp_path / "store" / "verdicts.sqlite"))
+    yield source
+    verdicts.store_path = None
+    verdicts.fingerprint = None
+
+
+def relation(subject, object):
+    return ("relation", (), (school + subject, "teaches", school + object), 0)
+
+
+def constraint(value):
+    return ("constraint", (), (school + "Teacher", "age", value), 0)
+
+
+def test_turned_off_store():
+    assert verdicts.store_path == None
+    assert verdicts.lookup("relation", relation("Teacher", "Student")[2]) == None
+    verdicts.record([relation("Teacher", "Student")], True)          # Nothing to write to
+
+
+def test_recorded_verdicts_are_found(store):
+    verdicts.record([relation("Teacher", "Student")], True)
+    verdicts.record([relation("Student", "Teacher")], False)
+    assert verdicts.lookup("relation", relation("Teacher", "Student")[2]) == True
+    assert verdicts.lookup("relation", relation("Student", "Teacher")[2]) == False
+    assert verdicts.lookup("relation", relation("Person", "Student")[2]) == None
+
+
+def test_values_are_keyed_by_type(store):
+    verdicts.record([constraint(1)], True)
+    verdicts.record([constraint(True)], False)
+    assert verdicts.lookup("constraint", constraint(1)[2]) == True
+    assert verdicts.lookup("constraint", constraint(True)[2]) == False
+    assert verdicts.lookup("constraint", constraint(1.0)[2]) == None
+    assert verdicts.lookup("constraint", constraint("1")[2]) == None
+
+
+def test_changed_ontology_drops_the_verdicts(store):
+    verdicts.record([relation("Teacher", "Student")], True)
+    path = verdicts.store_path
+    verdicts.open_store(str(store), path)                           # Same ontology: kept
+    assert verdicts.lookup("relation", relation("Teacher", "Student")[2]) == True
+    with open(store, "a") as f:
+        f.write("# changed\n")
+    verdicts.open_store(str(store), path)
+    assert verdicts.lookup("relation", relation("Teacher", "Student")[2]) == None
+    assert verdicts.connect().execute("SELECT COUNT(*) FROM verdicts").fetchone()[0] == 0
+
+
+def test_new_store_version_drops_the_verdicts(store, monkeypatch):
+    verdicts.record([relation("Teacher", "Student")], True)
+    monkeypatch.setattr(verdicts, "store_version", verdicts.store_version + "-next")
+    verdicts.open_store(str(store), verdicts.store_path)
+    assert verdicts.lookup("relation", relation("Teacher", "Student")[2]) == None
+    assert verdicts.connect().execute("SELECT COUNT(*) FROM verdicts").fetchone()[0] == 0